@@ -0,0 +1,600 @@
+# async_drive.py
+
+import os
+import sys
+import time
+import asyncio
+import inspect
+import aiohttp
+from google.auth.transport.requests import Request
+import config
+from chunk_sizer import AdaptiveChunkSizer
+from drive_batch import FOLDER_MIME_TYPE
+from rate_limiter import backoff_delay, is_retryable, is_throttled
+from stream_transfer import DriveHttpError
+from sync_state import get_sync_state
+from staging import get_staging_area
+from credential_pool import get_credential_pool
+from drive_auth import get_worker_service
+from lanes import get_lane_scheduler
+from face_detector import count_faces_in_worker, create_face_pool
+from process_content import (
+    SHORTCUT_MIME_TYPE, SUBFOLDERS, TransferStats, cached_face_count, create_subfolders, file_fields, find_duplicate,
+    delivered_bytes, image_content_hash, is_group_photo, placed_bytes, record_transfer, route_file,
+    store_face_count, stream_large_file, streams_large_files, transfer_duplicate,
+)
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Errors of the connection itself, which are worth retrying like server errors
+CONNECTION_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+def is_retryable_async(error, idempotent=True):
+    """
+    Checks whether a failed aiohttp request may succeed when retried, see
+    rate_limiter.is_retryable().
+    """
+    return (idempotent and isinstance(error, CONNECTION_ERRORS)) or is_retryable(error, idempotent)
+
+
+class AsyncRateLimiter:
+    """
+    asyncio counterpart of rate_limiter.DriveRateLimiter: a token bucket for the request
+    rate and an AIMD limit on the requests in flight, which starts at
+    config.async_connections.
+    """
+
+    def __init__(self, requests_per_second, burst, max_in_flight):
+        self.rate = requests_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self.successes = 0
+        self.decreased_at = 0.0
+        self.paused_until = 0.0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        """
+        Waits for a free request slot, any Retry-After pause and a token.
+        """
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        except asyncio.CancelledError:
+            await self.release(cancelled=True)
+            raise
+
+    async def release(self, throttled=False, cancelled=False):
+        """
+        Frees a request slot and adjusts the limit from the outcome of the request. A
+        cancelled request only frees its slot.
+        """
+        async with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.successes = 0
+                if now - self.decreased_at >= config.rate_limit_decrease_interval:
+                    self.decreased_at = now
+                    self.limit = max(1, self.limit // 2)
+                    print(Fore.YELLOW + f"⚠ Drive is throttling requests, lowering requests in flight to {self.limit}.")
+            elif not cancelled:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_in_flight:
+                    self.successes = 0
+                    self.limit += 1
+            self.condition.notify_all()
+
+    async def backoff(self, attempt, error):
+        """
+        Sleeps before retrying a failed request, pausing all requests on Retry-After.
+        """
+        delay, retry_after = backoff_delay(attempt, error)
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        await asyncio.sleep(delay)
+
+
+class AsyncDriveClient:
+    """
+    Drive v3 client on aiohttp covering the calls the transfer needs: listing, media
+    downloads, multipart and resumable uploads, copies and links.
+
+    All requests share one session, so connections are kept alive and reused, and one
+    AsyncRateLimiter. Access tokens come from the google-auth credentials and are
+    refreshed in a thread when they expire.
+    """
+
+    def __init__(self, creds, session, limiter):
+        self.creds = creds
+        self.session = session
+        self.limiter = limiter
+        self.token_lock = asyncio.Lock()
+        self.base = config.drive_api_base
+
+    async def auth_headers(self):
+        """
+        Returns the Authorization header, refreshing the access token if needed.
+        """
+        async with self.token_lock:
+            if not self.creds.valid:
+                await asyncio.to_thread(self.creds.refresh, Request())
+        return {'Authorization': f'Bearer {self.creds.token}'}
+
+    async def request(self, method, url, read=None, expected=(200,), retry=True, headers=None, data=None, idempotent=None,
+                      **kwargs):
+        """
+        Sends one Drive request under the rate limit.
+
+        Parameters:
+            method (str): HTTP method.
+            url (str): Request URL.
+            read (callable or None): Called with the response to produce the result, may be a
+                coroutine function. Defaults to parsing the JSON body.
+            expected (tuple): Status codes that count as success.
+            retry (bool): Whether to retry retryable errors. Transfers that must resume from
+                a new offset retry on their own instead.
+            headers (dict or None): Extra request headers.
+            data: Request body, or a callable building a fresh body for every attempt.
+            idempotent (bool or None): Whether the request may be repeated safely, defaults to
+                False for POST requests, which create or copy files.
+
+        Returns:
+            The result of read.
+        """
+        if idempotent is None:
+            idempotent = method != 'POST'
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                request_headers = {**(headers or {}), **await self.auth_headers()}
+                body = data() if callable(data) else data
+                async with self.session.request(method, url, headers=request_headers, data=body, **kwargs) as resp:
+                    if resp.status not in expected:
+                        raise DriveHttpError(resp.status, await resp.read(), resp.headers.get('Retry-After'))
+                    result = read(resp) if read else resp.json(content_type=None)
+                    if inspect.isawaitable(result):
+                        result = await result
+            except asyncio.CancelledError:
+                # A cancelled transfer must not keep its slot, or the remaining ones stall
+                await self.limiter.release(cancelled=True)
+                raise
+            except Exception as e:
+                await self.limiter.release(throttled=is_throttled(e))
+                if not retry or attempt >= config.drive_max_retries or not is_retryable_async(e, idempotent):
+                    raise
+                await self.limiter.backoff(attempt, e)
+                attempt += 1
+                continue
+            await self.limiter.release()
+            return result
+
+    async def list_folder(self, folder_id):
+        """
+        Lists the images, videos and subfolders directly inside a folder.
+
+        Returns:
+            list: File resources of all pages.
+        """
+        query = (f"'{folder_id}' in parents and (mimeType = '{FOLDER_MIME_TYPE}' or mimeType contains 'image/' "
+                 f"or mimeType contains 'video/') and trashed=false")
+        files = []
+        page_token = None
+        while True:
+            params = {'q': query, 'fields': f"nextPageToken, files({file_fields()})", 'pageSize': '1000'}
+            if page_token:
+                params['pageToken'] = page_token
+            response = await self.request('GET', f"{self.base}/drive/v3/files", params=params)
+            files.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return files
+
+    async def walk(self, folder_id):
+        """
+        Yields the images and videos in a folder and, with config.recursive_listing, in all of
+        its subfolders. The folders of each level of the tree are listed concurrently.
+
+        Yields:
+            dict: File resource.
+        """
+        folders = [folder_id]
+        while folders:
+            listings = await asyncio.gather(*(self.list_folder(folder) for folder in folders))
+            folders = []
+            for files in listings:
+                for item in files:
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        if config.recursive_listing:
+                            folders.append(item['id'])
+                    else:
+                        yield item
+
+    async def download(self, file_id, file_path, file_size=None):
+        """
+        Downloads a file to '<file_path>.part' and renames it into place once complete,
+        continuing a partial file with a Range request, also after a dropped connection.
+        """
+        part_path = file_path + '.part'
+        url = f"{self.base}/drive/v3/files/{file_id}?alt=media"
+        attempt = 0
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if file_size is not None and offset > file_size:
+                # The source changed since the partial download, start over
+                os.remove(part_path)
+                offset = 0
+            if file_size is not None and offset == file_size:
+                if not os.path.exists(part_path):
+                    open(part_path, 'wb').close()
+                break
+
+            async def write(resp):
+                # A 200 means the server ignored the Range header and sends the whole file
+                with open(part_path, 'ab' if resp.status == 206 else 'wb') as f:
+                    async for block in resp.content.iter_chunked(1024 * 1024):
+                        f.write(block)
+
+            headers = {'Range': f'bytes={offset}-'} if offset else None
+            try:
+                await self.request('GET', url, read=write, expected=(200, 206), retry=False, headers=headers)
+                if file_size is None:
+                    break
+                if os.path.getsize(part_path) < file_size:
+                    raise aiohttp.ClientPayloadError("connection closed before the end of the file")
+            except Exception as e:
+                if attempt >= config.drive_max_retries or not is_retryable_async(e):
+                    raise
+                await self.limiter.backoff(attempt, e)
+                attempt += 1
+
+        if file_size is not None and os.path.getsize(part_path) != file_size:
+            os.remove(part_path)
+            raise IOError(f"downloaded size does not match the expected {file_size} bytes")
+        os.replace(part_path, file_path)
+
+    async def upload(self, file_path, metadata, mime_type):
+        """
+        Uploads a local file. Files up to config.async_multipart_threshold are sent with a
+        single multipart request, larger ones with a resumable upload in adaptive chunks.
+
+        Returns:
+            str: ID of the uploaded file.
+        """
+        total_size = os.path.getsize(file_path)
+        if total_size <= config.async_multipart_threshold:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+
+            def body():
+                writer = aiohttp.MultipartWriter('related')
+                writer.append_json(metadata)
+                writer.append(content, {'Content-Type': mime_type})
+                return writer
+
+            url = f"{self.base}/upload/drive/v3/files?uploadType=multipart&fields=id"
+            return (await self.request('POST', url, data=body))['id']
+
+        url = f"{self.base}/upload/drive/v3/files?uploadType=resumable&fields=id"
+        headers = {'X-Upload-Content-Type': mime_type, 'X-Upload-Content-Length': str(total_size)}
+        # Starting a session creates no file, an unused one simply expires
+        session_uri = await self.request('POST', url, read=lambda resp: resp.headers['Location'],
+                                         headers=headers, json=metadata, idempotent=True)
+
+        async def parse(resp):
+            if resp.status == 308:
+                # 'Range: bytes=0-N' lists the bytes the server has committed so far
+                committed = resp.headers.get('Range')
+                return (int(committed.rsplit('-', 1)[1]) + 1 if committed else 0), None
+            return None, await resp.json(content_type=None)
+
+        # Every file in flight may hold a chunk, so they share the memory budget
+        sizer = AdaptiveChunkSizer(total_size, workers=config.async_max_in_flight)
+        offset = 0
+        attempt = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(sizer.chunk_size)
+                content_range = f'bytes {offset}-{offset + len(chunk) - 1}/{total_size}' if chunk else f'bytes */{total_size}'
+                try:
+                    sizer.start()
+                    next_offset, file = await self.request('PUT', session_uri, read=parse, expected=(200, 201, 308),
+                                                           retry=False, headers={'Content-Range': content_range}, data=chunk)
+                except Exception as e:
+                    if attempt >= config.drive_max_retries or not is_retryable_async(e):
+                        raise
+                    await self.limiter.backoff(attempt, e)
+                    attempt += 1
+                    # The failed attempt may have committed part of the chunk, so ask before resending
+                    next_offset, file = await self.request('PUT', session_uri, read=parse, expected=(200, 201, 308),
+                                                           headers={'Content-Range': f'bytes */{total_size}'})
+                else:
+                    sizer.record(next_offset - offset if next_offset is not None else len(chunk))
+                if file is not None:
+                    return file['id']
+                offset = next_offset
+
+    async def copy(self, file_id, metadata):
+        """
+        Copies a file server-side.
+
+        Returns:
+            str: ID of the copy.
+        """
+        url = f"{self.base}/drive/v3/files/{file_id}/copy"
+        return (await self.request('POST', url, params={'fields': 'id'}, json=metadata))['id']
+
+    async def link(self, file_id, file_name, target_subfolder_id):
+        """
+        Places an uploaded file in another subfolder as chosen by
+        config.extra_destination_policy, like process_content.link_file().
+
+        Returns:
+            str: ID of the shortcut, copy or file placed in the subfolder.
+        """
+        policy = config.extra_destination_policy
+        metadata = {'name': file_name, 'parents': [target_subfolder_id]}
+        if policy == 'copy':
+            return await self.copy(file_id, metadata)
+        metadata.update({'mimeType': SHORTCUT_MIME_TYPE, 'shortcutDetails': {'targetId': file_id}})
+        return (await self.request('POST', f"{self.base}/drive/v3/files", params={'fields': 'id'}, json=metadata))['id']
+
+
+async def deliver_file_async(client, file_name, destinations, subfolder_ids, file_path, mime_type):
+    """
+    Uploads a file into its first destination and links it into the others, like
+    process_content.deliver_file().
+
+    Returns:
+        dict: Mapping of destination subfolder names to the created file IDs, None for failures.
+    """
+    primary = destinations[0]
+    target_ids = {}
+    try:
+        target_ids[primary] = await client.upload(file_path, {'name': file_name, 'parents': [subfolder_ids[primary]]}, mime_type)
+        print(Fore.GREEN + f"✔ Successfully uploaded '{file_name}' to '{primary}' with File ID: {target_ids[primary]}.")
+    except Exception as e:
+        print(Fore.RED + f"✖ Failed to upload '{file_name}': {e}\n")
+        return {subfolder_type: None for subfolder_type in destinations}
+
+    for subfolder_type in destinations[1:]:
+        try:
+            if config.extra_destination_policy == 'upload':
+                metadata = {'name': file_name, 'parents': [subfolder_ids[subfolder_type]]}
+                target_ids[subfolder_type] = await client.upload(file_path, metadata, mime_type)
+            else:
+                target_ids[subfolder_type] = await client.link(target_ids[primary], file_name, subfolder_ids[subfolder_type])
+            print(Fore.GREEN + f"✔ Placed '{file_name}' in '{subfolder_type}' with File ID: {target_ids[subfolder_type]}.")
+        except Exception as e:
+            print(Fore.RED + f"✖ Failed to place '{file_name}' in '{subfolder_type}': {e}\n")
+            target_ids[subfolder_type] = None
+    return target_ids
+
+
+async def transfer_file_async(client, creds, item, subfolder_ids, face_pool, download_path, large_files_path, size_threshold,
+                              upload_clients=None):
+    """
+    Transfers one source file: download, classification, upload and linking.
+
+    Files exceeding size_threshold are streamed in a thread, or staged in large_files_path
+    for upload_large_files.py, as in the other modes. With a credential pool, the upload
+    goes through the client of the identity the pool assigns the file to, see
+    identity_clients().
+
+    Returns:
+        bool: True if the file reached all of its destinations, False otherwise.
+    """
+    file_name = item['name']
+    file_size = int(item.get('size', 0))
+    if find_duplicate(item):
+        # Linking uses the blocking API client, with one client per thread
+        return await asyncio.to_thread(lambda: transfer_duplicate(item, subfolder_ids, get_worker_service(creds)))
+    if file_size > size_threshold:
+        if streams_large_files():
+            return await asyncio.to_thread(stream_large_file, creds, item, subfolder_ids)
+        print(Fore.MAGENTA + f"📁 File '{file_name}' exceeds the size threshold ({file_size} bytes). Moving to 'large_files' folder.")
+        await client.download(item['id'], os.path.join(large_files_path, file_name), file_size)
+        return True
+
+    # Waits while the staged files fill the budget, until other transfers evict theirs
+    staging = get_staging_area(download_path)
+    file_path = staging.path_for(item)
+    await staging.reserve_async(item)
+    try:
+        await client.download(item['id'], file_path, file_size)
+
+        group_photo = None
+        if item['mimeType'].startswith('image/'):
+            content_hash = image_content_hash(file_path, item)
+            face_count = cached_face_count(content_hash)
+            if face_count is None:
+                try:
+                    face_count = await asyncio.get_running_loop().run_in_executor(face_pool, count_faces_in_worker, file_path)
+                except Exception as e:
+                    # A crashed worker or OpenCV error only skips the group photo check
+                    print(Fore.RED + f"✖ Face detection failed for '{file_name}': {e}\n")
+                store_face_count(content_hash, face_count)
+            group_photo = is_group_photo(face_count, file_path)
+
+        destinations = route_file(file_name, item['mimeType'], file_path, group_photo=group_photo)
+        if not destinations:
+            print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unsupported MIME type '{item['mimeType']}'.\n")
+            staging.evict(item)
+            return False
+
+        upload_client, identity = client, None
+        placed = placed_bytes(file_size, destinations)
+        if upload_clients:
+            identity = get_credential_pool().pick(placed)
+            upload_client = upload_clients[identity.name]
+        target_ids = {}
+        try:
+            target_ids = await deliver_file_async(upload_client, file_name, destinations, subfolder_ids, file_path,
+                                                  item['mimeType'])
+        finally:
+            if identity is not None:
+                get_credential_pool().release(identity, placed, delivered_bytes(file_size, target_ids))
+        ok = all(target_ids.values())
+        if ok:
+            record_transfer(item, destinations, target_ids)
+            if config.clean_up_downloaded_files_after_uploading:
+                staging.evict(item)
+        return ok
+    finally:
+        # A file kept on disk after a failure no longer counts against the budget
+        staging.release(item)
+
+
+def identity_clients(client, creds, session):
+    """
+    Builds an async client for every identity of the credential pool, each with its own
+    AsyncRateLimiter, since Drive throttles each user separately. The limiters are added
+    to the identities, so the pool sees when one of them is throttled.
+
+    Parameters:
+        client (AsyncDriveClient): Client of the main credentials, reused for the main identity.
+        creds (Credentials): Main credentials.
+        session (aiohttp.ClientSession): Session shared by all clients.
+
+    Returns:
+        dict: Mapping of identity names to their clients, empty without a pool.
+    """
+    pool = get_credential_pool()
+    if pool is None:
+        return {}
+    clients = {}
+    for identity in pool.identities:
+        if identity.creds is creds:
+            identity_client = client
+        else:
+            limiter = AsyncRateLimiter(config.async_requests_per_second, config.drive_request_burst, config.async_connections)
+            identity_client = AsyncDriveClient(identity.creds, session, limiter)
+        identity.limiters.append(identity_client.limiter)
+        clients[identity.name] = identity_client
+    return clients
+
+
+async def transfer_async(service, creds, source_folder_id, target_folder_id, download_path, large_files_path, size_threshold,
+                         items=None):
+    """
+    Transfers the source folder with config.async_max_in_flight files in flight at once,
+    all sharing a pool of config.async_connections keep-alive connections. Given the items
+    of a transfer plan, those are transferred instead of listing the source folder.
+
+    With config.lane_scheduler, files above size_threshold are streamed by
+    config.large_lane_workers separate workers, and the small files are taken
+    smallest first within each window of config.lane_sort_window files, see lanes.py.
+    """
+    subfolder_ids = create_subfolders(service, target_folder_id, SUBFOLDERS)
+    state = get_sync_state()
+    stats = TransferStats()
+    pending = asyncio.Queue(maxsize=config.async_max_in_flight * 2)
+    # Large files are few, an unbounded queue never holds up the small files behind them
+    large_pending = asyncio.Queue()
+    lanes = get_lane_scheduler(size_threshold, config.async_max_in_flight)
+
+    connector = aiohttp.TCPConnector(limit=config.async_connections, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=120)
+    limiter = AsyncRateLimiter(config.async_requests_per_second, config.drive_request_burst, config.async_connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        client = AsyncDriveClient(creds, session, limiter)
+        upload_clients = identity_clients(client, creds, session)
+        with create_face_pool(config.classification_workers) as face_pool:
+
+            async def worker(queue):
+                while (item := await queue.get()) is not None:
+                    try:
+                        ok = await transfer_file_async(client, creds, item, subfolder_ids, face_pool,
+                                                       download_path, large_files_path, size_threshold, upload_clients)
+                    except Exception as e:
+                        print(Fore.RED + f"✖ Failed to transfer '{item['name']}': {e}\n")
+                        ok = False
+                    stats.record(int(item.get('size', 0)), ok)
+
+            workers = [asyncio.create_task(worker(pending)) for _ in range(config.async_max_in_flight)]
+            large_workers = []
+            if lanes is not None:
+                large_workers = [asyncio.create_task(worker(large_pending)) for _ in range(lanes.large_workers)]
+            print(Fore.MAGENTA + f"🔍 Listing the source folder and transferring up to {config.async_max_in_flight} files at once...\n")
+            skipped = 0
+            try:
+                if items is not None and lanes is not None:
+                    for large, item in lanes.route(items):
+                        if large:
+                            large_pending.put_nowait(item)
+                        else:
+                            await pending.put(item)
+                elif items is not None:
+                    for item in items:
+                        await pending.put(item)
+                else:
+                    window = []
+                    async for item in client.walk(source_folder_id):
+                        if state is not None and state.is_synced(item):
+                            skipped += 1
+                            continue
+                        if lanes is None:
+                            await pending.put(item)
+                            continue
+                        for large, routed in lanes.place(item, window):
+                            if large:
+                                large_pending.put_nowait(routed)
+                            else:
+                                await pending.put(routed)
+                    if lanes is not None:
+                        for _, routed in lanes.flush(window):
+                            await pending.put(routed)
+            finally:
+                for _ in workers:
+                    await pending.put(None)
+                for _ in large_workers:
+                    large_pending.put_nowait(None)
+                await asyncio.gather(*workers, *large_workers)
+
+    if skipped:
+        print(Fore.CYAN + f"⏭ Skipped {skipped} files already transferred in an earlier run.\n")
+    stats.report("Async transfer")
+
+
+def run_async_transfer(service, creds, source_folder_id, target_folder_id, download_path, large_files_path, size_threshold,
+                       items=None):
+    """
+    Runs the asyncio transfer engine until the source folder has been transferred.
+
+    Parameters:
+        service: Authorized Google Drive service instance, used to create the subfolders.
+        creds (Credentials): Credentials whose access token authorizes the async requests.
+        source_folder_id (str): ID of the source Google Drive folder.
+        target_folder_id (str): ID of the target Google Drive folder.
+        download_path (str): Local path used to stage files.
+        large_files_path (str): Local path to save large files.
+        size_threshold (int): Maximum file size in bytes for immediate upload.
+        items (list or None): Source file resources to transfer instead of listing the folder.
+    """
+    try:
+        asyncio.run(transfer_async(service, creds, source_folder_id, target_folder_id, download_path,
+                                   large_files_path, size_threshold, items))
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred during the async transfer: {e}\n")
+        sys.exit(1)
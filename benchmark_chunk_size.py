@@ -0,0 +1,86 @@
+# benchmark_chunk_size.py
+
+import os
+import time
+import argparse
+import tempfile
+from google.oauth2.credentials import Credentials
+import config
+from drive_auth import build_service
+from fake_drive_server import FakeDrive, start_fake_drive
+from process_content import download_file
+from upload_sessions import UploadSessionStore, resumable_create
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+
+def run(drive, service, file_id, target_id, work_dir, source_path):
+    """
+    Downloads and uploads the test file once with the current config.
+
+    Returns:
+        tuple: (download seconds, download requests, upload seconds, upload requests)
+    """
+    file_size = os.path.getsize(source_path)
+    target = os.path.join(work_dir, 'downloaded.bin')
+    drive.reset_stats()
+    start = time.perf_counter()
+    if not download_file(service, file_id, 'downloaded.bin', target, file_size=file_size):
+        raise RuntimeError("download failed")
+    download = (time.perf_counter() - start, drive.stats()['requests'])
+    os.remove(target)
+
+    store = UploadSessionStore(os.path.join(work_dir, 'sessions.json'))
+    drive.reset_stats()
+    start = time.perf_counter()
+    resumable_create(service, {'name': 'uploaded.bin', 'parents': [target_id]}, source_path, 'benchmark', store,
+                     mime_type='application/octet-stream')
+    upload = (time.perf_counter() - start, drive.stats()['requests'])
+    return download + upload
+
+
+def main():
+    """
+    Compares fixed chunk sizes with adaptive chunk sizing for downloads and resumable
+    uploads against fake_drive_server.py with configurable latency and bandwidth.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark chunk sizes of downloads and resumable uploads.")
+    parser.add_argument('--size-mb', type=int, default=64, help="Size of the test file in MB.")
+    parser.add_argument('--latency-ms', type=float, default=100, help="Delay added to every request, in milliseconds.")
+    parser.add_argument('--bandwidth-mbps', type=float, default=50, help="Bandwidth of the endpoint, in MB/s.")
+    parser.add_argument('--fixed-mb', default='0.25,1,8,32', help="Comma separated fixed chunk sizes to test, in MB.")
+    args = parser.parse_args()
+
+    content = os.urandom(args.size_mb * 1024 * 1024)
+    drive = FakeDrive(args.latency_ms / 1000, args.bandwidth_mbps * 1024 * 1024)
+    file_id = drive.add_file('source.bin', 'application/octet-stream', drive.add_folder('source'), content)
+    target_id = drive.add_folder('target')
+    server, config.drive_api_base = start_fake_drive(drive)
+    service = build_service(Credentials(token='benchmark'))
+
+    setups = [(f'fixed {mb} MB', False, int(float(mb) * 1024 * 1024)) for mb in args.fixed_mb.split(',')]
+    setups.append(('adaptive', True, config.resumable_chunk_size))
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, 'source.bin')
+        with open(source_path, 'wb') as f:
+            f.write(content)
+        for name, adaptive, chunk_size in setups:
+            config.adaptive_chunk_size = adaptive
+            config.resumable_chunk_size = chunk_size
+            results.append((name, run(drive, service, file_id, target_id, work_dir, source_path)))
+    server.shutdown()
+
+    size_mb = len(content) / (1024 * 1024)
+    print(Fore.CYAN + f"\n📊 {size_mb:.0f} MB file, {args.latency_ms:.0f} ms per request, {args.bandwidth_mbps:.0f} MB/s\n")
+    print(Fore.CYAN + f"{'setup':<16}{'down MB/s':>11}{'requests':>10}{'up MB/s':>10}{'requests':>10}")
+    for name, (down_time, down_requests, up_time, up_requests) in results:
+        print(f"{name:<16}{size_mb / down_time:>11.1f}{down_requests:>10}{size_mb / up_time:>10.1f}{up_requests:>10}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# benchmark_face_detection.py
+
+import os
+import sys
+import time
+import argparse
+import cv2
+import config
+from face_detector import FaceDetector
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def count_faces_baseline(image_path, cascade_path='haarcascade_frontalface_default.xml'):
+    """
+    Counts faces exactly like the original group photo check: a new cascade per image,
+    full-resolution color decode and grayscale conversion.
+
+    Parameters:
+        image_path (str): Path to the image file.
+        cascade_path (str): File name of the Haar cascade XML file bundled with OpenCV.
+
+    Returns:
+        int or None: Number of faces detected, or None if the image could not be decoded.
+    """
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_path)
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(
+        gray_image,
+        scaleFactor=1.05,
+        minNeighbors=8,
+        minSize=(20, 20),
+        flags=cv2.CASCADE_SCALE_IMAGE
+    )
+    return len(faces)
+
+
+def time_counts(count, image_paths):
+    """
+    Runs a face counting function on every image.
+
+    Returns:
+        tuple: (face counts, seconds per image)
+    """
+    start = time.perf_counter()
+    counts = [count(path) for path in image_paths]
+    return counts, (time.perf_counter() - start) / max(len(image_paths), 1)
+
+
+def main():
+    """
+    Compares the original group photo check with FaceDetector at several decode
+    reductions on a folder of sample photos, reporting speed and face count changes.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the group photo face detection.")
+    parser.add_argument('image_dir', help="Folder containing sample photos, ideally real event shots.")
+    parser.add_argument('--reductions', default='1,2,4', help="Comma separated decode reductions to test (1, 2, 4, 8).")
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        os.path.join(args.image_dir, name) for name in os.listdir(args.image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not image_paths:
+        print(Fore.RED + f"✖ No images found in '{args.image_dir}'.")
+        sys.exit(1)
+
+    threshold = config.group_photo_threshold_person_count
+    print(Fore.MAGENTA + f"📷 Benchmarking face detection on {len(image_paths)} images (group threshold: {threshold} faces)\n")
+
+    baseline_counts, baseline_time = time_counts(count_faces_baseline, image_paths)
+    print(Fore.CYAN + f"{'setup':<24}{'ms/image':>10}{'speedup':>10}{'mean |Δ faces|':>16}{'same decision':>15}")
+    print(f"{'baseline':<24}{baseline_time * 1000:>10.1f}{1.0:>10.2f}{0.0:>16.2f}{100.0:>14.1f}%")
+
+    for reduction in (int(value) for value in args.reductions.split(',')):
+        detector = FaceDetector(
+            reduction=reduction,
+            scale_factor=config.face_detection_scale_factor,
+            min_neighbors=config.face_detection_min_neighbors,
+            min_size=config.face_detection_min_size,
+        )
+        counts, seconds = time_counts(detector.count_faces, image_paths)
+        pairs = [(a or 0, b or 0) for a, b in zip(baseline_counts, counts)]
+        mean_diff = sum(abs(a - b) for a, b in pairs) / len(pairs)
+        agreement = sum((a > threshold) == (b > threshold) for a, b in pairs) * 100 / len(pairs)
+        print(f"{'reduction ' + str(reduction):<24}{seconds * 1000:>10.1f}{baseline_time / seconds:>10.2f}"
+              f"{mean_diff:>16.2f}{agreement:>14.1f}%")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# benchmark_transfers.py
+
+import os
+import sys
+import time
+import random
+import resource
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+import cv2
+import numpy as np
+from google.oauth2.credentials import Credentials
+import config
+from fake_drive_server import FakeDrive, start_fake_drive
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+SCENARIOS = ('download', 'upload', 'upload_large')
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a list of values, or 0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(percent / 100 * len(values))) - 1))]
+
+
+def noise_jpeg(rng, side):
+    """
+    Encodes a square JPEG of random noise, which compresses poorly like a real photo.
+    """
+    pixels = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', pixels, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def populate(drive, args):
+    """
+    Fills the fake Drive with a source folder of images, videos and large videos, plus an
+    empty file, which takes a different path through resumable uploads.
+
+    Returns:
+        tuple: (source folder ID, target folder ID)
+    """
+    rng = np.random.default_rng(args.seed)
+    data_random = random.Random(args.seed)
+    source_id = drive.add_folder('source')
+    target_id = drive.add_folder('target')
+    for i in range(args.files):
+        if i % 4:
+            drive.add_file(f'image_{i:05d}.jpg', 'image/jpeg', source_id, noise_jpeg(rng, args.image_px))
+        else:
+            drive.add_file(f'video_{i:05d}.mp4', 'video/mp4', source_id, data_random.randbytes(args.file_kb * 1024))
+    drive.add_file('empty.jpg', 'image/jpeg', source_id, b'')
+    for i in range(args.large_files):
+        drive.add_file(f'large_{i:03d}.mp4', 'video/mp4', source_id, data_random.randbytes(args.large_mb * 1024 * 1024))
+    return source_id, target_id
+
+
+def run_scenario(name, folder_ids, paths, overrides, results):
+    """
+    Runs one scenario in a fresh process and reports its duration, the bytes it moved
+    and the peak memory of the process.
+    """
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    import drive_auth
+    import process_content
+    import upload_large_files
+
+    creds = Credentials(token='fake')
+    service = drive_auth.build_service(creds)
+    source_id, target_id = folder_ids
+    download_path, large_files_path = paths
+    if name == 'upload':
+        moved = sum(os.path.getsize(os.path.join(download_path, f)) for f in os.listdir(download_path))
+    elif name == 'upload_large':
+        moved = sum(os.path.getsize(os.path.join(large_files_path, f)) for f in os.listdir(large_files_path))
+
+    start = time.perf_counter()
+    # The tool prints a line per file, which would drown the results
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if name == 'download':
+            process_content.download_images_videos(service, source_id, download_path, large_files_path,
+                                                   config.size_threshold, creds=creds,
+                                                   max_workers=config.download_workers)
+        elif name == 'upload':
+            process_content.upload_to_drive(service, target_id, download_path)
+        else:
+            upload_large_files.upload_large_files(service, target_id, large_files_path)
+    seconds = time.perf_counter() - start
+
+    if name == 'download':
+        moved = sum(os.path.getsize(os.path.join(path, f)) for path in paths for f in os.listdir(path))
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    results.put({'seconds': seconds, 'bytes': moved, 'peak_rss': peak_rss})
+
+
+def main():
+    """
+    Measures download_images_videos, upload_to_drive and upload_large_files against a
+    local fake Drive with configurable latency, bandwidth and error rate, reporting
+    files/sec, MB/s, p50/p99 per-file latency, peak RSS and the requests sent.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark transfers against a local fake Google Drive.")
+    parser.add_argument('--files', type=int, default=200, help="Number of small files in the source folder.")
+    parser.add_argument('--image-px', type=int, default=512, help="Side of the random-noise JPEG images, in pixels.")
+    parser.add_argument('--file-kb', type=int, default=512, help="Size of each small video, in KB.")
+    parser.add_argument('--large-files', type=int, default=2, help="Number of files above the size threshold.")
+    parser.add_argument('--large-mb', type=int, default=64, help="Size of each large file, in MB.")
+    parser.add_argument('--latency-ms', type=float, default=50, help="Delay added to every request, in milliseconds.")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help="Bandwidth per connection in MB/s, 0 for unlimited.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 429 or 503.")
+    parser.add_argument('--retry-after', type=float, default=1, help="Retry-After of the injected 429 responses, in seconds.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma separated scenarios to run.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated files and injected errors.")
+    args = parser.parse_args()
+
+    drive = FakeDrive(args.latency_ms / 1000, args.bandwidth_mbps * 1024 * 1024 or None, args.error_rate,
+                      args.retry_after, seed=args.seed)
+    folder_ids = populate(drive, args)
+    server, base_url = start_fake_drive(drive)
+    context = multiprocessing.get_context('spawn')
+
+    print(Fore.MAGENTA + f"🏁 {args.files} files + {args.large_files} × {args.large_mb} MB, {args.latency_ms:.0f} ms per request, "
+                         f"{args.bandwidth_mbps or 'unlimited'} MB/s, {args.error_rate:.0%} errors\n")
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = (os.path.join(work_dir, 'downloaded_files'), os.path.join(work_dir, 'large_files'))
+        for path in paths:
+            os.makedirs(path)
+        overrides = {
+            'drive_api_base': base_url,
+            'size_threshold': args.large_mb * 1024 * 1024 // 2,
+            'incremental_sync': False,
+            'face_cache_enabled': False,
+            'upload_sessions_path': os.path.join(work_dir, 'upload_sessions.json'),
+            'sync_state_path': os.path.join(work_dir, 'sync_state.db'),
+        }
+        for name in args.scenarios.split(','):
+            if name not in SCENARIOS:
+                print(Fore.RED + f"✖ Unknown scenario '{name}', expected one of: {', '.join(SCENARIOS)}.")
+                sys.exit(1)
+            print(Fore.BLUE + f"⏳ Running '{name}'...")
+            drive.reset_stats()
+            results = context.Queue()
+            process = context.Process(target=run_scenario, args=(name, folder_ids, paths, overrides, results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(Fore.RED + f"✖ Scenario '{name}' failed with exit code {process.exitcode}.")
+                sys.exit(1)
+            rows.append((name, results.get(), drive.stats()))
+    server.shutdown()
+
+    print(Fore.CYAN + f"\n{'scenario':<14}{'files':>7}{'files/s':>9}{'MB/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+                      f"{'RSS MB':>8}{'requests':>10}{'errors':>8}")
+    for name, result, stats in rows:
+        latencies = stats['file_seconds']
+        seconds = result['seconds']
+        print(f"{name:<14}{len(latencies):>7}{len(latencies) / seconds:>9.1f}"
+              f"{result['bytes'] / (1024 * 1024) / seconds:>8.1f}"
+              f"{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 99) * 1000:>9.0f}"
+              f"{result['peak_rss'] / (1024 * 1024):>8.0f}{stats['requests']:>10}{stats['injected_errors']:>8}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# chunk_sizer.py
+
+import time
+import config
+
+# Drive requires every chunk but the last one of a resumable upload to be a multiple of 256 KB
+CHUNK_ALIGNMENT = 256 * 1024
+
+
+def align_up(size):
+    """
+    Rounds a size up to a multiple of 256 KB, with a minimum of 256 KB.
+    """
+    return max(CHUNK_ALIGNMENT, -(-size // CHUNK_ALIGNMENT) * CHUNK_ALIGNMENT)
+
+
+def chunk_ceiling(workers=None):
+    """
+    Returns the largest chunk a single transfer may use, so that all concurrent transfers
+    together stay within config.chunk_memory_budget.
+
+    Parameters:
+        workers (int or None): Number of concurrent transfers, defaults to
+            config.download_workers + config.upload_workers.
+
+    Returns:
+        int: Chunk size in bytes, a multiple of 256 KB.
+    """
+    workers = max(1, workers or config.download_workers + config.upload_workers)
+    ceiling = min(config.max_chunk_size, config.chunk_memory_budget // workers)
+    return max(CHUNK_ALIGNMENT, ceiling - ceiling % CHUNK_ALIGNMENT)
+
+
+class AdaptiveChunkSizer:
+    """
+    Picks the chunk size of a chunked download or upload from the file size and the
+    throughput measured on the chunks sent so far.
+
+    A transfer starts with config.min_chunk_size, or a single chunk for files smaller
+    than that. After every chunk, the next one is sized to take about
+    config.chunk_target_seconds at the measured throughput, so the fixed cost of each
+    round trip becomes small on slow or distant links. The size at most doubles per
+    chunk and never exceeds chunk_ceiling(workers).
+
+    With config.adaptive_chunk_size disabled, every chunk is config.resumable_chunk_size.
+    """
+
+    def __init__(self, file_size=None, workers=None):
+        self.adaptive = config.adaptive_chunk_size
+        self.ceiling = chunk_ceiling(workers)
+        if not self.adaptive:
+            self.chunk_size = align_up(config.resumable_chunk_size)
+        else:
+            self.chunk_size = min(align_up(config.min_chunk_size), self.ceiling)
+        if file_size:
+            self.chunk_size = min(self.chunk_size, align_up(file_size))
+        self.throughput = None
+        self.started_at = None
+
+    def start(self):
+        """
+        Marks the start of a chunk request.
+        """
+        self.started_at = time.monotonic()
+
+    def record(self, transferred):
+        """
+        Records the bytes moved by the chunk request started with start() and sizes the next chunk.
+
+        Parameters:
+            transferred (int): Number of bytes the chunk request moved.
+
+        Returns:
+            int: Size of the next chunk in bytes.
+        """
+        elapsed = max(time.monotonic() - self.started_at, 1e-3)
+        if not self.adaptive or transferred <= 0:
+            return self.chunk_size
+        throughput = transferred / elapsed
+        # Smooth out single slow or fast chunks
+        self.throughput = throughput if self.throughput is None else 0.5 * self.throughput + 0.5 * throughput
+        target = align_up(int(self.throughput * config.chunk_target_seconds))
+        self.chunk_size = max(CHUNK_ALIGNMENT, min(target, self.chunk_size * 2, self.ceiling))
+        return self.chunk_size
+
+
+class ProgressMilestones:
+    """
+    Limits progress output to every config.progress_step_percent percent of a transfer,
+    instead of one line per chunk.
+    """
+
+    def __init__(self, step=None):
+        self.step = step or config.progress_step_percent
+        self.last = 0
+
+    def crossed(self, fraction):
+        """
+        Returns the milestone percentage reached since the last call, or None if none was.
+
+        Parameters:
+            fraction (float): Transferred fraction of the file, between 0 and 1.
+        """
+        percent = int(fraction * 100) // self.step * self.step
+        if percent <= self.last:
+            return None
+        self.last = percent
+        return percent
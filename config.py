@@ -28,7 +28,8 @@ large_files_path = './large_files'
 
 # Size Threshold:
 # The maximum file size (in bytes) allowed for immediate upload.
-# Files exceeding this size will be moved to the large_files_path.
+# Files exceeding this size go to the large lane when lane_scheduler is True, and are moved
+# to the large_files_path for upload_large_files.py otherwise.
 # Default is set to 300 KB. You can modify this value as needed.
 size_threshold = 1 * 1024 * 1024 * 1024 # 1 GB  
 
@@ -37,4 +38,228 @@ size_threshold = 1 * 1024 * 1024 * 1024 # 1 GB
 clean_up_large_files_after_uploading = True
 clean_up_downloaded_files_after_uploading = True
 
-group_photo_threshold_person_count = 20
\ No newline at end of file
+group_photo_threshold_person_count = 20
+
+# Transfer Mode:
+# 'download' - Download every file locally and upload it to the target folder.
+# 'pipeline' - Stream files through download, classification and upload stages, so each file
+#              is uploaded as soon as it has been downloaded and classified.
+# 'watch'    - Keep running and transfer new files as they appear in the source folder, using the
+#              Drive Changes API instead of repeated full listings.
+# 'copy'     - Copy files into the target subfolders server-side with files().copy, so no
+#              bytes cross the local network link. Only images that need the group photo
+#              check are downloaded.
+# 'async'    - Transfer files like 'pipeline', but on an asyncio engine (aiohttp) that keeps
+#              hundreds of files in flight over a pool of keep-alive connections, see Async Engine.
+transfer_mode = 'download'
+
+# Group Photo Check In Copy Mode:
+# When True, images are downloaded temporarily in 'copy' mode so they can also be routed to
+# 'GroupPhotos'. Set to False to copy everything purely server-side and skip the face check.
+group_photo_check_in_copy_mode = True
+
+# Download Workers:
+# Number of files downloaded concurrently. Each worker builds its own Drive client, since the
+# underlying HTTP connection is not thread-safe. Set to 1 to download one file at a time.
+download_workers = 8
+
+# Upload Workers:
+# Number of files uploaded concurrently in 'pipeline' mode.
+upload_workers = 4
+
+# Pipeline Queue Size:
+# Maximum number of files waiting between two stages of the 'pipeline' mode. Keeps the number
+# of downloaded but not yet uploaded files bounded.
+pipeline_queue_size = 16
+
+# Stream Large Files:
+# When True, files exceeding size_threshold are piped from the source straight into a resumable
+# upload in the target folder instead of being staged in large_files_path for upload_large_files.py.
+# Memory use is bounded by (stream_ring_buffers + 2) * stream_chunk_size and no local disk is used.
+stream_large_files = False
+stream_chunk_size = 8 * 1024 * 1024  # 8 MB, rounded down to a multiple of 256 KB
+stream_ring_buffers = 4
+
+# Drive API Base URL:
+# Base URL of every Drive request. Point it at fake_drive_server.py to run the tool
+# against a local fake Drive.
+drive_api_base = 'https://www.googleapis.com'
+
+# Resumable Uploads:
+# Uploads are sent in chunks, see Adaptive Chunk Size below. When adaptive_chunk_size is False,
+# every chunk is resumable_chunk_size bytes (a multiple of 256 KB). After every chunk the session
+# URI and committed offset are saved to upload_sessions_path, so a restarted run continues an
+# interrupted upload from the last committed chunk instead of from byte 0.
+resumable_chunk_size = 32 * 1024 * 1024  # 32 MB
+upload_sessions_path = './upload_sessions.json'
+
+# Incremental Sync:
+# When True, every completed transfer is recorded in a SQLite database at sync_state_path with the
+# source file's md5Checksum and modifiedTime, the routing decision and the IDs of the target files.
+# Later runs skip source files that were already transferred and whose content has not changed since.
+incremental_sync = False
+sync_state_path = './sync_state.db'
+
+# Watch Poll Interval:
+# Seconds between two Changes API polls in 'watch' mode. Watch mode requires incremental_sync = True.
+watch_poll_interval = 10
+
+# Recursive Listing:
+# When True, images and videos in nested subfolders of the source folder are transferred too.
+# Subfolders are listed concurrently by listing_workers threads, 1000 files per request.
+recursive_listing = False
+listing_workers = 8
+
+# Extra Destination Policy:
+# A group photo belongs in 'GroupPhotos' as well as in 'DSLR', 'geotaged' or 'images':
+# 'upload'   - Upload the bytes again for every destination (default).
+# The other policies transfer the bytes once, into the latter, and satisfy the other destination
+# server-side:
+# 'shortcut' - Create a Drive shortcut to the file (no extra storage).
+# 'copy'     - Make a server-side copy (uses storage, but no upload bandwidth).
+extra_destination_policy = 'upload'
+
+# Face Detection:
+# Settings of the Haar cascade used for the group photo check. Images are decoded directly to
+# grayscale at 1/face_detection_reduction of their resolution (1, 2, 4 or 8), and the minimum face
+# size in pixels (measured at full resolution) is scaled to match. Run benchmark_face_detection.py
+# on a folder of sample photos to compare speed and face counts before changing these.
+face_detection_reduction = 2
+face_detection_scale_factor = 1.05
+face_detection_min_neighbors = 8
+face_detection_min_size = 20
+
+# Classification Workers:
+# Number of processes running face detection in parallel with the uploads. Each process loads its
+# own detector once. None uses one process per CPU core.
+classification_workers = None
+
+# Face Count Cache:
+# Face counts are cached in a SQLite database keyed by the image's MD5 (Drive's md5Checksum when
+# known) and the face detection settings. The count is cached rather than the group photo decision,
+# so changing group_photo_threshold_person_count needs no new detection. Once the cache holds more
+# than face_cache_max_entries entries, the least recently used ones are evicted.
+face_cache_enabled = True
+face_cache_path = './face_cache.db'
+face_cache_max_entries = 500000
+
+# Thumbnail Classification:
+# When True, the group photo check in 'copy' mode runs on Drive's thumbnail of each image, fetched
+# at thumbnail_size pixels on its longest side, instead of downloading the original. The minimum
+# face size is scaled down from the original's dimensions to the thumbnail's. If the face count
+# is within thumbnail_uncertainty (a fraction of group_photo_threshold_person_count) of the
+# threshold, the full image is downloaded and checked instead.
+thumbnail_classification = False
+thumbnail_size = 1600
+thumbnail_uncertainty = 0.25
+
+# EXIF Routing:
+# When True, images are routed to 'DSLR' or 'geotaged' by their EXIF data instead of their name.
+# Only the first exif_header_bytes of each image are read, from the local copy or with an HTTP
+# Range request in modes that do not download files. Photos taken with one of dslr_cameras go to
+# 'DSLR', other photos with a GPS position go to 'geotaged'. An entry of dslr_cameras is a camera
+# make, matching the start of the EXIF make, or a (make, model prefixes) pair for makers that also
+# build phones, so their phones are not taken for cameras.
+# Images without EXIF data fall back to the name checks ('DSC' for DSLR, 'GPS' for geotaged).
+exif_routing = False
+exif_header_bytes = 64 * 1024
+dslr_cameras = [
+    'Canon', 'Nikon', 'Fujifilm', 'Olympus', 'OM Digital', 'Pentax', 'Ricoh', 'Leica', 'Sigma', 'Hasselblad',
+    ('Sony', ['ILCE-', 'ILCA-', 'NEX-', 'SLT-', 'DSLR-', 'DSC-']),
+    ('Panasonic', ['DC-', 'DMC-']),
+]
+
+# Adaptive Chunk Size:
+# When True, chunked downloads and resumable uploads size each chunk from the measured throughput,
+# so that one chunk takes about chunk_target_seconds. Transfers start at min_chunk_size (or a single
+# chunk for smaller files) and the chunk size at most doubles per chunk, up to max_chunk_size.
+# chunk_memory_budget caps the chunks of all download_workers and upload_workers together, since
+# each chunk is held in memory. Progress is printed every progress_step_percent percent.
+adaptive_chunk_size = True
+min_chunk_size = 1 * 1024 * 1024  # 1 MB
+max_chunk_size = 256 * 1024 * 1024  # 256 MB
+chunk_memory_budget = 1024 * 1024 * 1024  # 1 GB
+chunk_target_seconds = 2
+progress_step_percent = 25
+
+# Rate Limiting:
+# Every Drive call goes through one shared scheduler. A token bucket caps the request rate at
+# drive_requests_per_second, with bursts of up to drive_request_burst requests. The number of calls
+# in flight starts at drive_max_concurrency, is halved when Drive throttles (429 or a 403
+# userRateLimitExceeded/rateLimitExceeded, at most once per rate_limit_decrease_interval seconds)
+# and grows by one after each window of successful calls. Throttled calls, server errors and dropped
+# connections are retried up to drive_max_retries times with exponential backoff and jitter, starting
+# at rate_limit_base_backoff and capped at rate_limit_max_backoff seconds. A Retry-After header
+# pauses all calls for the requested time.
+drive_requests_per_second = 20
+drive_request_burst = 40
+drive_max_concurrency = 16
+drive_max_retries = 6
+rate_limit_base_backoff = 1
+rate_limit_max_backoff = 64
+rate_limit_decrease_interval = 2
+
+# Async Engine:
+# Settings of transfer_mode 'async'. Up to async_max_in_flight files are downloaded, classified and
+# uploaded at once, sharing a pool of async_connections keep-alive connections. Requests are capped
+# at async_requests_per_second, with the same throttling, backoff and Retry-After handling as the
+# other modes. Files up to async_multipart_threshold are uploaded with a single multipart request
+# instead of a resumable session.
+async_max_in_flight = 256
+async_connections = 128
+async_requests_per_second = 100
+async_multipart_threshold = 5 * 1024 * 1024  # 5 MB
+
+# Staging Area:
+# Downloaded files are staged in download_path under their Drive file ID, so files with the
+# same name in different source folders never overwrite each other. Each file is deleted as
+# soon as all of its uploads are confirmed, when clean_up_downloaded_files_after_uploading is True.
+# staging_disk_budget caps the bytes staged at once: downloads wait while it is full, and the
+# 'download' mode transfers the source folder in batches that fit it. Set it to 0 for no limit.
+# Large files in large_files_path are not counted, set stream_large_files to keep them off the disk.
+staging_disk_budget = 0  # e.g. 20 * 1024 ** 3 for 20 GB
+
+# Preflight Plan:
+# When True, the source folder is listed once before anything is transferred, and the plan is
+# printed: files and bytes per destination subfolder, extra placements, files whose content is
+# uploaded twice, and the storage needed compared with the free storage of the target account.
+# The run aborts if the transfer would not fit, and otherwise transfers the planned files.
+# With dry_run = True, the plan is printed and nothing is transferred, even when preflight_plan is False.
+preflight_plan = False
+dry_run = False
+
+# Target Deduplication:
+# When True, the target subfolders are listed in bulk once at startup into an index of the content
+# (md5Checksum and size) they already hold. A source file whose content is already in the target is
+# not downloaded or uploaded again, including repeated photos within the same source folder.
+# dedup_policy decides what happens to such a duplicate:
+# 'skip' - Leave the target as it is.
+# 'link' - Add a shortcut under the duplicate's own name next to each existing copy.
+target_dedup = False
+dedup_policy = 'skip'
+
+# Credential Pool:
+# Extra identities to spread uploads and server-side copies across. Drive throttles requests and
+# caps uploads at about 750 GB per day for each user, so every identity adds its own rate limit and
+# daily cap. token.json is always the first identity. Each entry is the path of an authorized-user
+# token file (like token.json), the path of a service account key file, or a (key file, user email)
+# tuple for a service account impersonating a user through domain-wide delegation. Every identity
+# needs read access to the source folder and write access to the target folder, and the files it
+# uploads count against its own storage quota.
+# Each file goes to the identity with the fewest bytes so far. Identities throttled by Drive within
+# the last credential_throttle_cooldown seconds get no new files while others are available, and
+# identities that uploaded daily_upload_limit bytes today (UTC) get none until the next day.
+credential_files = []  # e.g. ['token_backup.json', ('service_account.json', 'archive@example.com')]
+credential_throttle_cooldown = 60
+daily_upload_limit = 750 * 1024 ** 3  # 750 GB, 0 for no limit
+
+# Lane Scheduler:
+# When True, files are transferred in two lanes with their own workers: small files and files
+# exceeding size_threshold. Files are routed as the source folder is listed. The small lane has
+# download_workers workers (async_max_in_flight in 'async' mode) and sorts its files smallest first
+# within each window of lane_sort_window listed files, so most photos are done early. The large lane
+# has large_lane_workers workers that stream their files straight into the target, so a few huge
+# videos never hold up the photos and no manual upload_large_files.py run is needed.
+lane_scheduler = False
+large_lane_workers = 2
+lane_sort_window = 100
@@ -0,0 +1,312 @@
+# credential_pool.py
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+import config
+from rate_limiter import DriveRateLimiter, get_rate_limiter, scoped_rate_limiter
+from sync_state import get_sync_state
+from drive_auth import get_worker_service
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+SCOPES = ['https://www.googleapis.com/auth/drive']
+
+# Shared pool, see get_credential_pool()
+_pool = None
+_pool_lock = threading.Lock()
+
+# Identity the calling thread uploads with, see assign_identity()
+_assigned = threading.local()
+
+
+def load_identity_credentials(entry):
+    """
+    Loads the credentials of one entry of config.credential_files.
+
+    Parameters:
+        entry (str or tuple): Path of an authorized-user token file or of a service account
+            key file, or a (key file, user email) tuple for a service account that
+            impersonates the user through domain-wide delegation.
+
+    Returns:
+        tuple: (name, credentials, token path or None), the token path being where
+        refreshed user tokens are saved.
+    """
+    path, subject = (entry, None) if isinstance(entry, str) else entry
+    with open(path, 'r') as f:
+        info = json.load(f)
+    if info.get('type') == 'service_account':
+        creds = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+        if subject:
+            return subject, creds.with_subject(subject), None
+        return info.get('client_email', path), creds, None
+    return path, Credentials.from_authorized_user_info(info, SCOPES), path
+
+
+class Identity:
+    """
+    One account of the credential pool. Drive throttles requests and caps uploads per
+    user, so every identity has its own rate limiter and its own daily upload count.
+    """
+
+    def __init__(self, name, creds, token_path=None, limiter=None):
+        self.name = name
+        self.creds = creds
+        self.token_path = token_path
+        # The async engine adds its own limiter, see async_drive.transfer_async()
+        self.limiters = [limiter or DriveRateLimiter(
+            config.drive_requests_per_second,
+            config.drive_request_burst,
+            config.drive_max_concurrency,
+            config.drive_max_retries,
+        )]
+        self.assigned_bytes = 0
+        self.pending_bytes = 0
+        self.uploaded_today = 0
+        self.exhausted = False
+        self.lock = threading.Lock()
+
+    @property
+    def limiter(self):
+        return self.limiters[0]
+
+    def credentials(self):
+        """
+        Returns the credentials of the identity, refreshing the access token first when
+        it has expired or is about to, so long runs never start a file with a stale
+        token. Refreshed user tokens are saved back to their file.
+
+        Returns:
+            Credentials: Valid credentials.
+        """
+        with self.lock:
+            if not self.creds.valid:
+                self.creds.refresh(Request())
+                if self.token_path:
+                    with open(self.token_path, 'w') as token:
+                        token.write(self.creds.to_json())
+        return self.creds
+
+    def throttled(self):
+        """
+        Checks whether Drive throttled this identity within the last
+        config.credential_throttle_cooldown seconds.
+        """
+        now = time.monotonic()
+        return any(limiter.decreased_at and now - limiter.decreased_at < config.credential_throttle_cooldown
+                   for limiter in self.limiters)
+
+
+class CredentialPool:
+    """
+    Spreads uploads and server-side copies over several identities, so a run is not
+    bound by the rate limit and the daily upload cap of a single account.
+
+    Each file goes to the identity with the fewest bytes assigned so far, which keeps the
+    byte load balanced whatever the mix of file sizes. Identities that Drive is throttling
+    get no new files until the cooldown has passed, unless all of them are throttled, and
+    identities that reached config.daily_upload_limit get none until the next UTC day.
+    Bytes count against the limit once they reached the target, see release(). With
+    config.incremental_sync, the bytes of each day are kept in the sync state, so they
+    add up across runs.
+    """
+
+    def __init__(self, identities):
+        self.identities = identities
+        self.state = get_sync_state()
+        self.day = None
+        self.warned = False
+        self.lock = threading.Lock()
+
+    def usage_key(self, identity):
+        return f"daily_upload|{identity.name}|{self.day}"
+
+    def roll_day(self):
+        """
+        Loads the bytes each identity uploaded today, starting over on a new UTC day.
+        """
+        day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        if day == self.day:
+            return
+        self.day = day
+        for identity in self.identities:
+            saved = self.state.get_value(self.usage_key(identity)) if self.state is not None else None
+            identity.uploaded_today = int(saved or 0)
+            identity.exhausted = False
+
+    def pick(self, num_bytes):
+        """
+        Assigns a file to an identity. Its bytes are held against the daily upload limit
+        of the identity until release() is called.
+
+        Parameters:
+            num_bytes (int): Bytes the file adds to the target.
+
+        Returns:
+            Identity: The identity that uploads the file.
+        """
+        with self.lock:
+            self.roll_day()
+            limit = config.daily_upload_limit
+            available = []
+            for identity in self.identities:
+                if limit and identity.uploaded_today + identity.pending_bytes + num_bytes > limit:
+                    if not identity.exhausted:
+                        print(Fore.YELLOW + f"⚠ '{identity.name}' reached the daily upload limit, "
+                                            f"its files go to the other identities.")
+                        identity.exhausted = True
+                    continue
+                available.append(identity)
+            if not available:
+                if not self.warned:
+                    print(Fore.YELLOW + "⚠ Every identity reached the daily upload limit, Drive may reject further uploads.")
+                    self.warned = True
+                available = self.identities
+            identity = min([i for i in available if not i.throttled()] or available, key=lambda i: i.assigned_bytes)
+            identity.assigned_bytes += num_bytes
+            identity.pending_bytes += num_bytes
+            return identity
+
+    def release(self, identity, num_bytes, uploaded_bytes):
+        """
+        Ends the assignment of a file and counts the bytes that reached the target
+        against the daily upload limit of the identity.
+
+        Parameters:
+            identity (Identity): Identity returned by pick().
+            num_bytes (int): Bytes passed to pick().
+            uploaded_bytes (int): Bytes that were uploaded or copied, 0 when the transfer failed.
+        """
+        with self.lock:
+            identity.pending_bytes -= num_bytes
+            identity.assigned_bytes -= num_bytes - uploaded_bytes
+            if not uploaded_bytes:
+                return
+            self.roll_day()
+            identity.uploaded_today += uploaded_bytes
+            if self.state is not None:
+                self.state.set_value(self.usage_key(identity), str(identity.uploaded_today))
+
+    def report(self):
+        """
+        Prints the bytes assigned to each identity in this run.
+        """
+        print(Fore.CYAN + "🔑 Uploads per identity:")
+        for identity in self.identities:
+            print(f"   {identity.name:<40}{identity.assigned_bytes / (1024 ** 2):>12.1f} MB")
+        print()
+
+
+def load_credential_pool(creds):
+    """
+    Builds the shared pool from the main credentials and the extra identities of
+    config.credential_files, when there are any.
+
+    Parameters:
+        creds (Credentials): Credentials loaded from token.json, the first identity of the pool.
+    """
+    global _pool
+    if not config.credential_files:
+        return
+    with _pool_lock:
+        if _pool is not None:
+            return
+        # The main identity keeps the shared limiter the listing and downloads go through
+        identities = [Identity('token.json', creds, 'token.json', get_rate_limiter())]
+        for entry in config.credential_files:
+            try:
+                name, identity_creds, token_path = load_identity_credentials(entry)
+            except Exception as e:
+                print(Fore.RED + f"✖ Could not load the credentials '{entry}': {e}")
+                sys.exit(1)
+            identities.append(Identity(name, identity_creds, token_path))
+        _pool = CredentialPool(identities)
+        print(Fore.GREEN + f"✔ Loaded {len(identities)} identities to spread uploads across.\n")
+
+
+def get_credential_pool():
+    """
+    Returns the credential pool, or None when config.credential_files is empty or the
+    pool has not been loaded yet, see load_credential_pool().
+
+    Returns:
+        CredentialPool or None: Shared pool.
+    """
+    return _pool
+
+
+@contextmanager
+def assign_identity(num_bytes):
+    """
+    Assigns an upload or copy to an identity of the pool. Inside the block, the Drive
+    calls of the calling thread go through the rate limiter of the identity, and the
+    bytes passed to record_upload() count against its daily upload limit.
+
+    Parameters:
+        num_bytes (int): Bytes the file adds to the target.
+
+    Yields:
+        Identity or None: The assigned identity, None without a pool.
+    """
+    pool = _pool
+    if pool is None:
+        yield None
+        return
+    identity = pool.pick(num_bytes)
+    previous = (getattr(_assigned, 'identity', None), getattr(_assigned, 'uploaded', 0))
+    _assigned.identity, _assigned.uploaded = identity, 0
+    try:
+        with scoped_rate_limiter(identity.limiter):
+            yield identity
+    finally:
+        pool.release(identity, num_bytes, _assigned.uploaded)
+        _assigned.identity, _assigned.uploaded = previous
+
+
+def record_upload(num_bytes):
+    """
+    Records bytes that reached the target for the identity the calling thread uploads
+    with. Does nothing outside assign_identity().
+
+    Parameters:
+        num_bytes (int): Bytes uploaded or copied.
+    """
+    if getattr(_assigned, 'identity', None) is not None:
+        _assigned.uploaded += num_bytes
+
+
+@contextmanager
+def upload_service(service, num_bytes):
+    """
+    Picks the Drive service that uploads or copies a file. With a credential pool, the
+    file is assigned to one of its identities, see assign_identity(), and the calls of
+    the calling thread go through that identity's rate limiter inside the block. The
+    bytes count against its daily upload limit once passed to record_upload().
+
+    Parameters:
+        service: Service used without a credential pool.
+        num_bytes (int): Bytes the file adds to the target, see process_content.placed_bytes().
+
+    Yields:
+        service: Authorized Google Drive service instance.
+    """
+    with assign_identity(num_bytes) as identity:
+        yield service if identity is None else get_worker_service(identity.credentials())
+
+
+def assigned_identity_name():
+    """
+    Returns the name of the identity the calling thread uploads with, or None outside
+    assign_identity().
+    """
+    identity = getattr(_assigned, 'identity', None)
+    return identity.name if identity is not None else None
@@ -0,0 +1,143 @@
+# drive_auth.py
+
+import os
+import sys
+import json
+import threading
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+import config
+from stream_transfer import authorized_http
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Per-thread Drive clients, see get_worker_service()
+_worker_local = threading.local()
+
+
+def load_credentials(creds_file):
+    """
+    Loads, refreshes or creates the OAuth credentials used to access Google Drive.
+
+    Parameters:
+        creds_file (str): Path to the credentials JSON file.
+
+    Returns:
+        Credentials: Valid OAuth credentials.
+    """
+    SCOPES = ['https://www.googleapis.com/auth/drive']
+    creds = None
+    try:
+        if os.path.exists('token.json'):
+            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+            print(Fore.GREEN + "✔ Loaded existing credentials from 'token.json'.")
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                print(Fore.GREEN + "🔄 Refreshed expired credentials.")
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
+                creds = flow.run_local_server(port=0)
+                print(Fore.GREEN + "✔ Authenticated new credentials.")
+            # Save the credentials for the next run
+            with open('token.json', 'w') as token:
+                token.write(creds.to_json())
+                print(Fore.GREEN + "💾 Saved new credentials to 'token.json'.")
+        return creds
+    except FileNotFoundError:
+        print(Fore.RED + f"✖ Error: Credentials file '{creds_file}' not found.")
+        sys.exit(1)
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred during authentication: {e}")
+        sys.exit(1)
+
+
+def build_service(creds):
+    """
+    Builds a Google Drive service object from credentials.
+
+    Each service owns its own httplib2 connection, which is not thread-safe, so every
+    thread that talks to Drive needs its own service.
+
+    When config.drive_api_base points somewhere other than Google, such as the local
+    fake_drive_server.py, every URL of the service is rewritten to it.
+
+    Parameters:
+        creds (Credentials): Valid OAuth credentials.
+
+    Returns:
+        service: Authorized Google Drive service instance.
+    """
+    document = json.loads(get_static_doc('drive', 'v3'))
+    root_url = config.drive_api_base.rstrip('/') + '/'
+    if root_url == document['rootUrl']:
+        return build('drive', 'v3', credentials=creds)
+    # Media uploads and batch requests are built from rootUrl, which client_options cannot override
+    document['rootUrl'] = document['mtlsRootUrl'] = root_url
+    document['baseUrl'] = root_url + document['servicePath']
+    return build_from_document(document, credentials=creds)
+
+
+def authenticate_drive(creds_file, creds=None):
+    """
+    Authenticates and returns the Google Drive service object.
+    
+    Parameters:
+        creds_file (str): Path to the credentials JSON file.
+        creds (Credentials or None): Already loaded credentials, loaded from creds_file if None.
+        
+    Returns:
+        service: Authorized Google Drive service instance.
+    """
+    if creds is None:
+        creds = load_credentials(creds_file)
+    try:
+        service = build_service(creds)
+        print(Fore.GREEN + "✔ Google Drive service built successfully.\n")
+        return service
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred during authentication: {e}")
+        sys.exit(1)
+
+
+def get_worker_service(creds):
+    """
+    Returns the Google Drive service owned by the calling worker thread for the given
+    credentials, building it on first use.
+
+    Parameters:
+        creds (Credentials): Valid OAuth credentials.
+
+    Returns:
+        service: Authorized Google Drive service instance for this thread.
+    """
+    if not hasattr(_worker_local, 'services'):
+        _worker_local.services = {}
+    service = _worker_local.services.get(id(creds))
+    if service is None:
+        service = _worker_local.services[id(creds)] = build_service(creds)
+    return service
+
+
+def get_worker_http(creds):
+    """
+    Returns the authorized HTTP client for raw Drive requests owned by the calling
+    worker thread for the given credentials, building it on first use.
+
+    Parameters:
+        creds (Credentials): Valid OAuth credentials.
+
+    Returns:
+        AuthorizedHttp: HTTP client for this thread.
+    """
+    if not hasattr(_worker_local, 'https'):
+        _worker_local.https = {}
+    http = _worker_local.https.get(id(creds))
+    if http is None:
+        http = _worker_local.https[id(creds)] = authorized_http(creds)
+    return http
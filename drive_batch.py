@@ -0,0 +1,134 @@
+# drive_batch.py
+
+from rate_limiter import get_rate_limiter, is_retryable, is_throttled
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+class DriveBatch:
+    """
+    Groups small Drive metadata requests, such as folder lookups, folder creation,
+    parent updates or existence checks, into batch HTTP requests of up to 100 calls.
+
+    Every request gets its own callback, so a failing item does not fail the batch.
+    Items that fail with a retryable error, such as throttling, are sent again in a
+    smaller batch after a backoff. Errors that remain are collected in self.errors as
+    (label, exception) pairs.
+    """
+
+    # Drive accepts at most 100 calls in a single batch request
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, service, max_batch_size=MAX_BATCH_SIZE):
+        self.service = service
+        self.max_batch_size = min(max_batch_size, self.MAX_BATCH_SIZE)
+        self.pending = []
+        self.errors = []
+
+    def add(self, request, callback=None, label=None):
+        """
+        Queues a request, sending the queued batch once it is full.
+
+        Parameters:
+            request (HttpRequest): Request built from the service, not yet executed.
+            callback (callable or None): Called as callback(response) when the request succeeds.
+            label (str or None): Description of the request used in error output.
+        """
+        self.pending.append((request, callback, label))
+        if len(self.pending) >= self.max_batch_size:
+            self.execute()
+
+    def execute(self):
+        """
+        Sends all queued requests.
+
+        Returns:
+            list: (label, exception) pairs of the requests that failed in this call.
+        """
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, []
+        limiter = get_rate_limiter()
+        failed = []
+        attempt = 0
+
+        while pending:
+            retry = []
+
+            def handle(request_id, response, exception, pending=pending, retry=retry):
+                entry = pending[int(request_id)]
+                request, callback, label = entry
+                if exception is not None:
+                    limiter.observe(is_throttled(exception))
+                    if is_retryable(exception, request.method != 'POST') and attempt < limiter.max_retries:
+                        retry.append((entry, exception))
+                        return
+                    failed.append((label, exception))
+                    print(Fore.RED + f"✖ Batched request '{label}' failed: {exception}")
+                elif callback is not None:
+                    callback(response)
+
+            batch = self.service.new_batch_http_request(callback=handle)
+            for i, (request, _, _) in enumerate(pending):
+                batch.add(request, request_id=str(i))
+            # A failed batch may have run some of its requests, creations are resent only when throttled
+            limiter.call(batch.execute, cost=len(pending),
+                         idempotent=all(request.method != 'POST' for request, _, _ in pending))
+            if retry:
+                limiter.backoff(attempt, retry[0][1])
+                attempt += 1
+            pending = [entry for entry, _ in retry]
+        self.errors.extend(failed)
+        return failed
+
+
+def find_or_create_folders(service, parent_folder_id, names):
+    """
+    Looks up folders by name inside a parent folder and creates the missing ones,
+    using one batch request for all lookups and one for all creations.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        parent_folder_id (str): ID of the parent Google Drive folder.
+        names (list): Folder names to look up or create.
+
+    Returns:
+        tuple: (folder_ids, created, errors) where folder_ids maps names to folder IDs,
+        created is the set of names that had to be created and errors lists
+        (label, exception) pairs of the requests that failed.
+    """
+    folder_ids = {}
+    batch = DriveBatch(service)
+
+    for name in names:
+        query = f"mimeType = '{FOLDER_MIME_TYPE}' and name = '{name}' and '{parent_folder_id}' in parents and trashed = false"
+
+        def found(response, name=name):
+            files = response.get('files', [])
+            if files:
+                folder_ids[name] = files[0]['id']
+
+        batch.add(service.files().list(q=query, fields="files(id, name)"), found, label=f"find {name}")
+    batch.execute()
+
+    created = set()
+    for name in names:
+        if name in folder_ids or any(label == f"find {name}" for label, _ in batch.errors):
+            continue
+        file_metadata = {
+            'name': name,
+            'mimeType': FOLDER_MIME_TYPE,
+            'parents': [parent_folder_id]
+        }
+
+        def made(response, name=name):
+            folder_ids[name] = response.get('id')
+            created.add(name)
+
+        batch.add(service.files().create(body=file_metadata, fields='id'), made, label=f"create {name}")
+    batch.execute()
+    return folder_ids, created, batch.errors
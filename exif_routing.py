@@ -0,0 +1,165 @@
+# exif_routing.py
+
+import io
+from PIL import Image
+from PIL.ExifTags import TAGS
+import config
+from stream_transfer import download_range
+
+# Reverse lookup of PIL's tag names, e.g. 'Make' -> 0x010F
+EXIF_TAG_IDS = {name: tag for tag, name in TAGS.items()}
+
+# TIFF byte order marks, used by raw formats such as NEF, CR2 or DNG
+TIFF_HEADERS = (b'II*\x00', b'MM\x00*')
+
+
+def find_exif_segment(data):
+    """
+    Finds the EXIF APP1 segment in the beginning of a JPEG file.
+
+    Only the marker headers are walked, no image data is decoded, so the segment can be
+    found in a truncated file as long as it starts within the given bytes.
+
+    Parameters:
+        data (bytes): First bytes of a JPEG file.
+
+    Returns:
+        bytes or None: The segment starting with 'Exif\\0\\0', or None if there is none.
+    """
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of the compressed data, EXIF always comes before
+            return None
+        length = int.from_bytes(data[offset + 2:offset + 4], 'big')
+        segment = data[offset + 4:offset + 2 + length]
+        if marker == 0xE1 and segment.startswith(b'Exif\x00\x00'):
+            return segment
+        offset += 2 + length
+    return None
+
+
+def parse_exif(data):
+    """
+    Extracts the routing relevant EXIF fields from the first bytes of an image.
+
+    Parameters:
+        data (bytes): First bytes of an image file, see config.exif_header_bytes.
+
+    Returns:
+        dict or None: 'make', 'model' and 'gps' of the image, or None if no EXIF block was
+        found in the given bytes.
+    """
+    exif = Image.Exif()
+    try:
+        if data.startswith(b'\xff\xd8'):
+            segment = find_exif_segment(data)
+            if segment is None:
+                return None
+            exif.load(segment)
+        elif data.startswith(TIFF_HEADERS):
+            exif.load(data)
+        else:
+            # Other formats (PNG, WebP, HEIF with a plugin) are left to PIL's own parser
+            with Image.open(io.BytesIO(data)) as image:
+                exif = image.getexif()
+        if not exif:
+            return None
+        gps = exif.get_ifd(EXIF_TAG_IDS['GPSInfo'])
+    except Exception:
+        # Truncated or malformed EXIF is treated as missing
+        return None
+    return {
+        'make': str(exif.get(EXIF_TAG_IDS['Make'], '')).strip('\x00 '),
+        'model': str(exif.get(EXIF_TAG_IDS['Model'], '')).strip('\x00 '),
+        # A GPS IFD holding only the version tag carries no position
+        'gps': any(tag in gps for tag in (2, 4)),
+    }
+
+
+def read_exif_file(file_path, header_bytes=None):
+    """
+    Reads the EXIF fields of a local image from its first bytes only.
+
+    Parameters:
+        file_path (str): Path to the image file.
+        header_bytes (int or None): Number of bytes to read, defaults to config.exif_header_bytes.
+
+    Returns:
+        dict or None: EXIF fields as returned by parse_exif().
+    """
+    with open(file_path, 'rb') as f:
+        return parse_exif(f.read(header_bytes or config.exif_header_bytes))
+
+
+def fetch_exif(http, file_id, file_size, header_bytes=None):
+    """
+    Reads the EXIF fields of a Google Drive image with a single Range request.
+
+    Parameters:
+        http: Authorized HTTP client.
+        file_id (str): ID of the Google Drive file.
+        file_size (int): Size of the file in bytes.
+        header_bytes (int or None): Number of bytes to fetch, defaults to config.exif_header_bytes.
+
+    Returns:
+        dict or None: EXIF fields as returned by parse_exif().
+    """
+    if file_size <= 0:
+        return None
+    end = min(header_bytes or config.exif_header_bytes, file_size) - 1
+    return parse_exif(download_range(http, file_id, 0, end))
+
+
+def is_dslr(make, model):
+    """
+    Checks whether a camera make and model match an entry of config.dslr_cameras.
+
+    An entry is either a make, for makers that only build cameras, or a (make, model
+    prefixes) pair for makers that also build phones, such as Sony or Panasonic. Makes
+    match the start of the EXIF make, as makers add suffixes like 'CORPORATION'.
+
+    Parameters:
+        make (str): EXIF camera make.
+        model (str): EXIF camera model.
+
+    Returns:
+        bool: True if the camera is a DSLR or mirrorless camera.
+    """
+    make, model = make.lower(), model.lower()
+    if not make:
+        return False
+    for entry in config.dslr_cameras:
+        dslr_make, models = (entry, None) if isinstance(entry, str) else entry
+        if not make.startswith(dslr_make.lower()):
+            continue
+        if models is None or any(model.startswith(prefix.lower()) for prefix in models):
+            return True
+    return False
+
+
+def exif_subfolder(exif):
+    """
+    Picks the image subfolder from EXIF fields.
+
+    Photos taken with a camera listed in config.dslr_cameras go to 'DSLR', other photos
+    with a GPS position go to 'geotaged' and the rest to 'images'.
+
+    Parameters:
+        exif (dict): EXIF fields as returned by parse_exif().
+
+    Returns:
+        str: Subfolder name.
+    """
+    if is_dslr(exif['make'], exif.get('model', '')):
+        return 'DSLR'
+    if exif['gps']:
+        return 'geotaged'
+    return 'images'
@@ -0,0 +1,101 @@
+# face_cache.py
+
+import time
+import hashlib
+import sqlite3
+import threading
+import config
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Shared cache, see get_face_cache()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def file_md5(file_path):
+    """
+    Computes the MD5 hash of a local file, which matches Drive's md5Checksum for the same bytes.
+
+    Parameters:
+        file_path (str): Path to the file.
+
+    Returns:
+        str: Hex digest of the file content.
+    """
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FaceCountCache:
+    """
+    SQLite cache of face counts keyed by image content hash and detector settings.
+
+    The face count is stored rather than the group photo decision, so changing
+    config.group_photo_threshold_person_count needs no new detection. When the cache
+    grows past max_entries, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS faces (key TEXT PRIMARY KEY, face_count INTEGER, last_used REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS faces_last_used ON faces (last_used)")
+
+    @staticmethod
+    def cache_key(content_hash, params_key):
+        return f"{content_hash}|{params_key}"
+
+    def get(self, content_hash, params_key):
+        """
+        Returns the cached face count of an image, or None if it was never counted with these settings.
+        """
+        key = self.cache_key(content_hash, params_key)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT face_count FROM faces WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE faces SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, content_hash, params_key, face_count):
+        """
+        Stores the face count of an image, evicting the least recently used entries when full.
+        """
+        key = self.cache_key(content_hash, params_key)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO faces VALUES (?, ?, ?)", (key, face_count, time.time()))
+            (entries,) = self.conn.execute("SELECT COUNT(*) FROM faces").fetchone()
+            if entries > self.max_entries:
+                # Evict a tenth at a time so a full cache does not evict on every insert
+                evict = entries - int(self.max_entries * 0.9)
+                self.conn.execute(
+                    "DELETE FROM faces WHERE key IN (SELECT key FROM faces ORDER BY last_used LIMIT ?)", (evict,)
+                )
+
+
+def get_face_cache():
+    """
+    Returns the face count cache shared by all threads, or None when the cache is disabled in config.
+
+    Returns:
+        FaceCountCache or None: Cache backed by config.face_cache_path.
+    """
+    global _cache
+    if not config.face_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = FaceCountCache(config.face_cache_path, config.face_cache_max_entries)
+            print(Fore.GREEN + f"✔ Loaded face count cache from '{config.face_cache_path}'.\n")
+        return _cache
@@ -0,0 +1,192 @@
+# face_detector.py
+
+import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import config
+
+# Decode modes that let the JPEG decoder skip work by producing a smaller grayscale image directly
+REDUCED_GRAYSCALE_MODES = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Detector owned by a classification worker process, see init_face_worker()
+_worker_detector = None
+
+
+def detector_params_key(cascade_path, reduction, scale_factor, min_neighbors, min_size):
+    """
+    Builds a string identifying a set of detector settings, used to key cached face counts.
+    """
+    return f"{cascade_path}|r{reduction}|s{scale_factor}|n{min_neighbors}|m{min_size}"
+
+
+def configured_params_key(cascade_path='haarcascade_frontalface_default.xml'):
+    """
+    Returns the settings key of the detector configured in config.py, without loading it.
+    """
+    return detector_params_key(
+        cascade_path,
+        config.face_detection_reduction,
+        config.face_detection_scale_factor,
+        config.face_detection_min_neighbors,
+        config.face_detection_min_size,
+    )
+
+
+class FaceDetector:
+    """
+    Counts faces with a Haar cascade that is loaded once and reused for every image.
+
+    Images are decoded straight to grayscale at 1/reduction of their resolution, and the
+    minimum face size is scaled down by the same factor, so the detector searches for the
+    same physical face sizes on a much smaller image.
+    """
+
+    def __init__(self, cascade_path='haarcascade_frontalface_default.xml', reduction=1,
+                 scale_factor=1.05, min_neighbors=8, min_size=20):
+        if reduction not in REDUCED_GRAYSCALE_MODES:
+            raise ValueError(f"reduction must be one of {sorted(REDUCED_GRAYSCALE_MODES)}, got {reduction}")
+        self.cascade_path = cascade_path
+        self.reduction = reduction
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.classifier = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_path)
+
+    def params_key(self):
+        """
+        Returns a string identifying the detector settings, which change the face count.
+        """
+        return detector_params_key(self.cascade_path, self.reduction, self.scale_factor, self.min_neighbors, self.min_size)
+
+    def count_faces(self, image_path):
+        """
+        Counts the faces in an image file.
+
+        Parameters:
+            image_path (str): Path to the image file.
+
+        Returns:
+            int or None: Number of faces detected, or None if the image could not be decoded.
+        """
+        gray_image = cv2.imread(image_path, REDUCED_GRAYSCALE_MODES[self.reduction])
+        return self.count_faces_in_image(gray_image)
+
+    def count_faces_in_bytes(self, data, reduction=None, original_size=None):
+        """
+        Counts the faces in an encoded image held in memory.
+
+        Parameters:
+            data (bytes): Encoded image, such as a JPEG.
+            reduction (int or None): Decode reduction to use instead of the detector's own.
+            original_size (int or None): Longest side in pixels of the image the data was scaled
+                down from, such as the original of a thumbnail. The minimum face size is scaled
+                down by the same ratio.
+
+        Returns:
+            int or None: Number of faces detected, or None if the image could not be decoded.
+        """
+        reduction = reduction or self.reduction
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        gray_image = cv2.imdecode(buffer, REDUCED_GRAYSCALE_MODES[reduction])
+        if gray_image is not None and original_size:
+            # Faces shrink with the image, a thumbnail keeps the proportions of its original
+            reduction = max(reduction, original_size / max(gray_image.shape))
+        return self.count_faces_in_image(gray_image, reduction)
+
+    def count_faces_in_image(self, gray_image, reduction=None):
+        """
+        Counts the faces in an already decoded grayscale image.
+
+        Parameters:
+            gray_image (numpy.ndarray or None): Grayscale image decoded at 1/reduction resolution.
+            reduction (float or None): Reduction the image was decoded with, defaults to the detector's own.
+
+        Returns:
+            int or None: Number of faces detected, or None if gray_image is None.
+        """
+        if gray_image is None:
+            return None
+        reduction = reduction or self.reduction
+        min_side = max(1, round(self.min_size / reduction))
+        faces = self.classifier.detectMultiScale(
+            gray_image,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(min_side, min_side),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        return len(faces)
+
+
+@functools.lru_cache(maxsize=None)
+def get_face_detector(cascade_path='haarcascade_frontalface_default.xml'):
+    """
+    Returns the face detector configured in config.py, creating it on first use.
+
+    Parameters:
+        cascade_path (str): File name of the Haar cascade XML file bundled with OpenCV.
+
+    Returns:
+        FaceDetector: Shared detector instance.
+    """
+    return FaceDetector(
+        cascade_path=cascade_path,
+        reduction=config.face_detection_reduction,
+        scale_factor=config.face_detection_scale_factor,
+        min_neighbors=config.face_detection_min_neighbors,
+        min_size=config.face_detection_min_size,
+    )
+
+
+def init_face_worker(cascade_path, reduction, scale_factor, min_neighbors, min_size):
+    """
+    Initializes a classification worker process with its own warmed-up detector.
+    """
+    global _worker_detector
+    # Each process handles one image at a time, so OpenCV's own threads would only compete for the cores
+    cv2.setNumThreads(1)
+    _worker_detector = FaceDetector(cascade_path, reduction, scale_factor, min_neighbors, min_size)
+
+
+def count_faces_in_worker(image_path):
+    """
+    Counts the faces in an image file inside a classification worker process.
+
+    Parameters:
+        image_path (str): Path to the image file.
+
+    Returns:
+        int or None: Number of faces detected, or None if the image could not be decoded.
+    """
+    return _worker_detector.count_faces(image_path)
+
+
+def create_face_pool(max_workers=None, cascade_path='haarcascade_frontalface_default.xml'):
+    """
+    Creates a process pool for face detection, with one detector loaded per worker process.
+
+    Parameters:
+        max_workers (int or None): Number of worker processes, defaults to the number of CPUs.
+        cascade_path (str): File name of the Haar cascade XML file bundled with OpenCV.
+
+    Returns:
+        ProcessPoolExecutor: Pool to submit count_faces_in_worker() calls to.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        initializer=init_face_worker,
+        initargs=(
+            cascade_path,
+            config.face_detection_reduction,
+            config.face_detection_scale_factor,
+            config.face_detection_min_neighbors,
+            config.face_detection_min_size,
+        ),
+    )
@@ -0,0 +1,500 @@
+# fake_drive_server.py
+
+import re
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Tokens of the Drive query language used by the tool: parentheses, string literals, words and operators
+QUERY_TOKEN = re.compile(r"\s*(\(|\)|'(?:[^'\\]|\\.)*'|!=|=|[A-Za-z_]+)")
+
+STATUS_REASONS = {200: 'OK', 204: 'No Content', 206: 'Partial Content', 308: 'Resume Incomplete', 400: 'Bad Request',
+                  404: 'Not Found', 416: 'Range Not Satisfiable', 429: 'Too Many Requests', 503: 'Service Unavailable'}
+
+
+def parse_query(query):
+    """
+    Compiles a Drive 'q' query into a predicate on file resources.
+
+    Supports 'and', 'or', 'not', parentheses, "'<id>' in parents" and comparisons with
+    '=', '!=' and 'contains' on name, mimeType and trashed, which covers the queries
+    the tool sends.
+
+    Parameters:
+        query (str): Drive query.
+
+    Returns:
+        callable: Function taking a file resource and returning True if it matches.
+    """
+    tokens = QUERY_TOKEN.findall(query)
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def literal(token):
+        if token.startswith("'"):
+            return token[1:-1].replace("\\'", "'")
+        return token == 'true'
+
+    def expression():
+        terms = [conjunction()]
+        while peek() == 'or':
+            take()
+            terms.append(conjunction())
+        return lambda f: any(term(f) for term in terms)
+
+    def conjunction():
+        factors = [factor()]
+        while peek() == 'and':
+            take()
+            factors.append(factor())
+        return lambda f: all(factor(f) for factor in factors)
+
+    def factor():
+        token = take()
+        if token == 'not':
+            inner = factor()
+            return lambda f: not inner(f)
+        if token == '(':
+            inner = expression()
+            take()
+            return inner
+        if token.startswith("'"):
+            # '<id>' in parents
+            take()
+            take()
+            parent_id = literal(token)
+            return lambda f: parent_id in f['parents']
+        field, operator, value = token, take(), literal(take())
+        if operator == 'contains':
+            return lambda f: value in f.get(field, '')
+        if operator == '!=':
+            return lambda f: f.get(field) != value
+        return lambda f: f.get(field) == value
+
+    return expression()
+
+
+class FakeDrive:
+    """
+    In-memory stand-in for the Drive v3 endpoints the tool uses: files.list with paging,
+    files.get with alt=media and Range, files.create (metadata, multipart and resumable
+    uploads), files.update with addParents, files.copy, about.get, changes.list with
+    changes.getStartPageToken and batch requests.
+
+    Every request can be slowed down by a fixed latency and a per-connection bandwidth
+    limit, and can fail with a 429 or 503 at a given rate, to exercise retries. The time
+    each file spends in transfer is recorded for per-file latency statistics.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, retry_after=1, quota_limit=15 * 1024 ** 3, seed=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.quota_limit = quota_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.files = {}
+        self.sessions = {}
+        # IDs of the changed files in order, a page token is a position in this log
+        self.changes = []
+        self.next_id = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Clears the request counters and per-file timings.
+        """
+        with self.lock:
+            self.requests = 0
+            self.errors = 0
+            self.timings = {}
+
+    def stats(self):
+        """
+        Returns the request counters and the per-file transfer times in seconds.
+        """
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'injected_errors': self.errors,
+                'file_seconds': [end - start for start, end in self.timings.values() if end is not None],
+            }
+
+    def track(self, key, done=False):
+        """
+        Records activity on a transfer, from its first request until the response to its
+        last request has been sent, see finish().
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.timings.setdefault(key, (now, None))
+        if done:
+            self.local.finished.append(key)
+
+    def finish(self):
+        """
+        Marks the transfers completed by the current request as done, called once its
+        response has been sent so the latency and bandwidth delays are included.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for key in self.local.finished:
+                self.timings[key] = (self.timings[key][0], now)
+        self.local.finished = []
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return f'fake{self.next_id:07d}'
+
+    def add_file(self, name, mime_type, parent_id=None, data=b''):
+        """
+        Adds a file, or a folder when mime_type is the folder MIME type.
+
+        Returns:
+            str: ID of the new file.
+        """
+        file_id = self.new_id()
+        self.files[file_id] = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': [parent_id] if parent_id else [],
+            'trashed': False,
+            'modifiedTime': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+            'data': data,
+        }
+        self.changes.append(file_id)
+        return file_id
+
+    def add_folder(self, name, parent_id=None):
+        return self.add_file(name, FOLDER_MIME_TYPE, parent_id)
+
+    def update_file(self, file_id, **fields):
+        """
+        Changes fields of a file, such as 'name' or 'trashed', and records the change.
+        The modifiedTime is bumped unless given, as Drive does for metadata edits.
+        """
+        fields.setdefault('modifiedTime', time.strftime('%Y-%m-%dT%H:%M:%S.001Z', time.gmtime()))
+        self.files[file_id].update(fields)
+        self.changes.append(file_id)
+
+    def resource(self, f):
+        """
+        Returns the JSON resource of a file, including the fields the tool asks for.
+        """
+        resource = {key: value for key, value in f.items() if key != 'data'}
+        if f['mimeType'] != FOLDER_MIME_TYPE and 'shortcutDetails' not in f:
+            resource['size'] = str(len(f['data']))
+            resource['md5Checksum'] = hashlib.md5(f['data']).hexdigest()
+        return resource
+
+    def inject_error(self):
+        """
+        Returns an error response at the configured error rate, otherwise None.
+        """
+        if not self.error_rate or self.random.random() >= self.error_rate:
+            return None
+        with self.lock:
+            self.errors += 1
+        if self.random.random() < 0.5:
+            body = json.dumps({'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                                         'errors': [{'reason': 'userRateLimitExceeded'}]}}).encode()
+            return 429, {'Content-Type': 'application/json', 'Retry-After': str(self.retry_after)}, body
+        return 503, {'Content-Type': 'application/json'}, b'{"error": {"code": 503, "message": "Backend Error"}}'
+
+    def handle(self, method, url, headers, body, base_url):
+        """
+        Serves one request.
+
+        Parameters:
+            method (str): HTTP method.
+            url (str): Request path and query string.
+            headers (Message): Request headers.
+            body (bytes): Request body.
+            base_url (str): URL of the server, used in resumable session URIs.
+
+        Returns:
+            tuple: (status, headers, body)
+        """
+        parts = urlsplit(url)
+        path = parts.path
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        with self.lock:
+            self.requests += 1
+
+        if path == '/_fake/stats':
+            return self.json(self.stats())
+        if path == '/_fake/reset':
+            self.reset_stats()
+            return self.json({})
+        error = self.inject_error()
+        if error:
+            return error
+
+        if path == '/batch/drive/v3':
+            return self.batch(headers, body, base_url)
+        if path == '/drive/v3/about':
+            usage = sum(len(f['data']) for f in list(self.files.values()))
+            return self.json({'storageQuota': {'limit': str(self.quota_limit), 'usage': str(usage),
+                                               'usageInDrive': str(usage), 'usageInDriveTrash': '0'}})
+        if path == '/drive/v3/changes/startPageToken':
+            return self.json({'startPageToken': str(len(self.changes))})
+        if path == '/drive/v3/changes':
+            return self.list_changes(query)
+        if path == '/drive/v3/files' and method == 'GET':
+            return self.list_files(query)
+        if path == '/drive/v3/files' and method == 'POST':
+            return self.create(json.loads(body or b'{}'), b'')
+        if path.startswith('/upload/drive/v3/files'):
+            return self.upload(method, query, headers, body, base_url)
+
+        match = re.fullmatch(r'/drive/v3/files/([^/]+)(/copy)?', path)
+        if not match or match.group(1) not in self.files:
+            return self.json({'error': {'code': 404, 'message': 'File not found'}}, 404)
+        f = self.files[match.group(1)]
+        if match.group(2):
+            metadata = json.loads(body or b'{}')
+            copy = self.add_file(metadata.get('name', f['name']), f['mimeType'],
+                                 (metadata.get('parents') or [None])[0], f['data'])
+            return self.json(self.resource(self.files[copy]))
+        if method == 'PATCH':
+            if query.get('addParents'):
+                if f['parents']:
+                    # Drive allows a single parent per file
+                    return self.json({'error': {'code': 403, 'message': 'Increasing the number of parents is not allowed',
+                                                'errors': [{'reason': 'cannotAddParent'}]}}, 403)
+                f['parents'].extend(query['addParents'].split(','))
+            metadata = json.loads(body or b'{}')
+            f.update({key: value for key, value in metadata.items() if key in ('name', 'trashed')})
+            self.changes.append(f['id'])
+            return self.json(self.resource(f))
+        if query.get('alt') == 'media':
+            return self.download(f, headers)
+        return self.json(self.resource(f))
+
+    def json(self, payload, status=200):
+        return status, {'Content-Type': 'application/json'}, json.dumps(payload).encode()
+
+    def list_files(self, query):
+        predicate = parse_query(query['q']) if query.get('q') else (lambda f: True)
+        matches = sorted((f for f in list(self.files.values()) if predicate(f)), key=lambda f: f['id'])
+        start = int(query.get('pageToken', 0))
+        end = start + min(int(query.get('pageSize', 100)), 1000)
+        response = {'files': [self.resource(f) for f in matches[start:end]]}
+        if end < len(matches):
+            response['nextPageToken'] = str(end)
+        return self.json(response)
+
+    def list_changes(self, query):
+        start = int(query['pageToken'])
+        end = min(start + min(int(query.get('pageSize', 100)), 1000), len(self.changes))
+        response = {'changes': [{'fileId': file_id, 'removed': False, 'file': self.resource(self.files[file_id])}
+                                for file_id in self.changes[start:end]]}
+        if end < len(self.changes):
+            response['nextPageToken'] = str(end)
+        else:
+            response['newStartPageToken'] = str(end)
+        return self.json(response)
+
+    def download(self, f, headers):
+        data = f['data']
+        match = re.match(r'bytes=(\d+)-(\d*)', headers.get('Range', ''))
+        self.track(('download', f['id']))
+        if not match:
+            self.track(('download', f['id']), done=True)
+            return 200, {'Content-Type': f['mimeType']}, data
+        start = int(match.group(1))
+        end = min(int(match.group(2)), len(data) - 1) if match.group(2) else len(data) - 1
+        if start >= len(data) and data:
+            return 416, {'Content-Range': f'bytes */{len(data)}'}, b''
+        if end == len(data) - 1:
+            self.track(('download', f['id']), done=True)
+        return 206, {'Content-Type': f['mimeType'], 'Content-Range': f'bytes {start}-{end}/{len(data)}'}, data[start:end + 1]
+
+    def create(self, metadata, data):
+        file_id = self.add_file(metadata.get('name', 'Untitled'), metadata.get('mimeType', 'application/octet-stream'),
+                                (metadata.get('parents') or [None])[0], data)
+        if 'shortcutDetails' in metadata:
+            self.files[file_id]['shortcutDetails'] = metadata['shortcutDetails']
+        return self.json(self.resource(self.files[file_id]))
+
+    def upload(self, method, query, headers, body, base_url):
+        upload_type = query.get('uploadType')
+        if 'upload_id' in query:
+            return self.upload_chunk(query['upload_id'], headers, body)
+        if upload_type == 'resumable':
+            upload_id = uuid.uuid4().hex
+            metadata = json.loads(body or b'{}')
+            metadata.setdefault('mimeType', headers.get('X-Upload-Content-Type'))
+            self.sessions[upload_id] = {'metadata': metadata, 'data': bytearray()}
+            self.track(('upload', upload_id))
+            location = f'{base_url}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}'
+            return 200, {'Location': location}, b''
+        if upload_type == 'multipart':
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body)
+            metadata_part, media_part = list(message.iter_parts())[:2]
+            metadata = json.loads(metadata_part.get_payload(decode=True))
+            metadata.setdefault('mimeType', media_part.get_content_type())
+            self.track(('upload', uuid.uuid4().hex), done=True)
+            return self.create(metadata, media_part.get_payload(decode=True))
+        return self.create({'mimeType': headers.get('Content-Type')}, body)
+
+    def upload_chunk(self, upload_id, headers, body):
+        session = self.sessions.get(upload_id)
+        if session is None:
+            return self.json({'error': {'code': 404, 'message': 'Upload session not found'}}, 404)
+        self.track(('upload', upload_id))
+        if 'Content-Range' not in headers:
+            # Like Drive, a PUT without Content-Range sends the rest of the file and finishes
+            # the session, which is how the API client uploads an empty file
+            session['data'] += body
+            del self.sessions[upload_id]
+            self.track(('upload', upload_id), done=True)
+            return self.create(session['metadata'], bytes(session['data']))
+        match = re.match(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)', headers.get('Content-Range', ''))
+        total = match.group(3) if match else '*'
+        if match and match.group(1) is not None:
+            start = int(match.group(1))
+            if start > len(session['data']):
+                return self.json({'error': {'code': 400, 'message': 'Chunk starts after the committed offset'}}, 400)
+            # Bytes sent again after a failure overwrite the committed ones
+            session['data'][start:start + len(body)] = body
+        if total != '*' and len(session['data']) == int(total):
+            del self.sessions[upload_id]
+            self.track(('upload', upload_id), done=True)
+            return self.create(session['metadata'], bytes(session['data']))
+        response_headers = {'Range': f"bytes=0-{len(session['data']) - 1}"} if session['data'] else {}
+        return 308, response_headers, b''
+
+    def batch(self, headers, body, base_url):
+        """
+        Serves a multipart/mixed batch request by running each part through handle().
+        """
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body)
+        boundary = f'batch_{uuid.uuid4().hex}'
+        output = []
+        for part in message.iter_parts():
+            request_line, _, rest = part.get_payload(decode=True).partition(b'\n')
+            method, url, _ = request_line.decode().strip().split(' ', 2)
+            inner = BytesParser(policy=HTTP).parsebytes(rest)
+            status, response_headers, response_body = self.handle(method, url, inner, inner.get_payload(decode=True) or b'', base_url)
+            lines = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Unknown')}"]
+            lines += [f'{key}: {value}' for key, value in response_headers.items()]
+            lines += [f'Content-Length: {len(response_body)}', '', '']
+            content_id = part.get('Content-ID', '').strip('<>')
+            output.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n'.encode()
+                + '\r\n'.join(lines).encode() + response_body + b'\r\n'
+            )
+        output.append(f'--{boundary}--\r\n'.encode())
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, b''.join(output)
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a FakeDrive, adding the configured latency and bandwidth limit.
+    """
+
+    # Keep-alive connections, like the real endpoint
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def serve(self):
+        drive = self.server.drive
+        drive.local.finished = []
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        base_url = f'http://{self.server.server_address[0]}:{self.server.server_address[1]}'
+        status, headers, response_body = drive.handle(self.command, self.path, self.headers, body, base_url)
+        if not self.path.startswith('/_fake/'):
+            transferred = len(body) + len(response_body)
+            time.sleep(drive.latency + (transferred / drive.bandwidth if drive.bandwidth else 0))
+        self.send_response(status, STATUS_REASONS.get(status))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+        drive.finish()
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = serve
+
+
+def start_fake_drive(drive, host='127.0.0.1', port=0):
+    """
+    Serves a FakeDrive from a background thread.
+
+    Parameters:
+        drive (FakeDrive): The fake Drive to serve.
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 picks a free one.
+
+    Returns:
+        tuple: (server, base_url) where base_url is the value for config.drive_api_base.
+    """
+    server = ThreadingHTTPServer((host, port), FakeDriveHandler)
+    server.daemon_threads = True
+    server.drive = drive
+    threading.Thread(target=server.serve_forever, name='fake-drive', daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def main():
+    """
+    Runs a fake Drive with a source folder of random images and videos, for manual runs
+    of the tool with config.drive_api_base pointing at it.
+    """
+    parser = argparse.ArgumentParser(description="Serve a local fake of the Google Drive v3 API.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--files', type=int, default=200, help="Number of files in the source folder.")
+    parser.add_argument('--file-kb', type=int, default=512, help="Size of each file in KB.")
+    parser.add_argument('--latency-ms', type=float, default=50, help="Delay added to every request, in milliseconds.")
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help="Bandwidth per connection in MB/s, 0 for unlimited.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 429 or 503.")
+    args = parser.parse_args()
+
+    drive = FakeDrive(args.latency_ms / 1000, args.bandwidth_mbps * 1024 * 1024 or None, args.error_rate)
+    source_id = drive.add_folder('source')
+    target_id = drive.add_folder('target')
+    for i in range(args.files):
+        extension, mime_type = ('jpg', 'image/jpeg') if i % 4 else ('mp4', 'video/mp4')
+        drive.add_file(f'file_{i:05d}.{extension}', mime_type, source_id, random.randbytes(args.file_kb * 1024))
+    server, base_url = start_fake_drive(drive, port=args.port)
+    print(Fore.GREEN + f"✔ Fake Drive listening on {base_url}")
+    print(Fore.CYAN + f"   drive_api_base = '{base_url}'")
+    print(Fore.CYAN + f"   source_folder_id = '{source_id}'")
+    print(Fore.CYAN + f"   target_folder_id = '{target_id}'\n")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# lanes.py
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import config
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+
+def file_size(item):
+    """
+    Returns the size of a source file resource in bytes.
+    """
+    return int(item.get('size', 0))
+
+
+class LaneScheduler:
+    """
+    Splits a transfer into a lane for small files and a lane for files above the size
+    threshold, each with its own workers, so a few huge videos never hold the slots the
+    bulk of the photos is waiting for.
+
+    Files are routed to their lanes as the listing yields them, so the first transfer
+    starts without waiting for the whole source folder to be listed. The small lane
+    sorts its files smallest first within windows of `window` files, which gets most
+    photos done early while holding back at most one window. Both lanes run at the same
+    time through the shared rate limiter. The limiter counts requests, not bytes, so the
+    bandwidth is not shared fairly: a large-lane chunk request moves far more bytes than
+    a photo. What keeps the small lane moving is that the large lane never holds more
+    than its own workers' worth of connections.
+    """
+
+    def __init__(self, size_threshold, small_workers, large_workers, window=0):
+        self.size_threshold = size_threshold
+        self.small_workers = max(1, small_workers)
+        self.large_workers = max(1, large_workers)
+        self.window = window
+
+    def is_large(self, item):
+        """
+        Checks whether a source file belongs to the large lane.
+        """
+        return file_size(item) > self.size_threshold
+
+    def route(self, items):
+        """
+        Routes source files to their lanes while they are being listed.
+
+        Parameters:
+            items (iterable): Source file resources.
+
+        Yields:
+            tuple: (large, item) in the order the lanes should process them, where large
+            tells whether the file belongs to the large lane.
+        """
+        window = []
+        for item in items:
+            yield from self.place(item, window)
+        yield from self.flush(window)
+
+    def place(self, item, window):
+        """
+        Routes one listed source file, for listings that route() cannot iterate, such as
+        the async listing of the 'async' mode. Small files are held in window until it is full.
+
+        Parameters:
+            item (dict): Source file resource.
+            window (list): Small files listed but not routed yet, shared between calls.
+
+        Returns:
+            list: (large, item) tuples ready for their lanes, see route().
+        """
+        if self.is_large(item):
+            return [(True, item)]
+        window.append(item)
+        if len(window) < self.window:
+            return []
+        return self.flush(window)
+
+    def flush(self, window):
+        """
+        Empties a window of small files, smallest first, once it is full or the listing is done.
+
+        Returns:
+            list: (False, item) tuples ready for the small lane.
+        """
+        window.sort(key=file_size)
+        routed = [(False, small_item) for small_item in window]
+        window.clear()
+        return routed
+
+    def run(self, items, handler):
+        """
+        Processes source files with a pool of worker threads per lane and waits until all
+        of them are done.
+
+        Parameters:
+            items (iterable): Source file resources.
+            handler (callable): Function transferring a single source file.
+        """
+        with ThreadPoolExecutor(max_workers=self.small_workers, thread_name_prefix='small') as small_pool, \
+                ThreadPoolExecutor(max_workers=self.large_workers, thread_name_prefix='large') as large_pool:
+            # Executors start tasks in submission order, which keeps the order of each lane
+            futures = []
+            large_files = 0
+            for large, item in self.route(items):
+                futures.append((large_pool if large else small_pool).submit(handler, item))
+                large_files += large
+            if large_files:
+                print(Fore.CYAN + f"🛣 {len(futures) - large_files} files in the small lane ({self.small_workers} workers), "
+                                  f"{large_files} in the large lane ({self.large_workers} workers).\n")
+            for future in as_completed(futures):
+                future.result()
+
+
+def get_lane_scheduler(size_threshold, small_workers=None):
+    """
+    Returns a lane scheduler configured from config.py, or None when config.lane_scheduler
+    is disabled.
+
+    Parameters:
+        size_threshold (int): Files above this size go to the large lane.
+        small_workers (int or None): Workers of the small lane, defaults to config.download_workers.
+
+    Returns:
+        LaneScheduler or None: The scheduler.
+    """
+    if not config.lane_scheduler:
+        return None
+    return LaneScheduler(size_threshold, small_workers or config.download_workers, config.large_lane_workers,
+                         config.lane_sort_window)
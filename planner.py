@@ -0,0 +1,211 @@
+# planner.py
+
+import sys
+import config
+from rate_limiter import execute
+from face_cache import get_face_cache
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Policies whose extra destinations take storage, see config.extra_destination_policy
+STORING_POLICIES = ('copy', 'upload')
+
+
+def format_size(num_bytes):
+    """
+    Formats a byte count in GB, or in MB below 1 GB.
+    """
+    if num_bytes >= 1024 ** 3:
+        return f"{num_bytes / (1024 ** 3):.2f} GB"
+    return f"{num_bytes / (1024 ** 2):.2f} MB"
+
+
+def metadata_exif(item):
+    """
+    Builds the EXIF fields used for routing from the imageMediaMetadata Drive extracted
+    from an image, so the plan needs no request per file.
+
+    Returns:
+        dict or None: 'make', 'model' and 'gps' of the image, or None without metadata.
+    """
+    metadata = item.get('imageMediaMetadata')
+    if not config.exif_routing or not metadata:
+        return None
+    return {
+        'make': metadata.get('cameraMake') or '',
+        'model': metadata.get('cameraModel') or '',
+        'gps': metadata.get('location') is not None,
+    }
+
+
+class TransferPlan:
+    """
+    Result of the preflight pass: the files a run will transfer, where they are expected
+    to land and whether the target account has room for them.
+
+    Destinations are estimated without touching file contents. Images are routed by the
+    camera make and location Drive extracted from them, and count as group photos only
+    when the face count cache already knows them. Images that still need the group photo
+    check are counted separately, since each one may take one more placement.
+
+    The routing comes from the caller, so the plan lands files where the transfer will:
+    route is called like process_content.route_file() and face_count like
+    process_content.cached_face_count().
+    """
+
+    def __init__(self, size_threshold, subfolders, route, face_count):
+        self.size_threshold = size_threshold
+        self.route = route
+        self.face_count = face_count
+        self.items = []
+        self.destinations = {name: [0, 0] for name in subfolders}
+        self.total_bytes = 0
+        self.large_files = 0
+        self.large_bytes = 0
+        self.extra_placements = 0
+        self.extra_bytes = 0
+        self.unclassified = 0
+        self.unclassified_bytes = 0
+        self.duplicate_files = 0
+        self.duplicate_bytes = 0
+        self.quota_limit = None
+        self.quota_usage = 0
+        self.seen_checksums = set()
+
+    def add(self, item):
+        """
+        Adds a source file to the plan.
+        """
+        size = int(item.get('size', 0))
+        mime_type = item['mimeType']
+        group_photo = False
+        needs_check = (mime_type.startswith('image/') and size <= self.size_threshold
+                       and (config.transfer_mode != 'copy' or config.group_photo_check_in_copy_mode))
+        if needs_check:
+            content_hash = item.get('md5Checksum') if get_face_cache() is not None else None
+            face_count = self.face_count(content_hash)
+            if face_count is None:
+                self.unclassified += 1
+                self.unclassified_bytes += size
+            else:
+                group_photo = face_count > config.group_photo_threshold_person_count
+        destinations = self.route(item['name'], mime_type, group_photo=group_photo, exif=metadata_exif(item))
+        if not destinations:
+            return
+
+        self.items.append(item)
+        self.total_bytes += size
+        if size > self.size_threshold:
+            self.large_files += 1
+            self.large_bytes += size
+        # Identical content in several source files is uploaded once per file
+        checksum = item.get('md5Checksum')
+        if checksum in self.seen_checksums:
+            self.duplicate_files += 1
+            self.duplicate_bytes += size
+        elif checksum:
+            self.seen_checksums.add(checksum)
+
+        stored = size if config.extra_destination_policy in STORING_POLICIES else 0
+        for index, name in enumerate(destinations):
+            self.destinations[name][0] += 1
+            self.destinations[name][1] += size if index == 0 else stored
+        self.extra_placements += len(destinations) - 1
+        self.extra_bytes += stored * (len(destinations) - 1)
+
+    @property
+    def required_bytes(self):
+        """
+        Storage the run will take in the target account.
+        """
+        if config.target_dedup:
+            # Repeated content is placed without being stored again
+            return self.total_bytes + self.extra_bytes - self.duplicate_bytes
+        return self.total_bytes + self.extra_bytes
+
+    @property
+    def available_bytes(self):
+        """
+        Free storage of the target account, or None for an unlimited account.
+        """
+        if self.quota_limit is None:
+            return None
+        return max(0, self.quota_limit - self.quota_usage)
+
+    def fits(self):
+        """
+        Checks whether the target account has room for the planned transfer.
+        """
+        return self.available_bytes is None or self.required_bytes <= self.available_bytes
+
+    def report(self):
+        """
+        Prints the plan.
+        """
+        print(Fore.CYAN + f"📋 Transfer plan: {len(self.items)} files ({format_size(self.total_bytes)})")
+        if self.large_files:
+            print(Fore.CYAN + f"   {self.large_files} files ({format_size(self.large_bytes)}) exceed the size threshold.")
+        print(Fore.CYAN + f"\n   {'destination':<14}{'files':>8}{'storage':>14}")
+        for name, (files, num_bytes) in self.destinations.items():
+            if files:
+                print(f"   {name:<14}{files:>8}{format_size(num_bytes):>14}")
+        print()
+
+        policy = config.extra_destination_policy
+        if self.extra_placements:
+            print(Fore.CYAN + f"   {self.extra_placements} extra placements ('{policy}' policy), "
+                              f"{format_size(self.extra_bytes)} of extra storage.")
+        if self.duplicate_files and config.target_dedup:
+            print(Fore.CYAN + f"   {self.duplicate_files} files ({format_size(self.duplicate_bytes)}) have the same content "
+                              f"as another source file and will not be transferred again ('{config.dedup_policy}' policy).")
+        elif self.duplicate_files:
+            print(Fore.YELLOW + f"⚠ {self.duplicate_files} files ({format_size(self.duplicate_bytes)}) have the same "
+                                f"content as another source file and will be uploaded again.")
+        if self.unclassified:
+            extra = format_size(self.unclassified_bytes) if policy in STORING_POLICIES else "no extra storage"
+            print(Fore.YELLOW + f"⚠ {self.unclassified} images still need the group photo check. "
+                                f"Group photos among them take one more placement each (up to {extra}).")
+
+        if self.available_bytes is None:
+            print(Fore.GREEN + f"✔ Storage needed: {format_size(self.required_bytes)}, the target account has no storage limit.\n")
+        elif self.fits():
+            print(Fore.GREEN + f"✔ Storage needed: {format_size(self.required_bytes)}, "
+                               f"available: {format_size(self.available_bytes)}.\n")
+        else:
+            print(Fore.RED + f"✖ Storage needed: {format_size(self.required_bytes)}, "
+                             f"but only {format_size(self.available_bytes)} is available.\n")
+
+
+def build_plan(service, items, size_threshold, subfolders, route, face_count):
+    """
+    Goes through the source listing once and plans the transfer: bytes per destination
+    subfolder, expected duplicate uploads and the storage quota of the target account.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        items (iterable): Source file resources, such as the listing of
+            process_content.list_pending_files().
+        size_threshold (int): Maximum file size in bytes for immediate upload.
+        subfolders (list): Names of the target subfolders.
+        route (callable): Picks the subfolders of a file, see TransferPlan.
+        face_count (callable): Looks up cached face counts, see TransferPlan.
+
+    Returns:
+        TransferPlan: The plan, whose items the transfer then processes.
+    """
+    plan = TransferPlan(size_threshold, subfolders, route, face_count)
+    try:
+        print(Fore.MAGENTA + "🧮 Planning the transfer...\n")
+        for item in items:
+            plan.add(item)
+        quota = execute(service.about().get(fields="storageQuota"))['storageQuota']
+        # Accounts without a storage limit have no 'limit' field
+        if 'limit' in quota:
+            plan.quota_limit = int(quota['limit'])
+        plan.quota_usage = int(quota.get('usage', 0))
+        return plan
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred while planning the transfer: {e}\n")
+        sys.exit(1)
@@ -1,67 +1,579 @@
 # process_content.py
 
+import json
 import os
-import io
 import shutil
 import sys
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+import threading
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
+from drive_auth import authenticate_drive, get_worker_http, get_worker_service, load_credentials
+from drive_batch import FOLDER_MIME_TYPE, DriveBatch, find_or_create_folders
+from stream_transfer import DriveHttpError, download_thumbnail, fetch_range, stream_file
+from chunk_sizer import AdaptiveChunkSizer, ProgressMilestones
+from rate_limiter import execute, get_rate_limiter
+from upload_sessions import UploadSessionStore, get_session_store, resumable_create
+from sync_state import get_sync_state
+from staging import get_staging_area
+from target_index import get_target_index, load_target_index
+from credential_pool import assign_identity, get_credential_pool, load_credential_pool, record_upload, upload_service
+from lanes import get_lane_scheduler
+from face_detector import configured_params_key, count_faces_in_worker, create_face_pool, get_face_detector
+from face_cache import file_md5, get_face_cache
+from exif_routing import exif_subfolder, fetch_exif, read_exif_file
+from planner import build_plan
 from colorama import init, Fore, Style
-from PIL import Image
-from PIL.ExifTags import TAGS
-import cv2
 import mimetypes
 
 
 # Initialize colorama
 init(autoreset=True)
 
-def authenticate_drive(creds_file):
+# Subfolders created inside the target folder
+SUBFOLDERS = ['images', 'videos', 'DSLR', 'GroupPhotos', 'geotaged']
+
+# Sentinel telling pipeline stage workers to stop, see start_stage()
+PIPELINE_DONE = object()
+
+# Markers used by walk_source_folder() to track the folders still being listed
+FOLDER_FOUND = object()
+FOLDER_DONE = object()
+
+SHORTCUT_MIME_TYPE = 'application/vnd.google-apps.shortcut'
+
+def streams_large_files():
     """
-    Authenticates and returns the Google Drive service object.
-    
+    Checks whether files above size_threshold are streamed into the target during the
+    run, which they are with config.stream_large_files and in the large lane of
+    config.lane_scheduler, instead of being staged in large_files_path for
+    upload_large_files.py.
+    """
+    return config.stream_large_files or config.lane_scheduler
+
+def placed_bytes(file_size, destinations):
+    """
+    Returns the bytes a file adds to the target: its size, once more for each extra
+    destination when config.extra_destination_policy stores a copy there.
+    """
+    copies = len(destinations) if config.extra_destination_policy in ('copy', 'upload') else 1
+    return file_size * copies
+
+def delivered_bytes(file_size, target_ids):
+    """
+    Returns the bytes a delivered file added to the target, counting only the
+    destinations it reached, see deliver_file().
+    """
+    reached = [destination for destination, target_id in target_ids.items() if target_id]
+    return placed_bytes(file_size, reached) if reached else 0
+
+def file_fields():
+    """
+    Returns the file fields requested when listing the source folder.
+
+    Returns:
+        str: Comma separated field mask for a Drive file resource.
+    """
+    fields = "id, name, mimeType, size, md5Checksum, modifiedTime"
+    image_fields = []
+    if config.thumbnail_classification:
+        # The original dimensions scale the minimum face size down to the thumbnail
+        fields += ", thumbnailLink"
+        image_fields += ['width', 'height']
+    if config.preflight_plan and config.exif_routing:
+        # Lets the transfer plan route images without reading their EXIF headers
+        image_fields += ['cameraMake', 'cameraModel', 'location']
+    if image_fields:
+        fields += f", imageMediaMetadata({', '.join(image_fields)})"
+    return fields
+
+class TransferStats:
+    """
+    Thread-safe counters used to report aggregate transfer throughput.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self.first_file_at = None
+
+    def record(self, num_bytes, ok=True):
+        """
+        Records the outcome of a single file transfer.
+
+        Parameters:
+            num_bytes (int): Number of bytes transferred.
+            ok (bool): Whether the transfer succeeded.
+        """
+        with self.lock:
+            if ok:
+                self.files += 1
+                self.bytes += num_bytes
+                if self.first_file_at is None:
+                    self.first_file_at = time.monotonic()
+            else:
+                self.failed += 1
+
+    def report(self, label):
+        """
+        Prints the number of files, bytes and the aggregate throughput so far.
+
+        Parameters:
+            label (str): Name of the transfer being reported.
+        """
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        megabytes = self.bytes / (1024 ** 2)
+        print(Fore.CYAN + f"📈 {label}: {self.files} files ({megabytes:.2f} MB) in {elapsed:.1f}s "
+              f"- {megabytes / elapsed:.2f} MB/s, {self.files / elapsed:.2f} files/s, {self.failed} failed.")
+        if self.first_file_at is not None:
+            print(Fore.CYAN + f"⏱ First file finished after {self.first_file_at - self.start:.1f}s.")
+        print()
+
+def list_images_videos(service, folder_id):
+    """
+    Lists all images and videos in the specified Google Drive folder, page by page.
+
     Parameters:
-        creds_file (str): Path to the credentials JSON file.
-        
+        service: Authorized Google Drive service instance.
+        folder_id (str): ID of the source Google Drive folder.
+
+    Yields:
+        dict: File resource with 'id', 'name', 'mimeType', 'size', 'md5Checksum' and 'modifiedTime' fields.
+    """
+    page_token = None
+    while True:
+        query = f"'{folder_id}' in parents and (mimeType contains 'image/' or mimeType contains 'video/') and trashed=false"
+        print(Fore.CYAN + "🔍 Searching for images and videos in the source folder...")
+
+        # Get files and handle pagination
+        results = execute(service.files().list(
+            q=query,
+            fields=f"nextPageToken, files({file_fields()})",
+            pageSize=1000,
+            pageToken=page_token
+        ))
+        items = results.get('files', [])
+
+        if not items:
+            print(Fore.YELLOW + "⚠ No more image or video files found in the source folder.\n")
+            break
+
+        print(Fore.CYAN + f"📂 Found {len(items)} files to process.\n")
+        for item in items:
+            yield item
+
+        # Check if there is another page of results
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break  # No more pages, exit the loop
+
+def walk_source_folder(creds, folder_id, folder_ids=None, include_files=True):
+    """
+    Lists all images and videos in the specified Google Drive folder and all of its nested
+    subfolders. Subfolders are listed concurrently by a pool of worker threads, each with
+    its own Drive client, and files are yielded as soon as any worker discovers them.
+
+    Parameters:
+        creds (Credentials): Credentials used to build per-worker clients.
+        folder_id (str): ID of the source Google Drive folder.
+        folder_ids (set or None): If given, filled with the IDs of the folder and all of its subfolders.
+        include_files (bool): When False, only the folder tree is walked and nothing is yielded.
+
+    Yields:
+        dict: File resource, as yielded by list_images_videos().
+    """
+    if include_files:
+        query = "'{}' in parents and (mimeType = '" + FOLDER_MIME_TYPE + "' or mimeType contains 'image/' or mimeType contains 'video/') and trashed=false"
+    else:
+        query = "'{}' in parents and mimeType = '" + FOLDER_MIME_TYPE + "' and trashed=false"
+    results = queue.Queue()
+
+    def list_folder(parent_id):
+        worker_service = get_worker_service(creds)
+        try:
+            page_token = None
+            while True:
+                response = execute(worker_service.files().list(
+                    q=query.format(parent_id),
+                    fields=f"nextPageToken, files({file_fields()})",
+                    pageSize=1000,
+                    pageToken=page_token
+                ))
+                for item in response.get('files', []):
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        # Announce the subfolder before this folder is marked done, so the walk never ends early
+                        results.put((FOLDER_FOUND, item['id']))
+                        executor.submit(list_folder, item['id'])
+                    else:
+                        results.put((None, item))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            print(Fore.RED + f"✖ Failed to list folder '{parent_id}': {e}\n")
+        finally:
+            results.put((FOLDER_DONE, parent_id))
+
+    if folder_ids is not None:
+        folder_ids.add(folder_id)
+    if include_files:
+        print(Fore.CYAN + "🔍 Searching for images and videos in the source folder and its subfolders...")
+    found = 0
+    with ThreadPoolExecutor(max_workers=config.listing_workers) as executor:
+        pending = 1
+        executor.submit(list_folder, folder_id)
+        while pending:
+            marker, value = results.get()
+            if marker is FOLDER_FOUND:
+                pending += 1
+                if folder_ids is not None:
+                    folder_ids.add(value)
+            elif marker is FOLDER_DONE:
+                pending -= 1
+            else:
+                found += 1
+                yield value
+    if include_files:
+        print(Fore.CYAN + f"📂 Found {found} files to process.\n")
+
+def list_pending_files(service, folder_id, creds=None):
+    """
+    Lists the images and videos of the source folder that still need to be transferred,
+    skipping files the sync state records as already transferred and unchanged.
+
+    Nested subfolders are included when config.recursive_listing is set and creds are given.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        folder_id (str): ID of the source Google Drive folder.
+        creds (Credentials or None): Credentials used by the recursive listing workers.
+
+    Yields:
+        dict: File resource, as yielded by list_images_videos().
+    """
+    state = get_sync_state()
+    skipped = 0
+    if config.recursive_listing and creds is not None:
+        items = walk_source_folder(creds, folder_id)
+    else:
+        items = list_images_videos(service, folder_id)
+    for item in items:
+        if state is not None and state.is_synced(item):
+            skipped += 1
+            continue
+        yield item
+    if skipped:
+        print(Fore.CYAN + f"⏭ Skipped {skipped} files already transferred by an earlier run.\n")
+
+def record_transfer(item, destinations, target_ids):
+    """
+    Records a source file in the sync state once it has reached all of its destinations.
+
+    Parameters:
+        item (dict): Source file resource.
+        destinations (list): Subfolder names the file was routed to.
+        target_ids (dict): Mapping of subfolder names to the IDs of the files created there.
+    """
+    state = get_sync_state()
+    if state is not None and all(target_ids.get(name) for name in destinations):
+        state.record(item, destinations, target_ids)
+    index = get_target_index()
+    if index is not None and item.get('md5Checksum'):
+        index.add(content_key(item), target_ids, item['name'])
+
+def content_key(item=None, file_path=None):
+    """
+    Returns the key of a file's content in the target index, from its source file
+    resource or, without one, from its local copy.
+
+    Parameters:
+        item (dict or None): Source file resource.
+        file_path (str or None): Local path of the file.
+
     Returns:
+        tuple or None: (md5Checksum, size), or None if neither is available.
+    """
+    if item is not None and item.get('md5Checksum'):
+        return item['md5Checksum'], int(item.get('size', 0))
+    if file_path is not None:
+        return file_md5(file_path), os.path.getsize(file_path)
+    return None
+
+def find_duplicate(item=None, file_path=None):
+    """
+    Looks up the content of a file in the index of the target subfolders, see target_index.py.
+
+    Parameters:
+        item (dict or None): Source file resource.
+        file_path (str or None): Local path of the file, hashed when there is no source resource.
+
+    Returns:
+        dict or None: Mapping of subfolder names to the files already holding the content,
+        or None if it is not in the target or deduplication is disabled.
+    """
+    index = get_target_index()
+    if index is None:
+        return None
+    key = content_key(item, file_path)
+    return index.find(key) if key else None
+
+def place_duplicate(file_name, key, placements, subfolder_ids, service):
+    """
+    Handles a file whose content is already in the target, as chosen by config.dedup_policy:
+    'skip' leaves the target as it is and 'link' adds a shortcut under the file's own name
+    next to each existing copy, unless the content already has that name in the target.
+    The shortcuts of all subfolders are created in one batch request.
+
+    Parameters:
+        file_name (str): Name of the file.
+        key (tuple): (md5Checksum, size) of the file.
+        placements (dict): Mapping of subfolder names to the files holding the content.
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
         service: Authorized Google Drive service instance.
+
+    Returns:
+        dict: Mapping of subfolder names to the file IDs now holding the file.
+    """
+    batch = DriveBatch(service)
+    target_ids, linked = queue_duplicate(file_name, key, placements, subfolder_ids, batch)
+    if linked:
+        batch.execute()
+        get_target_index().add(key, target_ids, file_name)
+    return target_ids
+
+def queue_duplicate(file_name, key, placements, subfolder_ids, batch):
     """
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    creds = None
+    Queues the shortcuts place_duplicate() adds for a file on a batch.
+
+    Parameters:
+        file_name (str): Name of the file.
+        key (tuple): (md5Checksum, size) of the file.
+        placements (dict): Mapping of subfolder names to the files holding the content.
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
+        batch (DriveBatch): Batch the shortcut creations are added to.
+
+    Returns:
+        tuple: (target_ids, linked) where target_ids maps subfolder names to the file IDs
+        holding the file, complete once the batch is executed, and linked tells whether
+        shortcuts were queued.
+    """
+    if config.dedup_policy != 'link' or get_target_index().has_name(key, file_name):
+        print(Fore.CYAN + f"⏭ Skipping '{file_name}': its content is already in '{', '.join(placements)}'.\n")
+        return placements, False
+    target_ids = {}
+    for subfolder_type, file_id in placements.items():
+        queue_link(batch, file_id, file_name, subfolder_ids[subfolder_type], subfolder_type, target_ids,
+                   policy='shortcut')
+    return target_ids, True
+
+def defer_duplicates(items, deferred):
+    """
+    Passes on the first source file of each content and holds back the later ones, so
+    that files with the same content in flight at the same time are not all uploaded.
+    place_deferred_duplicates() places them once the run is done.
+
+    Parameters:
+        items (iterable): Source file resources.
+        deferred (list): Receives the source files held back.
+
+    Yields:
+        dict: Source file resource.
+    """
+    seen = set()
+    for item in items:
+        key = content_key(item)
+        if key in seen:
+            deferred.append(item)
+            continue
+        if key is not None:
+            seen.add(key)
+        yield item
+
+def place_deferred_duplicates(service, deferred):
+    """
+    Places the source files held back by defer_duplicates() next to the content their
+    first occurrence transferred, with the shortcuts of all files sent in batch requests.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        deferred (list): Source file resources held back.
+    """
+    index = get_target_index()
+    batch = DriveBatch(service)
+    queued = []
+    linked_names = {}
+    for item in deferred:
+        key = content_key(item)
+        placements = index.find(key) if index is not None else None
+        if not placements:
+            print(Fore.YELLOW + f"⚠ '{item['name']}' was not transferred because the file with the same content "
+                                f"failed, the next run retries it.\n")
+            continue
+        if (key, item['name']) in linked_names:
+            # Same content under the same name, the shortcuts queued for the first one hold it too
+            queued.append((item, key, linked_names[(key, item['name'])], False))
+            continue
+        target_ids, linked = queue_duplicate(item['name'], key, placements, index.subfolder_ids, batch)
+        if linked:
+            linked_names[(key, item['name'])] = target_ids
+        queued.append((item, key, target_ids, linked))
+    batch.execute()
+    for item, key, target_ids, linked in queued:
+        if linked:
+            index.add(key, target_ids, item['name'])
+        record_transfer(item, list(target_ids), target_ids)
+
+def transfer_duplicate(item, subfolder_ids, service):
+    """
+    Checks the target index before a source file is transferred and, if its content is
+    already there, places it with place_duplicate() instead.
+
+    Parameters:
+        item (dict): Source file resource.
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
+        service: Authorized Google Drive service instance.
+
+    Returns:
+        bool: True if the file was a duplicate and needs no download or upload.
+    """
+    placements = find_duplicate(item)
+    if not placements:
+        return False
+    target_ids = place_duplicate(item['name'], content_key(item), placements, subfolder_ids, service)
+    record_transfer(item, list(target_ids), target_ids)
+    return True
+
+def download_file(service, file_id, file_name, file_path, color=Fore.BLUE, file_size=None):
+    """
+    Downloads a single Google Drive file to a local path.
+
+    Bytes are written to '<file_path>.part', which is renamed into place only once the
+    download is complete. If a partial file is left over from an interrupted run, the
+    download continues from its length with HTTP Range requests instead of from byte 0.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        file_id (str): ID of the Google Drive file.
+        file_name (str): Name of the file, used for progress output.
+        file_path (str): Local path to write the file to.
+        color (str): Colorama color used for progress output.
+        file_size (int or None): Expected size in bytes, used to verify the finished file.
+
+    Returns:
+        bool: True if the download completed, False otherwise.
+    """
+    part_path = file_path + '.part'
     try:
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-            print(Fore.GREEN + "✔ Loaded existing credentials from 'token.json'.")
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                print(Fore.GREEN + "🔄 Refreshed expired credentials.")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if file_size is not None and offset > file_size:
+            # The source changed since the partial download, start over
+            os.remove(part_path)
+            offset = 0
+
+        if file_size is None or offset < file_size:
+            # Range requests on the connection of the service, so a partial file continues
+            # from its length and every chunk can have its own size
+            request = service.files().get_media(fileId=file_id)
+            sizer = AdaptiveChunkSizer(file_size - offset if file_size else None)
+            milestones = ProgressMilestones()
+            if offset:
+                print(color + f"⏩ Resuming download of '{file_name}' from byte {offset}...")
             else:
-                flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
-                creds = flow.run_local_server(port=0)
-                print(Fore.GREEN + "✔ Authenticated new credentials.")
-            # Save the credentials for the next run
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-                print(Fore.GREEN + "💾 Saved new credentials to 'token.json'.")
-        service = build('drive', 'v3', credentials=creds)
-        print(Fore.GREEN + "✔ Google Drive service built successfully.\n")
-        return service
-    except FileNotFoundError:
-        print(Fore.RED + f"✖ Error: Credentials file '{creds_file}' not found.")
-        sys.exit(1)
+                print(color + f"⏳ Starting download of '{file_name}'...")
+
+            with open(part_path, 'ab') as fh:
+                while file_size is None or offset < file_size:
+                    end = offset + sizer.chunk_size - 1
+                    if file_size is not None:
+                        end = min(end, file_size - 1)
+                    sizer.start()
+                    try:
+                        data = get_rate_limiter().call(fetch_range, request.http, request.uri, offset, end)
+                    except DriveHttpError as e:
+                        # Without a known size, a partial file holding every byte ends here
+                        if e.status == 416 and file_size is None and offset:
+                            break
+                        raise
+                    fh.write(data)
+                    offset += len(data)
+                    sizer.record(len(data))
+                    if file_size is None and offset <= end:
+                        # A short chunk is the end of the file
+                        break
+                    if not data:
+                        raise IOError(f"download stopped at byte {offset} of {file_size}")
+                    percent = milestones.crossed(offset / file_size) if file_size and offset < file_size else None
+                    if percent:
+                        print(color + f"🔄 Downloading '{file_name}': {percent}%")
+        elif not os.path.exists(part_path):
+            # Empty source file, there is nothing to request
+            open(part_path, 'wb').close()
+
+        if file_size is not None and os.path.getsize(part_path) != file_size:
+            os.remove(part_path)
+            raise IOError(f"downloaded size does not match the expected {file_size} bytes")
+        os.replace(part_path, file_path)
+        return True
     except Exception as e:
-        print(Fore.RED + f"✖ An error occurred during authentication: {e}")
-        sys.exit(1)
+        print(Fore.RED + f"✖ Failed to download '{file_name}': {e}\n")
+        return False
+
+def stream_large_file(creds, item, subfolder_ids):
+    """
+    Streams a large file from the source folder straight into its target subfolder,
+    without staging it in large_files_path.
 
-def download_images_videos(service, folder_id, download_path, large_files_path, size_threshold):
+    Parameters:
+        creds (Credentials): Credentials used to build the HTTP clients.
+        item (dict): Source file resource.
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
+
+    Returns:
+        bool: True if the file was streamed successfully, False otherwise.
+    """
+    file_name = item['name']
+    destinations = route_file(file_name, item['mimeType'], exif=source_exif(creds, item))
+    if not destinations:
+        print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unsupported MIME type '{item['mimeType']}'.\n")
+        return False
+    subfolder_type = destinations[0]
+    try:
+        print(Fore.MAGENTA + f"⏳ Streaming large file '{file_name}' to '{subfolder_type}' subfolder...")
+        file_metadata = {
+            'name': file_name,
+            'parents': [subfolder_ids[subfolder_type]]
+        }
+        # The source is read with the main credentials, only the upload goes through the identity
+        with assign_identity(int(item.get('size', 0))) as identity:
+            upload_creds = None if identity is None else identity.credentials()
+            file_id = stream_file(creds, item, file_metadata, session_store=get_session_store(), upload_creds=upload_creds)
+            record_upload(int(item.get('size', 0)))
+        print(Fore.GREEN + f"✔ Successfully streamed large file '{file_name}' with File ID: {file_id}.\n")
+        record_transfer(item, [subfolder_type], {subfolder_type: file_id})
+        return True
+    except Exception as e:
+        print(Fore.RED + f"✖ Failed to stream large file '{file_name}': {e}\n")
+        return False
+
+def download_images_videos(service, folder_id, download_path, large_files_path, size_threshold, creds=None, max_workers=1,
+                           subfolder_ids=None, items=None):
     """
     Downloads all images and videos from the specified Google Drive folder.
-    Files exceeding the size_threshold are downloaded to large_files_path instead of download_path.
+    Files exceeding the size_threshold are downloaded to large_files_path instead of download_path,
+    or streamed straight into the target subfolders, see streams_large_files().
+
+    Files are staged in download_path under their file ID, see staging.py, and each
+    download waits while the staging area is full.
+
+    When creds are given and max_workers is greater than 1, files are downloaded by a
+    bounded pool of worker threads, each with its own Drive client. With
+    config.lane_scheduler, the max_workers threads take the small files, smallest first
+    within each window of config.lane_sort_window files, while files above size_threshold
+    go to a separate large lane, see lanes.py.
 
     Parameters:
         service: Authorized Google Drive service instance.
@@ -69,73 +581,71 @@ def download_images_videos(service, folder_id, download_path, large_files_path,
         download_path (str): Local path to save downloaded files.
         large_files_path (str): Local path to save large files.
         size_threshold (int): Maximum file size in bytes for immediate upload.
+        creds (Credentials or None): Credentials used to build per-worker clients.
+        max_workers (int): Number of concurrent downloads.
+        subfolder_ids (dict or None): Target subfolder IDs, needed to stream large files and to
+            place files whose content is already in the target.
+        items (iterable or None): Source file resources to download instead of listing the folder.
+
+    Returns:
+        dict: Mapping of the names of the files saved in download_path to their source file resources.
     """
-    try:
-        page_token = None
-        while True:
-            query = f"'{folder_id}' in parents and (mimeType contains 'image/' or mimeType contains 'video/') and trashed=false"
-            print(Fore.CYAN + "🔍 Searching for images and videos in the source folder...")
-            
-            # Get files and handle pagination
-            results = service.files().list(
-                q=query, 
-                fields="nextPageToken, files(id, name, mimeType, size)", 
-                pageToken=page_token
-            ).execute()
-            items = results.get('files', [])
-
-            if not items:
-                print(Fore.YELLOW + "⚠ No more image or video files found in the source folder.\n")
-                break
+    stats = TransferStats()
+    staging = get_staging_area(download_path)
+    downloaded = {}
+    lanes = get_lane_scheduler(size_threshold, max_workers) if creds is not None else None
+    threaded = creds is not None and (max_workers > 1 or lanes is not None)
+
+    def download_item(item):
+        file_id = item['id']
+        file_name = item['name']
+        file_size = int(item.get('size', 0))  # size is in bytes
+        worker_service = get_worker_service(creds) if threaded else service
 
-            print(Fore.CYAN + f"📂 Found {len(items)} files to process.\n")
+        # Content already in the target is neither downloaded nor uploaded again
+        if subfolder_ids is not None and transfer_duplicate(item, subfolder_ids, worker_service):
+            return
+
+        if file_size > size_threshold and streams_large_files() and subfolder_ids is not None and creds is not None:
+            stats.record(file_size, stream_large_file(creds, item, subfolder_ids))
+            return
+
+        if file_size > size_threshold:
+            # Move to large_files_path
+            large_file_path = os.path.join(large_files_path, file_name)
+            print(Fore.MAGENTA + f"📁 File '{file_name}' exceeds the size threshold ({file_size} bytes). Moving to 'large_files' folder.")
+            ok = download_file(worker_service, file_id, file_name, large_file_path, color=Fore.MAGENTA, file_size=file_size)
+            if ok:
+                print(Fore.GREEN + f"✔ Successfully downloaded large file '{file_name}' to '{large_files_path}'.\n")
+            stats.record(file_size, ok)
+            return  # Skip uploading this file now
+
+        # Download to download_path
+        file_path = staging.path_for(item)
+        staging.reserve(item)
+        ok = download_file(worker_service, file_id, file_name, file_path, file_size=file_size)
+        if ok:
+            print(Fore.GREEN + f"✔ Successfully downloaded '{file_name}'.\n")
+            downloaded[os.path.basename(file_path)] = item
+        else:
+            staging.release(item)
+        stats.record(file_size, ok)
+
+    try:
+        if items is None:
+            items = list_pending_files(service, folder_id, creds)
+        if lanes is not None:
+            lanes.run(items, download_item)
+        elif threaded:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(download_item, item) for item in items]
+                for future in as_completed(futures):
+                    future.result()
+        else:
             for item in items:
-                file_id = item['id']
-                file_name = item['name']
-                mime_type = item['mimeType']
-                file_size = int(item.get('size', 0))  # size is in bytes
-
-                if file_size > size_threshold:
-                    # Move to large_files_path
-                    large_file_path = os.path.join(large_files_path, file_name)
-                    print(Fore.MAGENTA + f"📁 File '{file_name}' exceeds the size threshold ({file_size} bytes). Moving to 'large_files' folder.")
-                    try:
-                        request = service.files().get_media(fileId=file_id)
-                        fh = io.FileIO(large_file_path, 'wb')
-                        downloader = MediaIoBaseDownload(fh, request)
-
-                        done = False
-                        print(Fore.MAGENTA + f"⏳ Starting download of large file '{file_name}'...")
-                        while not done:
-                            status, done = downloader.next_chunk()
-                            if status:
-                                print(Fore.MAGENTA + f"🔄 Downloading '{file_name}': {int(status.progress() * 100)}%")
-                        print(Fore.GREEN + f"✔ Successfully downloaded large file '{file_name}' to '{large_files_path}'.\n")
-                    except Exception as e:
-                        print(Fore.RED + f"✖ Failed to download large file '{file_name}': {e}\n")
-                    continue  # Skip uploading this file now
-
-                # Download to download_path
-                file_path = os.path.join(download_path, file_name)
-                try:
-                    request = service.files().get_media(fileId=file_id)
-                    fh = io.FileIO(file_path, 'wb')
-                    downloader = MediaIoBaseDownload(fh, request)
-
-                    done = False
-                    print(Fore.BLUE + f"⏳ Starting download of '{file_name}'...")
-                    while not done:
-                        status, done = downloader.next_chunk()
-                        if status:
-                            print(Fore.BLUE + f"🔄 Downloading '{file_name}': {int(status.progress() * 100)}%")
-                    print(Fore.GREEN + f"✔ Successfully downloaded '{file_name}'.\n")
-                except Exception as e:
-                    print(Fore.RED + f"✖ Failed to download '{file_name}': {e}\n")
-            
-            # Check if there is another page of results
-            page_token = results.get('nextPageToken')
-            if not page_token:
-                break  # No more pages, exit the loop
+                download_item(item)
+        stats.report("Download")
+        return downloaded
     except Exception as e:
         print(Fore.RED + f"✖ An error occurred while listing or downloading files: {e}\n")
         sys.exit(1)
@@ -144,6 +654,7 @@ def download_images_videos(service, folder_id, download_path, large_files_path,
 def create_subfolders(service, parent_folder_id, subfolder_names):
     """
     Creates subfolders inside the parent folder if they do not already exist.
+    All lookups and creations are sent as batch requests rather than one call per subfolder.
 
     Parameters:
         service: Authorized Google Drive service instance.
@@ -153,208 +664,922 @@ def create_subfolders(service, parent_folder_id, subfolder_names):
     Returns:
         dict: Mapping of subfolder names to their respective IDs.
     """
-    subfolder_ids = {}
+    subfolder_ids, created, errors = find_or_create_folders(service, parent_folder_id, subfolder_names)
     for name in subfolder_names:
-        # Check if subfolder already exists
-        query = f"mimeType = 'application/vnd.google-apps.folder' and name = '{name}' and '{parent_folder_id}' in parents and trashed = false"
-        try:
-            results = service.files().list(q=query, fields="files(id, name)").execute()
-            files = results.get('files', [])
-            if files:
-                subfolder_ids[name] = files[0]['id']
-                print(Fore.GREEN + f"✔ Subfolder '{name}' already exists with ID: {files[0]['id']}.")
-            else:
-                # Create the subfolder
-                file_metadata = {
-                    'name': name,
-                    'mimeType': 'application/vnd.google-apps.folder',
-                    'parents': [parent_folder_id]
-                }
-                folder = service.files().create(body=file_metadata, fields='id').execute()
-                subfolder_ids[name] = folder.get('id')
-                print(Fore.GREEN + f"✔ Created subfolder '{name}' with ID: {folder.get('id')}.")
-        except Exception as e:
-            print(Fore.RED + f"✖ Failed to create or find subfolder '{name}': {e}\n")
-            sys.exit(1)
+        if name not in subfolder_ids:
+            continue
+        if name in created:
+            print(Fore.GREEN + f"✔ Created subfolder '{name}' with ID: {subfolder_ids[name]}.")
+        else:
+            print(Fore.GREEN + f"✔ Subfolder '{name}' already exists with ID: {subfolder_ids[name]}.")
+    if errors:
+        print(Fore.RED + f"✖ Failed to create or find {len(errors)} subfolders.\n")
+        sys.exit(1)
     print()  # Add a newline for better readability
+    load_target_index(service, subfolder_ids)
     return subfolder_ids
 
 def push_file(file_name,target_subfolder_id,subfolder_type,file_path,service):
+    """
+    Uploads a local file into a target Google Drive subfolder.
+
+    Parameters:
+        file_name (str): Name to give the uploaded file.
+        target_subfolder_id (str): ID of the destination subfolder.
+        subfolder_type (str): Name of the destination subfolder, used for output.
+        file_path (str): Local path of the file to upload.
+        service: Authorized Google Drive service instance.
+
+    Returns:
+        str or None: ID of the uploaded file, or None if the upload failed.
+    """
     try:
         file_metadata = {
             'name': file_name,
             'parents': [target_subfolder_id]
         }
-        media = MediaFileUpload(file_path, resumable=True)
         print(Fore.BLUE + f"⏳ Uploading '{file_name}' to '{subfolder_type}' subfolder...")
-        file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+        key = UploadSessionStore.file_key(file_path, target_subfolder_id)
+        file = resumable_create(service, file_metadata, file_path, key)
         print(Fore.GREEN + f"✔ Successfully uploaded '{file_name}' with File ID: {file.get('id')}.\n")
+        return file.get('id')
     except Exception as e:
         print(Fore.RED + f"✖ Failed to upload '{file_name}': {e}\n")
+        return None
 
-def group_photo_compactabilty_check(image_path, cascade_path='haarcascade_frontalface_default.xml'):
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_path)
+def copy_file(file_id,file_name,target_subfolder_id,subfolder_type,service):
+    """
+    Copies a Google Drive file into a target subfolder server-side, without
+    downloading or uploading its bytes.
 
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"Error: Unable to load image at {image_path}")
-        return 0
+    Parameters:
+        file_id (str): ID of the source Google Drive file.
+        file_name (str): Name to give the copy.
+        target_subfolder_id (str): ID of the destination subfolder.
+        subfolder_type (str): Name of the destination subfolder, used for output.
+        service: Authorized Google Drive service instance.
+
+    Returns:
+        str or None: ID of the new copy, or None if the copy failed.
+    """
+    try:
+        file_metadata = {
+            'name': file_name,
+            'parents': [target_subfolder_id]
+        }
+        print(Fore.BLUE + f"⏳ Copying '{file_name}' to '{subfolder_type}' subfolder...")
+        file = execute(service.files().copy(fileId=file_id, body=file_metadata, fields='id'))
+        print(Fore.GREEN + f"✔ Successfully copied '{file_name}' with File ID: {file.get('id')}.\n")
+        return file.get('id')
+    except Exception as e:
+        print(Fore.RED + f"✖ Failed to copy '{file_name}': {e}\n")
+        return None
+
+def link_file(file_id,file_name,target_subfolder_id,subfolder_type,service,policy=None):
+    """
+    Places an already uploaded file in another subfolder without uploading its bytes
+    again, as chosen by config.extra_destination_policy:
+    'shortcut' creates a Drive shortcut and 'copy' makes a server-side copy.
+
+    Parameters:
+        file_id (str): ID of the uploaded file.
+        file_name (str): Name of the file.
+        target_subfolder_id (str): ID of the additional subfolder.
+        subfolder_type (str): Name of the additional subfolder, used for output.
+        service: Authorized Google Drive service instance.
+        policy (str or None): Policy to use instead of config.extra_destination_policy.
+
+    Returns:
+        str or None: ID of the shortcut, copy or file placed in the subfolder, or None if linking failed.
+    """
+    policy = policy or config.extra_destination_policy
+    try:
+        file = execute(link_request(file_id, file_name, target_subfolder_id, service, policy))
+        print(Fore.GREEN + f"✔ Linked '{file_name}' into '{subfolder_type}' subfolder ({policy}) with File ID: {file.get('id')}.\n")
+        return file.get('id')
+    except Exception as e:
+        print(Fore.RED + f"✖ Failed to link '{file_name}' into '{subfolder_type}': {e}\n")
+        return None
+
+def link_request(file_id, file_name, target_subfolder_id, service, policy):
+    """
+    Builds the Drive request link_file() sends for a policy, without executing it.
+
+    Returns:
+        HttpRequest: Request for the shortcut or copy.
+    """
+    file_metadata = {
+        'name': file_name,
+        'parents': [target_subfolder_id]
+    }
+    if policy in ('copy', 'upload'):
+        # Without a local file to upload again, 'upload' stores a server-side copy instead
+        return service.files().copy(fileId=file_id, body=file_metadata, fields='id')
+    file_metadata.update({
+        'mimeType': SHORTCUT_MIME_TYPE,
+        'shortcutDetails': {'targetId': file_id},
+    })
+    return service.files().create(body=file_metadata, fields='id')
+
+def queue_link(batch, file_id, file_name, target_subfolder_id, subfolder_type, target_ids, policy=None):
+    """
+    Queues the request of link_file() on a batch, so the links of many destinations or
+    files go out in one batch request.
+
+    Parameters:
+        batch (DriveBatch): Batch the request is added to.
+        file_id (str): ID of the uploaded file.
+        file_name (str): Name of the file.
+        target_subfolder_id (str): ID of the additional subfolder.
+        subfolder_type (str): Name of the additional subfolder.
+        target_ids (dict): Receives the ID of the shortcut, copy or file under subfolder_type
+            once the batch is executed, None if linking failed.
+        policy (str or None): Policy to use instead of config.extra_destination_policy.
+    """
+    policy = policy or config.extra_destination_policy
+    target_ids[subfolder_type] = None
+
+    def linked(file):
+        target_ids[subfolder_type] = file.get('id')
+        print(Fore.GREEN + f"✔ Linked '{file_name}' into '{subfolder_type}' subfolder ({policy}) with File ID: {file.get('id')}.\n")
+
+    batch.add(link_request(file_id, file_name, target_subfolder_id, batch.service, policy), linked,
+              label=f"link '{file_name}' into '{subfolder_type}'")
+
+def deliver_file(file_name, destinations, subfolder_ids, service, file_path=None, source_file_id=None):
+    """
+    Places a file in all of its destination subfolders while transferring its bytes only once.
+
+    The file is uploaded from file_path, or copied server-side from source_file_id, into the
+    first destination. The other destinations are linked with one batch request, see
+    link_file(), unless config.extra_destination_policy is 'upload', which uploads the bytes
+    again for each of them.
+
+    Parameters:
+        file_name (str): Name of the file.
+        destinations (list): Subfolder names, as returned by route_file().
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
+        service: Authorized Google Drive service instance.
+        file_path (str or None): Local path of the file to upload.
+        source_file_id (str or None): ID of the source Drive file to copy when there is no local file.
+
+    Returns:
+        dict: Mapping of destination subfolder names to the created file IDs, None for failures.
+    """
+    primary = destinations[0]
+    if file_path is not None:
+        file_id = push_file(
+            file_name=file_name,
+            file_path=file_path,
+            subfolder_type=primary,
+            target_subfolder_id=subfolder_ids[primary],
+            service=service
+        )
+    else:
+        file_id = copy_file(
+            file_id=source_file_id,
+            file_name=file_name,
+            subfolder_type=primary,
+            target_subfolder_id=subfolder_ids[primary],
+            service=service
+        )
+    target_ids = {primary: file_id}
+
+    batch = DriveBatch(service)
+    for subfolder_type in destinations[1:]:
+        if file_id is None:
+            target_ids[subfolder_type] = None
+        elif config.extra_destination_policy == 'upload' and file_path is not None:
+            target_ids[subfolder_type] = push_file(
+                file_name=file_name,
+                file_path=file_path,
+                subfolder_type=subfolder_type,
+                target_subfolder_id=subfolder_ids[subfolder_type],
+                service=service
+            )
+        else:
+            queue_link(batch, file_id, file_name, subfolder_ids[subfolder_type], subfolder_type, target_ids)
+    batch.execute()
+    return target_ids
+
+def group_photo_compactabilty_check(image_path, cascade_path='haarcascade_frontalface_default.xml', content_hash=None):
+    """
+    Checks whether an image shows more people than config.group_photo_threshold_person_count.
+
+    Face counts are looked up in, and saved to, the face count cache when it is enabled.
+
+    Parameters:
+        image_path (str): Path to the image file.
+        cascade_path (str): File name of the Haar cascade XML file bundled with OpenCV.
+        content_hash (str or None): MD5 of the image, such as its Drive md5Checksum. Computed from
+            the file when None.
+
+    Returns:
+        bool: True if the image is a group photo.
+    """
+    content_hash = content_hash or image_content_hash(image_path)
+    face_count = cached_face_count(content_hash)
+    if face_count is None:
+        face_count = get_face_detector(cascade_path).count_faces(image_path)
+        store_face_count(content_hash, face_count)
+    return is_group_photo(face_count, image_path)
+
+def image_content_hash(image_path, item=None):
+    """
+    Returns the content hash that keys an image in the face count cache, or None when the
+    cache is disabled.
+
+    Parameters:
+        image_path (str): Path to the image file.
+        item (dict or None): Source file resource, whose md5Checksum avoids hashing the file.
+
+    Returns:
+        str or None: MD5 hex digest of the image content.
+    """
+    if get_face_cache() is None:
+        return None
+    if item is not None and item.get('md5Checksum'):
+        return item['md5Checksum']
+    return file_md5(image_path)
+
+def cached_face_count(content_hash):
+    """
+    Returns the cached face count of an image for the configured detector settings.
+
+    Parameters:
+        content_hash (str or None): MD5 of the image content.
+
+    Returns:
+        int or None: Cached face count, or None if not cached.
+    """
+    cache = get_face_cache()
+    if cache is None or content_hash is None:
+        return None
+    return cache.get(content_hash, configured_params_key())
 
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+def store_face_count(content_hash, face_count):
+    """
+    Saves the face count of an image in the face count cache.
+
+    Parameters:
+        content_hash (str or None): MD5 of the image content.
+        face_count (int or None): Number of faces detected, None if the image could not be decoded.
+    """
+    cache = get_face_cache()
+    if cache is not None and content_hash is not None and face_count is not None:
+        cache.put(content_hash, configured_params_key(), face_count)
+
+def classify_by_thumbnail(creds, item):
+    """
+    Runs the group photo check on Drive's thumbnail of an image instead of the original.
+
+    The thumbnail is fetched at config.thumbnail_size pixels on its longest side, and the
+    minimum face size is scaled down by the ratio of the original's longest side to the
+    thumbnail's. When the face count lands within config.thumbnail_uncertainty of the group
+    photo threshold, the thumbnail is not trusted and the full image has to be checked instead.
 
-    faces = face_cascade.detectMultiScale(
-        gray_image,
-        scaleFactor=1.05, 
-        minNeighbors=8,  
-        minSize=(20, 20),  
-        flags=cv2.CASCADE_SCALE_IMAGE
-    )
+    Parameters:
+        creds (Credentials): Credentials used to fetch the thumbnail.
+        item (dict): Source file resource with a 'thumbnailLink' field and, for the scaling,
+            'imageMediaMetadata' with 'width' and 'height'.
+
+    Returns:
+        bool or None: Group photo decision, or None if the full image is needed.
+    """
+    if not item.get('thumbnailLink'):
+        return None
+    # Thumbnails count fewer small faces than originals, so they are cached under their own key
+    params_key = f"{configured_params_key()}|thumb{config.thumbnail_size}|scaled"
+    cache = get_face_cache()
+    face_count = cache.get(item['md5Checksum'], params_key) if cache and item.get('md5Checksum') else None
+    if face_count is None:
+        try:
+            data = get_rate_limiter().call(
+                download_thumbnail, get_worker_http(creds), item['thumbnailLink'], config.thumbnail_size
+            )
+        except Exception as e:
+            print(Fore.YELLOW + f"⚠ Could not fetch the thumbnail of '{item['name']}': {e}")
+            return None
+        metadata = item.get('imageMediaMetadata', {})
+        original_size = max(int(metadata.get('width', 0)), int(metadata.get('height', 0)))
+        face_count = get_face_detector().count_faces_in_bytes(data, reduction=1, original_size=original_size)
+        if face_count is None:
+            return None
+        if cache and item.get('md5Checksum'):
+            cache.put(item['md5Checksum'], params_key, face_count)
 
-    if len(faces) > config.group_photo_threshold_person_count:
-        print(f"Number of faces detected in {image_path}: {len(faces)}")
+    threshold = config.group_photo_threshold_person_count
+    if abs(face_count - threshold) <= max(1, threshold * config.thumbnail_uncertainty):
+        print(Fore.CYAN + f"🔎 Thumbnail of '{item['name']}' shows {face_count} faces, close to the threshold. Checking the full image.")
+        return None
+    return is_group_photo(face_count, item['name'])
+
+def is_group_photo(face_count, image_path):
+    """
+    Applies the group photo threshold to a face count.
+
+    Parameters:
+        face_count (int or None): Number of faces detected, None if the image could not be decoded.
+        image_path (str): Path to the image file, used for output.
+
+    Returns:
+        bool: True if the image is a group photo.
+    """
+    if face_count is None:
+        print(f"Error: Unable to load image at {image_path}")
+        return False
+
+    if face_count > config.group_photo_threshold_person_count:
+        print(f"Number of faces detected in {image_path}: {face_count}")
         return True
     else:
         return False
 
 
-def upload_to_drive(service, upload_folder_id, upload_path):
+def source_exif(creds, item):
+    """
+    Reads the EXIF fields of a source image with a Range request for its first bytes,
+    for modes that never download the whole file.
+
+    Parameters:
+        creds (Credentials or None): Credentials used to build the HTTP client.
+        item (dict): Source file resource.
+
+    Returns:
+        dict or None: EXIF fields, or None if EXIF routing is disabled or no EXIF was found.
+    """
+    if not config.exif_routing or creds is None or not item['mimeType'].startswith('image/'):
+        return None
+    try:
+        return get_rate_limiter().call(fetch_exif, get_worker_http(creds), item['id'], int(item.get('size', 0)))
+    except Exception as e:
+        print(Fore.YELLOW + f"⚠ Could not read the EXIF data of '{item['name']}', routing by name: {e}")
+        return None
+
+def route_file(file_name, mime_type, file_path=None, group_photo=None, exif=None):
+    """
+    Decides which target subfolders a file belongs in.
+
+    Images go to 'DSLR', 'geotaged' or 'images' based on their EXIF camera make and GPS
+    data, or on their name when no EXIF is available, and additionally to 'GroupPhotos'
+    when a local copy is available and passes the group photo check. Videos go to
+    'videos'. The first subfolder is the one that receives the file's bytes, see
+    deliver_file().
+
+    Parameters:
+        file_name (str): Name of the file.
+        mime_type (str): MIME type of the file.
+        file_path (str or None): Local path of the file, used for the EXIF header and the
+            group photo check.
+        group_photo (bool or None): Result of a group photo check that already ran elsewhere,
+            such as in the classification process pool. When given, the check is not repeated.
+        exif (dict or None): EXIF fields already read elsewhere, see source_exif().
+
+    Returns:
+        list: Subfolder names the file should be placed in, empty if unsupported.
+    """
+    if mime_type.startswith('image/'):
+        if exif is None and file_path is not None and config.exif_routing:
+            exif = read_exif_file(file_path)
+        if exif:
+            subfolder_type = exif_subfolder(exif)
+        elif 'DSC' in file_name:
+            subfolder_type = 'DSLR'
+        elif 'GPS' in file_name:
+            subfolder_type = 'geotaged'
+        else:
+            subfolder_type = 'images'
+        if group_photo is None:
+            group_photo = file_path is not None and group_photo_compactabilty_check(image_path=file_path)
+        if group_photo:
+            return [subfolder_type, 'GroupPhotos']
+        return [subfolder_type]
+    elif mime_type.startswith('video/'):
+        return ['videos']
+    return []
+
+def upload_to_drive(service, upload_folder_id, upload_path, source_items=None):
     """
     Uploads all files from the specified local directory to the target Google Drive folder,
     organizing images and videos into separate subfolders.
 
+    Only the files downloaded by this run are uploaded, under their source name, and
+    removed from the staging area as soon as they have reached all of their destinations.
+    Files left in the directory by earlier runs are named after their source file ID, so
+    they are skipped. Their source files are listed and downloaded again until they are
+    transferred.
+
     Parameters:
         service: Authorized Google Drive service instance.
         upload_folder_id (str): ID of the target Google Drive folder.
         upload_path (str): Local path where files are stored to be uploaded.
+        source_items (dict or None): Mapping of local file names to their source file resources,
+            as returned by download_images_videos(), used to name files and record completed transfers.
     """
     try:
         # Create subfolders 'images' and 'videos' inside the target folder
-        subfolders = ['images', 'videos','DSLR','GroupPhotos','geotaged']
-        subfolder_ids = create_subfolders(service, upload_folder_id, subfolders)
+        subfolder_ids = create_subfolders(service, upload_folder_id, SUBFOLDERS)
+        staging = get_staging_area(upload_path)
+        source_items = source_items or {}
 
-        files = os.listdir(upload_path)
+        files = list(source_items)
+        if not staging.budget:
+            # Partial downloads are resumed by the next run, never uploaded
+            leftovers = [name for name in os.listdir(upload_path) if not name.endswith('.part') and name not in source_items]
+            if leftovers:
+                print(Fore.YELLOW + f"⚠ Skipping {len(leftovers)} files left in '{upload_path}' by an earlier run.\n")
+        if config.lane_scheduler:
+            # Smallest first, so most files are in the target early in the run
+            files.sort(key=lambda name: os.path.getsize(os.path.join(upload_path, name)))
         if not files:
             print(Fore.YELLOW + "⚠ No files available to upload.\n")
             return
 
         print(Fore.CYAN + f"📤 Starting upload of {len(files)} files to folder ID: {upload_folder_id}\n")
-        for file_name in files:
-            file_path = os.path.join(upload_path, file_name)
-            mime_type = get_mime_type(file_path)
 
-            if mime_type is None:
-                print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unable to determine MIME type.\n")
-                continue
+        def upload(local_name, file_path, mime_type, group_photo=None):
+            item = source_items[local_name]
+            file_name = item['name']
+            # Determine target subfolders based on MIME type
+            destinations = route_file(file_name, mime_type, file_path, group_photo=group_photo)
+            if not destinations:
+                print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unsupported MIME type '{mime_type}'.\n")
+                staging.evict(item)
+                return
 
-            # Determine target subfolder based on MIME type
-            
-            if mime_type.startswith('image/'):
-                if 'DSC' in file_name:
-                    target_subfolder_id = subfolder_ids['DSLR']
-                    subfolder_type = 'DSLR'
-                    if group_photo_compactabilty_check(image_path=file_path):
-                        target_subfolder_id = subfolder_ids['GroupPhotos']
-                        subfolder_type = 'GroupPhotos'
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-                        target_subfolder_id = subfolder_ids['DSLR']
-                        subfolder_type = 'DSLR'
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-                    else:
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-
-                elif 'GPS' in file_name:
-                    target_subfolder_id = subfolder_ids['geotaged']
-                    subfolder_type = 'geotaged'
-                    if group_photo_compactabilty_check(image_path=file_path):
-                        target_subfolder_id = subfolder_ids['GroupPhotos']
-                        subfolder_type = 'GroupPhotos'
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-                        target_subfolder_id = subfolder_ids['geotaged']
-                        subfolder_type = 'geotaged'
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-                    else:
-                        push_file(
-                            file_name=file_name,
-                            file_path=file_path,
-                            subfolder_type=subfolder_type,
-                            target_subfolder_id=target_subfolder_id,
-                            service=service
-                        )
-                elif group_photo_compactabilty_check(image_path=file_path):
-                    target_subfolder_id = subfolder_ids['GroupPhotos']
-                    subfolder_type = 'GroupPhotos'
-                    push_file(
-                        file_name=file_name,
-                        file_path=file_path,
-                        subfolder_type=subfolder_type,
-                        target_subfolder_id=target_subfolder_id,
-                        service=service
-                    )
-                    target_subfolder_id = subfolder_ids['images']
-                    subfolder_type = 'images'
-                    push_file(
-                        file_name=file_name,
-                        file_path=file_path,
-                        subfolder_type=subfolder_type,
-                        target_subfolder_id=target_subfolder_id,
-                        service=service
-                    )
-                else:
-                    target_subfolder_id = subfolder_ids['images']
-                    subfolder_type = 'images'
-                    push_file(
-                        file_name=file_name,
-                        file_path=file_path,
-                        subfolder_type=subfolder_type,
-                        target_subfolder_id=target_subfolder_id,
-                        service=service
-                    )
-            elif mime_type.startswith('video/'):
-                target_subfolder_id = subfolder_ids['videos']
-                subfolder_type = 'videos'
-                push_file(
-                    file_name=file_name,
-                    file_path=file_path,
-                    subfolder_type=subfolder_type,
-                    target_subfolder_id=target_subfolder_id,
-                    service=service
-                )
+            index = get_target_index()
+            key = content_key(item, file_path) if index is not None else None
+            placements = index.find(key) if key else None
+            if placements:
+                target_ids = place_duplicate(file_name, key, placements, subfolder_ids, service)
+                destinations = list(target_ids)
             else:
+                file_size = os.path.getsize(file_path)
+                with upload_service(service, placed_bytes(file_size, destinations)) as upload_svc:
+                    target_ids = deliver_file(file_name, destinations, subfolder_ids, upload_svc, file_path=file_path)
+                    record_upload(delivered_bytes(file_size, target_ids))
+            ok = all(target_ids.values())
+            if ok:
+                record_transfer(item, destinations, target_ids)
+            # Free the staging space right away, failed uploads stay for inspection
+            if ok and config.clean_up_downloaded_files_after_uploading:
+                staging.evict(item)
+            else:
+                staging.release(item)
+
+        # Images are classified in worker processes while the other files are uploaded,
+        # and each image is uploaded as soon as its face count comes back
+        with create_face_pool(config.classification_workers) as face_pool:
+            classifying = {}
+            for local_name in files:
+                file_path = os.path.join(upload_path, local_name)
+                file_name = source_items[local_name]['name']
+                mime_type = get_mime_type(file_path)
+
+                if mime_type is None:
+                    print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unable to determine MIME type.\n")
+                    staging.release(source_items[local_name])
+                    continue
+
+                if mime_type.startswith('image/'):
+                    content_hash = image_content_hash(file_path, source_items[local_name])
+                    face_count = cached_face_count(content_hash)
+                    if face_count is not None:
+                        upload(local_name, file_path, mime_type, group_photo=is_group_photo(face_count, file_path))
+                        continue
+                    future = face_pool.submit(count_faces_in_worker, file_path)
+                    classifying[future] = (local_name, file_name, file_path, mime_type, content_hash)
+                else:
+                    upload(local_name, file_path, mime_type)
+
+            for future in as_completed(classifying):
+                local_name, file_name, file_path, mime_type, content_hash = classifying[future]
+                try:
+                    face_count = future.result()
+                except Exception as e:
+                    print(Fore.RED + f"✖ Face detection failed for '{file_name}': {e}\n")
+                    face_count = None
+                store_face_count(content_hash, face_count)
+                upload(local_name, file_path, mime_type, group_photo=is_group_photo(face_count, file_path))
+
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred while uploading files: {e}\n")
+        sys.exit(1)
+
+def copy_images_videos(service, source_folder_id, target_folder_id, download_path, size_threshold, creds=None, items=None):
+    """
+    Copies all images and videos from the source folder into the target subfolders
+    server-side with files().copy. Only images that need the group photo check and are
+    not in the face count cache are downloaded, and their local copy is removed as soon
+    as the check is done. With config.thumbnail_classification, the check runs on Drive's
+    thumbnail first and only falls back to the full image near the threshold.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        source_folder_id (str): ID of the source Google Drive folder.
+        target_folder_id (str): ID of the target Google Drive folder.
+        download_path (str): Local path used to stage images for the group photo check.
+        size_threshold (int): Images larger than this are copied without the group photo check.
+        creds (Credentials or None): Credentials used to list nested subfolders concurrently
+            and to fetch thumbnails.
+        items (iterable or None): Source file resources to copy instead of listing the folder.
+    """
+    try:
+        subfolder_ids = create_subfolders(service, target_folder_id, SUBFOLDERS)
+        staging = get_staging_area(download_path)
+        if items is None:
+            items = list_pending_files(service, source_folder_id, creds)
+
+        for item in items:
+            file_id = item['id']
+            file_name = item['name']
+            mime_type = item['mimeType']
+            file_size = int(item.get('size', 0))
+
+            if transfer_duplicate(item, subfolder_ids, service):
+                continue
+
+            # Only fetch the bytes when the face check actually needs them
+            group_photo = None
+            if (config.group_photo_check_in_copy_mode and mime_type.startswith('image/')
+                    and file_size <= size_threshold):
+                content_hash = item.get('md5Checksum') if get_face_cache() is not None else None
+                face_count = cached_face_count(content_hash)
+                if face_count is not None:
+                    group_photo = is_group_photo(face_count, file_name)
+                elif config.thumbnail_classification and creds is not None:
+                    group_photo = classify_by_thumbnail(creds, item)
+                if group_photo is None and face_count is None:
+                    local_path = staging.path_for(item)
+                    staging.reserve(item)
+                    try:
+                        if download_file(service, file_id, file_name, local_path, file_size=file_size):
+                            group_photo = group_photo_compactabilty_check(local_path, content_hash=content_hash)
+                    finally:
+                        staging.evict(item)
+
+            destinations = route_file(file_name, mime_type, group_photo=group_photo, exif=source_exif(creds, item))
+
+            if not destinations:
                 print(Fore.YELLOW + f"⚠ Skipping '{file_name}': Unsupported MIME type '{mime_type}'.\n")
                 continue
 
+            with upload_service(service, placed_bytes(file_size, destinations)) as upload_svc:
+                target_ids = deliver_file(file_name, destinations, subfolder_ids, upload_svc, source_file_id=file_id)
+                record_upload(delivered_bytes(file_size, target_ids))
+            record_transfer(item, destinations, target_ids)
     except Exception as e:
-        print(Fore.RED + f"✖ An error occurred while uploading files: {e}\n")
+        print(Fore.RED + f"✖ An error occurred while copying files: {e}\n")
+        sys.exit(1)
+
+def start_stage(in_queue, out_queue, handler, workers, name):
+    """
+    Starts the worker threads of one pipeline stage.
+
+    Each worker takes a task from in_queue, passes it to handler and puts any result
+    that is not None on out_queue. Workers stop when they receive PIPELINE_DONE.
+
+    Parameters:
+        in_queue (queue.Queue): Queue the stage reads its tasks from.
+        out_queue (queue.Queue or None): Queue the stage writes its results to.
+        handler (callable): Function processing a single task.
+        workers (int): Number of worker threads.
+        name (str): Name of the stage, used for thread names and output.
+
+    Returns:
+        list: The started worker threads.
+    """
+    def worker():
+        while True:
+            task = in_queue.get()
+            if task is PIPELINE_DONE:
+                break
+            try:
+                result = handler(task)
+            except Exception as e:
+                print(Fore.RED + f"✖ An error occurred in the {name} stage: {e}\n")
+                continue
+            if result is not None and out_queue is not None:
+                out_queue.put(result)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def finish_stage(in_queue, threads):
+    """
+    Signals the workers of a pipeline stage that no more tasks are coming and waits for them.
+
+    Parameters:
+        in_queue (queue.Queue): Queue the stage reads its tasks from.
+        threads (list): Worker threads returned by start_stage().
+    """
+    for _ in threads:
+        in_queue.put(PIPELINE_DONE)
+    for thread in threads:
+        thread.join()
+
+def run_pipeline(service, creds, source_folder_id, target_folder_id, download_path, large_files_path, size_threshold,
+                 items=None):
+    """
+    Transfers images and videos through a streaming pipeline of listing, download,
+    classification and upload stages connected by bounded queues, so each file moves
+    on as soon as it is ready and downloads overlap with uploads.
+
+    Files exceeding the size_threshold are handled as in download_images_videos(). With
+    config.lane_scheduler, they skip the download stage and are streamed by the workers
+    of a separate large lane, while the download stage takes the small files smallest
+    first within each window of config.lane_sort_window files, see lanes.py.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        creds (Credentials): Credentials used to build per-worker clients.
+        source_folder_id (str): ID of the source Google Drive folder.
+        target_folder_id (str): ID of the target Google Drive folder.
+        download_path (str): Local path used to stage files between download and upload.
+        large_files_path (str): Local path to save large files.
+        size_threshold (int): Maximum file size in bytes for immediate upload.
+        items (iterable or None): Source file resources to transfer instead of listing the folder.
+    """
+    try:
+        subfolder_ids = create_subfolders(service, target_folder_id, SUBFOLDERS)
+        staging = get_staging_area(download_path)
+        if items is None:
+            items = list_pending_files(service, source_folder_id, creds)
+
+        download_queue = queue.Queue(maxsize=config.pipeline_queue_size)
+        classify_queue = queue.Queue(maxsize=config.pipeline_queue_size)
+        upload_queue = queue.Queue(maxsize=config.pipeline_queue_size)
+        # Large files are few, an unbounded queue never holds up the small files behind them
+        large_queue = queue.Queue()
+        lanes = get_lane_scheduler(size_threshold)
+        download_stats = TransferStats()
+        upload_stats = TransferStats()
+
+        def download_stage(item):
+            file_id = item['id']
+            file_name = item['name']
+            file_size = int(item.get('size', 0))
+            worker_service = get_worker_service(creds)
+
+            if transfer_duplicate(item, subfolder_ids, worker_service):
+                return None
+
+            if file_size > size_threshold and streams_large_files():
+                download_stats.record(file_size, stream_large_file(creds, item, subfolder_ids))
+                return None
+
+            if file_size > size_threshold:
+                large_file_path = os.path.join(large_files_path, file_name)
+                print(Fore.MAGENTA + f"📁 File '{file_name}' exceeds the size threshold ({file_size} bytes). Moving to 'large_files' folder.")
+                ok = download_file(worker_service, file_id, file_name, large_file_path, color=Fore.MAGENTA, file_size=file_size)
+                download_stats.record(file_size, ok)
+                return None
+
+            # Waits while the staged files fill the budget, until uploads evict some
+            file_path = staging.path_for(item)
+            staging.reserve(item)
+            ok = download_file(worker_service, file_id, file_name, file_path, file_size=file_size)
+            download_stats.record(file_size, ok)
+            if not ok:
+                staging.release(item)
+                return None
+            return (item, file_path)
+
+        def classify_stage(task):
+            item, file_path = task
+            group_photo = None
+            try:
+                if item['mimeType'].startswith('image/'):
+                    # Blocks only this classify thread, the detection itself runs in a worker process
+                    content_hash = image_content_hash(file_path, item)
+                    face_count = cached_face_count(content_hash)
+                    if face_count is None:
+                        try:
+                            face_count = face_pool.submit(count_faces_in_worker, file_path).result()
+                        except Exception as e:
+                            # A crashed worker or OpenCV error only skips the group photo check
+                            print(Fore.RED + f"✖ Face detection failed for '{item['name']}': {e}\n")
+                        store_face_count(content_hash, face_count)
+                    group_photo = is_group_photo(face_count, file_path)
+                destinations = route_file(item['name'], item['mimeType'], file_path, group_photo=group_photo)
+            except Exception:
+                staging.release(item)
+                raise
+            if not destinations:
+                print(Fore.YELLOW + f"⚠ Skipping '{item['name']}': Unsupported MIME type '{item['mimeType']}'.\n")
+                staging.evict(item)
+                return None
+            return (item, file_path, destinations)
+
+        def upload_stage(task):
+            item, file_path, destinations = task
+            file_size = int(item.get('size', 0))
+            try:
+                with upload_service(get_worker_service(creds), placed_bytes(file_size, destinations)) as upload_svc:
+                    target_ids = deliver_file(item['name'], destinations, subfolder_ids, upload_svc, file_path=file_path)
+                    record_upload(delivered_bytes(file_size, target_ids))
+            except Exception:
+                staging.release(item)
+                raise
+            ok = all(target_ids.values())
+            upload_stats.record(file_size, ok)
+            if ok:
+                record_transfer(item, destinations, target_ids)
+            # Free the staging space right away, failed uploads stay for inspection
+            if ok and config.clean_up_downloaded_files_after_uploading:
+                staging.evict(item)
+            else:
+                staging.release(item)
+
+        classification_workers = config.classification_workers or os.cpu_count()
+        face_pool = create_face_pool(classification_workers)
+        download_threads = start_stage(download_queue, classify_queue, download_stage, config.download_workers, 'download')
+        # One classify thread per worker process keeps every core busy
+        classify_threads = start_stage(classify_queue, upload_queue, classify_stage, classification_workers, 'classify')
+        upload_threads = start_stage(upload_queue, None, upload_stage, config.upload_workers, 'upload')
+        large_threads = []
+        if lanes is not None:
+            large_threads = start_stage(large_queue, None, download_stage, lanes.large_workers, 'large')
+            for large, item in lanes.route(items):
+                (large_queue if large else download_queue).put(item)
+        else:
+            for item in items:
+                download_queue.put(item)
+
+        finish_stage(download_queue, download_threads)
+        finish_stage(large_queue, large_threads)
+        finish_stage(classify_queue, classify_threads)
+        finish_stage(upload_queue, upload_threads)
+        face_pool.shutdown()
+
+        download_stats.report("Download")
+        upload_stats.report("Upload")
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred while running the transfer pipeline: {e}\n")
+        sys.exit(1)
+
+def transfer_item(service, creds, item, subfolder_ids, download_path, large_files_path, size_threshold):
+    """
+    Transfers a single source file end to end: download, classification, upload to every
+    destination subfolder and removal of the local copy.
+
+    Files exceeding the size_threshold are streamed or staged in large_files_path, as in
+    download_images_videos().
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        creds (Credentials): Credentials used to stream large files.
+        item (dict): Source file resource.
+        subfolder_ids (dict): Mapping of subfolder names to their respective IDs.
+        download_path (str): Local path used to stage the file.
+        large_files_path (str): Local path to save large files.
+        size_threshold (int): Maximum file size in bytes for immediate upload.
+
+    Returns:
+        bool: True if the file reached all of its destinations, False otherwise.
+    """
+    file_name = item['name']
+    file_size = int(item.get('size', 0))
+
+    if transfer_duplicate(item, subfolder_ids, service):
+        return True
+
+    if file_size > size_threshold and streams_large_files():
+        return stream_large_file(creds, item, subfolder_ids)
+
+    if file_size > size_threshold:
+        large_file_path = os.path.join(large_files_path, file_name)
+        print(Fore.MAGENTA + f"📁 File '{file_name}' exceeds the size threshold ({file_size} bytes). Moving to 'large_files' folder.")
+        return download_file(service, item['id'], file_name, large_file_path, color=Fore.MAGENTA, file_size=file_size)
+
+    staging = get_staging_area(download_path)
+    file_path = staging.path_for(item)
+    staging.reserve(item)
+    try:
+        if not download_file(service, item['id'], file_name, file_path, file_size=file_size):
+            return False
+
+        group_photo = None
+        if item['mimeType'].startswith('image/'):
+            group_photo = group_photo_compactabilty_check(file_path, content_hash=image_content_hash(file_path, item))
+        destinations = route_file(file_name, item['mimeType'], file_path, group_photo=group_photo)
+        target_ids = {}
+        if destinations:
+            with upload_service(service, placed_bytes(file_size, destinations)) as upload_svc:
+                target_ids = deliver_file(file_name, destinations, subfolder_ids, upload_svc, file_path=file_path)
+                record_upload(delivered_bytes(file_size, target_ids))
+        ok = bool(destinations) and all(target_ids.values())
+        if ok:
+            record_transfer(item, destinations, target_ids)
+            if config.clean_up_downloaded_files_after_uploading:
+                staging.evict(item)
+        return ok
+    finally:
+        # A file kept on disk after a failure no longer counts against the budget
+        staging.release(item)
+
+def watch_source_folder(service, creds, source_folder_id, target_folder_id, download_path, large_files_path, size_threshold):
+    """
+    Watches the source folder with the Drive Changes API and transfers new or changed
+    images and videos as they appear, until interrupted with Ctrl+C.
+
+    Files already in the folder are transferred once at startup. After that, only the
+    changes since the last poll are fetched, and the Drive client and face classifier
+    stay loaded between polls. Requires incremental sync: the page token and the files
+    that failed to transfer are saved in the sync state, so a restart continues where the
+    previous watch stopped and failed files are retried on every poll until they succeed.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        creds (Credentials): Credentials used to stream large files.
+        source_folder_id (str): ID of the source Google Drive folder.
+        target_folder_id (str): ID of the target Google Drive folder.
+        download_path (str): Local path used to stage files.
+        large_files_path (str): Local path to save large files.
+        size_threshold (int): Maximum file size in bytes for immediate upload.
+    """
+    state = get_sync_state()
+    if state is None:
+        print(Fore.RED + "✖ Watch mode needs 'incremental_sync = True' to remember transferred files between polls.\n")
+        sys.exit(1)
+
+    subfolder_ids = create_subfolders(service, target_folder_id, SUBFOLDERS)
+    get_face_detector()
+
+    # Folders whose new files are picked up, the source folder plus its subfolders when listing recursively
+    watched_folder_ids = {source_folder_id}
+    if config.recursive_listing:
+        for _ in walk_source_folder(creds, source_folder_id, folder_ids=watched_folder_ids, include_files=False):
+            pass
+
+    # Files that failed to transfer, keyed by ID and retried on every poll
+    retry_items = {item['id']: item for item in json.loads(state.get_value('watch_retry') or '[]')}
+
+    def attempt(item):
+        try:
+            ok = transfer_item(service, creds, item, subfolder_ids, download_path, large_files_path, size_threshold)
+        except Exception as e:
+            print(Fore.RED + f"✖ An error occurred while transferring '{item['name']}': {e}\n")
+            ok = False
+        if ok:
+            retry_items.pop(item['id'], None)
+        else:
+            print(Fore.YELLOW + f"⚠ '{item['name']}' will be retried on the next poll.")
+            retry_items[item['id']] = item
+        state.set_value('watch_retry', json.dumps(list(retry_items.values())))
+
+    try:
+        page_token = state.get_value('changes_page_token')
+        if page_token is None:
+            # Take the token before the catch-up pass, so nothing added meanwhile is missed
+            page_token = execute(service.changes().getStartPageToken())['startPageToken']
+            print(Fore.MAGENTA + "🔁 Transferring files already in the source folder...\n")
+            for item in list_pending_files(service, source_folder_id, creds):
+                attempt(item)
+            state.set_value('changes_page_token', page_token)
+
+        print(Fore.MAGENTA + f"👀 Watching source folder for new files every {config.watch_poll_interval}s (Ctrl+C to stop)...\n")
+        while True:
+            for item in list(retry_items.values()):
+                if not state.is_synced(item):
+                    attempt(item)
+            while page_token is not None:
+                results = execute(service.changes().list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    spaces='drive',
+                    fields=f"nextPageToken, newStartPageToken, changes(removed, file({file_fields()}, parents, trashed))"
+                ))
+                for change in results.get('changes', []):
+                    item = change.get('file')
+                    if change.get('removed') or not item or item.get('trashed'):
+                        continue
+                    if not watched_folder_ids.intersection(item.get('parents', [])):
+                        continue
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        if config.recursive_listing:
+                            watched_folder_ids.add(item['id'])
+                        continue
+                    if not item['mimeType'].startswith(('image/', 'video/')):
+                        continue
+                    if state.is_synced(item):
+                        continue
+                    print(Fore.CYAN + f"🆕 New file '{item['name']}' detected in the source folder.")
+                    attempt(item)
+
+                if 'newStartPageToken' in results:
+                    # Caught up, failed files stay in the retry list, so the token can move on
+                    page_token = results['newStartPageToken']
+                    state.set_value('changes_page_token', page_token)
+                    break
+                page_token = results.get('nextPageToken')
+            time.sleep(config.watch_poll_interval)
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "\n⚠ Stopped watching the source folder.\n")
+    except Exception as e:
+        print(Fore.RED + f"✖ An error occurred while watching the source folder: {e}\n")
         sys.exit(1)
 
 def get_mime_type(file_path):
@@ -373,14 +1598,27 @@ def get_mime_type(file_path):
 def clean_up(download_path):
     """
     Deletes the local download directory and its contents.
+    Partial '.part' downloads are kept so the next run can resume them.
     
     Parameters:
         download_path (str): Path to the local download directory.
     """
     try:
         if os.path.exists(download_path):
-            shutil.rmtree(download_path)
-            print(Fore.GREEN + f"✔ Cleaned up the local directory '{download_path}'.\n")
+            partial_files = [name for name in os.listdir(download_path) if name.endswith('.part')]
+            if not partial_files:
+                shutil.rmtree(download_path)
+                print(Fore.GREEN + f"✔ Cleaned up the local directory '{download_path}'.\n")
+                return
+            for name in os.listdir(download_path):
+                path = os.path.join(download_path, name)
+                if name.endswith('.part'):
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            print(Fore.GREEN + f"✔ Cleaned up the local directory '{download_path}', keeping {len(partial_files)} partial downloads for the next run.\n")
     except Exception as e:
         print(Fore.RED + f"✖ An error occurred during cleanup: {e}\n")
 
@@ -393,7 +1631,7 @@ def check_storage(service):
     """
     try:
         # Get the storage quota information
-        about = service.about().get(fields="storageQuota").execute()
+        about = execute(service.about().get(fields="storageQuota"))
         total_quota = int(about['storageQuota']['limit'])  # Total storage limit in bytes
         used_quota = int(about['storageQuota']['usage'])   # Used storage in bytes
         remaining_quota = total_quota - used_quota          # Remaining storage in bytes
@@ -443,15 +1681,85 @@ def main():
         print(Fore.BLUE + f"📁 Large files directory '{config.large_files_path}' already exists.\n")
 
     # Authenticate and build the Google Drive service
-    service = authenticate_drive(config.cred_file_path)
+    creds = load_credentials(config.cred_file_path)
+    service = authenticate_drive(config.cred_file_path, creds)
+    load_credential_pool(creds)
+
+    # List the source once and make sure the target account has room before transferring anything
+    items = None
+    if config.preflight_plan or config.dry_run:
+        listing = list_pending_files(service, config.source_folder_id, creds)
+        plan = build_plan(service, listing, config.size_threshold, SUBFOLDERS, route_file, cached_face_count)
+        plan.report()
+        if config.dry_run:
+            print(Fore.YELLOW + "⚠ Dry run, nothing was transferred.\n")
+            return
+        if not plan.fits():
+            print(Fore.RED + "✖ Aborting: the target account does not have enough storage for this transfer.\n")
+            sys.exit(1)
+        # The watch mode lists again after taking its page token, so no file added meanwhile is missed
+        if config.transfer_mode != 'watch':
+            items = plan.items
+
+    # Repeated content is transferred once, the other copies are placed after the run
+    deferred = []
+    if config.target_dedup and config.transfer_mode != 'watch':
+        if items is None:
+            items = list_pending_files(service, config.source_folder_id, creds)
+        items = defer_duplicates(items, deferred)
+
+    if config.transfer_mode == 'copy':
+        # Copy images and videos server-side, without a local round trip
+        print(Fore.MAGENTA + "📑 Initiating server-side copy process...\n")
+        copy_images_videos(service, config.source_folder_id, config.target_folder_id, config.download_path, config.size_threshold,
+                           creds=creds, items=items)
+    elif config.transfer_mode == 'watch':
+        # Keep transferring new files as they arrive in the source folder
+        watch_source_folder(service, creds, config.source_folder_id, config.target_folder_id, config.download_path,
+                            config.large_files_path, config.size_threshold)
+    elif config.transfer_mode == 'async':
+        # Imported here because the async engine builds on the helpers of this module
+        from async_drive import run_async_transfer
+        print(Fore.MAGENTA + "⚡ Initiating asyncio transfer engine...\n")
+        run_async_transfer(service, creds, config.source_folder_id, config.target_folder_id, config.download_path,
+                           config.large_files_path, config.size_threshold, items=items)
+    elif config.transfer_mode == 'pipeline':
+        # Download, classify and upload every file as soon as it is ready
+        print(Fore.MAGENTA + "🔁 Initiating streaming transfer pipeline...\n")
+        run_pipeline(service, creds, config.source_folder_id, config.target_folder_id, config.download_path,
+                     config.large_files_path, config.size_threshold, items=items)
+    else:
+        # Large files are streamed and duplicates placed during the download phase, so they need the target subfolders up front
+        subfolder_ids = None
+        if streams_large_files() or config.target_dedup:
+            subfolder_ids = create_subfolders(service, config.target_folder_id, SUBFOLDERS)
+
+        # With a staging budget, the source folder is downloaded and uploaded in batches that fit it
+        batches = [items]
+        if config.staging_disk_budget:
+            if items is None:
+                items = list_pending_files(service, config.source_folder_id, creds)
+            batches = get_staging_area(config.download_path).batches(items, config.size_threshold)
+
+        for batch in batches:
+            # Download images and videos from the source folder
+            print(Fore.MAGENTA + "🔽 Initiating download process...\n")
+            downloaded = download_images_videos(service, config.source_folder_id, config.download_path,
+                                                config.large_files_path, config.size_threshold, creds=creds,
+                                                max_workers=config.download_workers, subfolder_ids=subfolder_ids,
+                                                items=batch)
+
+            # Upload the downloaded files to target folder
+            print(Fore.MAGENTA + "🔼 Initiating upload process...\n")
+            upload_to_drive(service, config.target_folder_id, config.download_path, source_items=downloaded)
 
-    # Download images and videos from the source folder
-    print(Fore.MAGENTA + "🔽 Initiating download process...\n")
-    download_images_videos(service, config.source_folder_id, config.download_path, config.large_files_path, config.size_threshold)
+    if deferred:
+        print(Fore.MAGENTA + f"🔗 Placing {len(deferred)} files whose content was transferred by another file...\n")
+        place_deferred_duplicates(service, deferred)
 
-    # Upload the downloaded files to target folder
-    print(Fore.MAGENTA + "🔼 Initiating upload process...\n")
-    upload_to_drive(service, config.target_folder_id, config.download_path)
+    pool = get_credential_pool()
+    if pool is not None:
+        pool.report()
 
     # Conditionally clean up the downloaded_files directory
     if config.clean_up_downloaded_files_after_uploading:
@@ -468,4 +1776,7 @@ def main():
     print(Fore.MAGENTA + "="*50 + "\n")
 
 if __name__ == '__main__':
+    # async_drive.py imports this module by name. Registering the running script under that
+    # name keeps it from loading a second copy with its own clients and caches.
+    sys.modules.setdefault('process_content', sys.modules[__name__])
     main()
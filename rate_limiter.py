@@ -0,0 +1,297 @@
+# rate_limiter.py
+
+import time
+import random
+import threading
+from contextlib import contextmanager
+from googleapiclient.errors import HttpError
+import config
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# 403 reasons Drive uses for throttling, other 403s (such as missing permissions) are final
+THROTTLE_REASONS = (b'userRateLimitExceeded', b'rateLimitExceeded')
+
+# Server errors worth retrying
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# Shared limiter, see get_rate_limiter()
+_limiter = None
+_limiter_lock = threading.Lock()
+
+# Limiter replacing the shared one in the calling thread, see scoped_rate_limiter()
+_scoped = threading.local()
+
+
+def error_status(error):
+    """
+    Extracts (status, content, retry_after) from a Drive error, either an HttpError of the
+    API client or a DriveHttpError of the raw requests in stream_transfer.py.
+
+    Returns:
+        tuple or None: Status details, or None if the error is not an HTTP error.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status, error.content or b'', error.resp.get('retry-after')
+    if hasattr(error, 'status') and hasattr(error, 'retry_after'):
+        content = error.content if isinstance(error.content, bytes) else str(error.content).encode()
+        return error.status, content, error.retry_after
+    return None
+
+
+def is_throttled(error):
+    """
+    Checks whether an error means Drive wants the client to slow down.
+    """
+    status = error_status(error)
+    if status is None:
+        return False
+    code, content, _ = status
+    return code == 429 or (code == 403 and any(reason in content for reason in THROTTLE_REASONS))
+
+
+def is_retryable(error, idempotent=True):
+    """
+    Checks whether a failed Drive call may succeed when retried: throttling, server
+    errors and dropped connections.
+
+    Calls that are not idempotent, such as creating or copying a file, are retried only
+    when Drive throttled them. Drive rejects throttled calls before acting on them, while
+    a server error or a dropped connection may follow a file that was created anyway,
+    and retrying would add a duplicate.
+    """
+    if not idempotent:
+        return is_throttled(error)
+    status = error_status(error)
+    if status is None:
+        return isinstance(error, (ConnectionError, TimeoutError))
+    return is_throttled(error) or status[0] in RETRYABLE_STATUSES
+
+
+def retry_after_seconds(error):
+    """
+    Returns the delay requested by a Retry-After header in seconds, or None.
+    """
+    status = error_status(error)
+    try:
+        return float(status[2]) if status and status[2] else None
+    except ValueError:
+        # HTTP dates are rare for Drive, fall back to the computed backoff
+        return None
+
+
+def backoff_delay(attempt, error):
+    """
+    Computes how long to wait before retrying a failed call: exponential backoff with
+    full jitter, but never less than a Retry-After delay sent by the server.
+
+    Parameters:
+        attempt (int): Number of the failed attempt, starting at 0.
+        error (Exception): Error of the failed attempt.
+
+    Returns:
+        tuple: (delay, retry_after) in seconds, retry_after is None without a Retry-After header.
+    """
+    delay = random.uniform(0, min(config.rate_limit_max_backoff, config.rate_limit_base_backoff * 2 ** attempt))
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay, retry_after
+
+
+class TokenBucket:
+    """
+    Classic token bucket: tokens refill at a fixed rate up to a burst size and every
+    request takes one, so the long-term request rate never exceeds the refill rate.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the given number of tokens is available and takes them.
+        """
+        tokens = min(tokens, self.burst)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DriveRateLimiter:
+    """
+    Schedules every Drive call made by the script through one token bucket and one
+    adaptive concurrency limit.
+
+    The concurrency limit follows AIMD: it grows by one after a full window of
+    successful calls (as many as the current limit) and is halved when Drive throttles,
+    at most once per config.rate_limit_decrease_interval so a burst of throttled
+    in-flight calls counts as one signal. Failed calls that can succeed later are
+    retried with exponential backoff and full jitter. A Retry-After header pauses all
+    callers, not just the one that received it.
+
+    Calls must not be nested, a call that waits for a second slot while holding one
+    can deadlock once the limit has dropped to one.
+    """
+
+    def __init__(self, requests_per_second, burst, max_concurrency, max_retries):
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.decreased_at = 0.0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self, cost=1):
+        """
+        Waits for a free concurrency slot, any Retry-After pause and the request tokens.
+        """
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        self.bucket.acquire(cost)
+
+    def release(self, throttled=False):
+        """
+        Frees a concurrency slot and adjusts the limit from the outcome of the call.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.observe(throttled)
+
+    def observe(self, throttled):
+        """
+        Adjusts the concurrency limit from the outcome of one Drive request, including
+        requests that were part of a batch.
+        """
+        with self.condition:
+            now = time.monotonic()
+            if throttled:
+                self.successes = 0
+                if now - self.decreased_at >= config.rate_limit_decrease_interval:
+                    self.decreased_at = now
+                    self.limit = max(1, self.limit // 2)
+                    print(Fore.YELLOW + f"⚠ Drive is throttling requests, lowering concurrency to {self.limit}.")
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.successes = 0
+                    self.limit += 1
+            self.condition.notify_all()
+
+    def backoff(self, attempt, error):
+        """
+        Sleeps before retrying a failed call.
+
+        Parameters:
+            attempt (int): Number of the failed attempt, starting at 0.
+            error (Exception): Error of the failed attempt.
+        """
+        delay, retry_after = backoff_delay(attempt, error)
+        if retry_after is not None:
+            with self.condition:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        time.sleep(delay)
+
+    def call(self, function, *args, cost=1, idempotent=True, **kwargs):
+        """
+        Runs a Drive call under the rate limit, retrying it while it fails with a retryable error.
+
+        Parameters:
+            function (callable): The call, such as request.execute or downloader.next_chunk.
+            cost (int): Number of Drive requests the call makes, such as the size of a batch.
+            idempotent (bool): Whether the call may be repeated safely, see is_retryable().
+
+        Returns:
+            The return value of the call.
+        """
+        attempt = 0
+        while True:
+            self.acquire(cost)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self.release(throttled=is_throttled(e))
+                if attempt >= self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                self.backoff(attempt, e)
+                attempt += 1
+                continue
+            self.release()
+            return result
+
+
+def get_rate_limiter():
+    """
+    Returns the rate limiter shared by all threads, configured from config.py, or the
+    limiter the calling thread is scoped to, see scoped_rate_limiter().
+
+    Returns:
+        DriveRateLimiter: Shared limiter.
+    """
+    global _limiter
+    limiter = getattr(_scoped, 'limiter', None)
+    if limiter is not None:
+        return limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = DriveRateLimiter(
+                config.drive_requests_per_second,
+                config.drive_request_burst,
+                config.drive_max_concurrency,
+                config.drive_max_retries,
+            )
+        return _limiter
+
+
+@contextmanager
+def scoped_rate_limiter(limiter):
+    """
+    Routes the Drive calls of the calling thread through another limiter, such as the
+    limiter of the identity a file is uploaded with, see credential_pool.py. Drive
+    throttles each user separately, so each identity needs its own limit.
+
+    Parameters:
+        limiter (DriveRateLimiter): Limiter used until the block exits.
+    """
+    previous = getattr(_scoped, 'limiter', None)
+    _scoped.limiter = limiter
+    try:
+        yield limiter
+    finally:
+        _scoped.limiter = previous
+
+
+def execute(request, cost=1):
+    """
+    Executes a Drive API request under the shared rate limit. POST requests, such as
+    files().create and files().copy, are not idempotent, see is_retryable().
+
+    Parameters:
+        request (HttpRequest): Request built from a service object.
+        cost (int): Number of Drive requests it makes.
+
+    Returns:
+        The response of the request.
+    """
+    return get_rate_limiter().call(request.execute, cost=cost, idempotent=request.method != 'POST')
@@ -0,0 +1,149 @@
+# staging.py
+
+import os
+import asyncio
+import threading
+import config
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Shared staging areas by directory, see get_staging_area()
+_areas = {}
+_areas_lock = threading.Lock()
+
+
+class StagingArea:
+    """
+    Local directory holding downloaded files until all of their uploads are confirmed,
+    limited to a budget of bytes staged at once.
+
+    Each file is staged under its Drive file ID plus the extension of its name, so files
+    with the same name in different source folders never overwrite each other, and an
+    interrupted download resumes from the same '.part' file in the next run.
+
+    A download reserves the size of its file before it starts and waits while the
+    reservation would exceed the budget. evict() deletes a file and frees its bytes once
+    it has been uploaded, release() frees the bytes of a file that stays on disk, such as
+    a failed upload. A file larger than the whole budget is admitted once nothing else
+    is staged. Files left over from earlier runs are not counted.
+    """
+
+    def __init__(self, root, budget):
+        self.root = root
+        self.budget = budget
+        self.used = 0
+        self.reserved = {}
+        self.condition = threading.Condition()
+
+    def path_for(self, item):
+        """
+        Returns the staging path of a source file.
+
+        Parameters:
+            item (dict): Source file resource with 'id' and 'name'.
+
+        Returns:
+            str: Path inside the staging directory.
+        """
+        return os.path.join(self.root, item['id'] + os.path.splitext(item['name'])[1])
+
+    def try_reserve(self, item):
+        """
+        Reserves the size of a source file if it fits the budget.
+
+        Returns:
+            bool: True if the file may be downloaded now, False if the budget is full.
+        """
+        size = int(item.get('size', 0))
+        with self.condition:
+            if item['id'] in self.reserved:
+                return True
+            if self.budget and self.used and self.used + size > self.budget:
+                return False
+            self.reserved[item['id']] = size
+            self.used += size
+            return True
+
+    def reserve(self, item):
+        """
+        Reserves the size of a source file, waiting until staged files have been evicted
+        when the budget is full.
+        """
+        with self.condition:
+            if not self.try_reserve(item):
+                print(Fore.YELLOW + f"⏸ Staging area full ({self.used / (1024 ** 2):.0f} of {self.budget / (1024 ** 2):.0f} MB), "
+                                    f"'{item['name']}' waits for uploads to free space.")
+                while not self.try_reserve(item):
+                    self.condition.wait()
+
+    async def reserve_async(self, item):
+        """
+        Like reserve(), without blocking the event loop of the async engine.
+        """
+        while not self.try_reserve(item):
+            await asyncio.sleep(0.1)
+
+    def release(self, item):
+        """
+        Frees the bytes reserved for a source file, leaving any staged copy on disk.
+        """
+        with self.condition:
+            self.used -= self.reserved.pop(item['id'], 0)
+            self.condition.notify_all()
+
+    def evict(self, item):
+        """
+        Deletes the staged copy of a source file and frees its bytes.
+        """
+        path = self.path_for(item)
+        if os.path.exists(path):
+            os.remove(path)
+        self.release(item)
+
+    def batches(self, items, size_threshold):
+        """
+        Groups source files into batches whose staged files fit the budget, for modes that
+        download a whole batch before uploading it. Files above size_threshold are not
+        staged here and never start a new batch.
+
+        Parameters:
+            items (iterable): Source file resources.
+            size_threshold (int): Maximum file size in bytes staged in this directory.
+
+        Yields:
+            list: Source file resources of one batch.
+        """
+        batch = []
+        batch_bytes = 0
+        for item in items:
+            size = int(item.get('size', 0))
+            staged = size <= size_threshold
+            if staged and batch_bytes and self.budget and batch_bytes + size > self.budget:
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(item)
+            if staged:
+                batch_bytes += size
+        if batch:
+            yield batch
+
+
+def get_staging_area(root):
+    """
+    Returns the staging area shared by all threads for a directory, limited to
+    config.staging_disk_budget.
+
+    Parameters:
+        root (str): Staging directory, such as config.download_path.
+
+    Returns:
+        StagingArea: Shared staging area.
+    """
+    with _areas_lock:
+        area = _areas.get(root)
+        if area is None:
+            area = _areas[root] = StagingArea(root, config.staging_disk_budget)
+        return area
@@ -0,0 +1,311 @@
+# stream_transfer.py
+
+import re
+import json
+import queue
+import threading
+import google_auth_httplib2
+from googleapiclient.http import build_http
+import config
+from chunk_sizer import CHUNK_ALIGNMENT, ProgressMilestones
+from rate_limiter import get_rate_limiter
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+
+class DriveHttpError(Exception):
+    """
+    Raised when a raw Drive HTTP request returns an error status.
+    """
+
+    def __init__(self, status, content, retry_after=None):
+        super().__init__(f"HTTP {status}: {content[:200]!r}")
+        self.status = status
+        self.content = content
+        self.retry_after = retry_after
+
+
+def authorized_http(creds):
+    """
+    Builds an authorized HTTP client for raw Drive requests.
+
+    Like the service objects, the returned client is not thread-safe.
+
+    Parameters:
+        creds (Credentials): Valid OAuth credentials.
+
+    Returns:
+        AuthorizedHttp: HTTP client that signs requests with the credentials.
+    """
+    # build_http() keeps httplib2 from following Drive's '308 Resume Incomplete' as a redirect
+    return google_auth_httplib2.AuthorizedHttp(creds, http=build_http())
+
+
+def check_response(resp, content, expected=(200, 201)):
+    """
+    Raises DriveHttpError unless the response status is one of the expected ones.
+    """
+    if resp.status not in expected:
+        raise DriveHttpError(resp.status, content, resp.get('retry-after'))
+
+
+def align_chunk_size(chunk_size):
+    """
+    Rounds a chunk size down to a multiple of 256 KB, with a minimum of 256 KB.
+    """
+    return max(CHUNK_ALIGNMENT, chunk_size - chunk_size % CHUNK_ALIGNMENT)
+
+
+def download_range(http, file_id, start, end):
+    """
+    Downloads a byte range of a Google Drive file with an HTTP Range request.
+
+    Parameters:
+        http: Authorized HTTP client.
+        file_id (str): ID of the Google Drive file.
+        start (int): Offset of the first byte.
+        end (int): Offset of the last byte, inclusive.
+
+    Returns:
+        bytes: Content of the requested range.
+    """
+    return fetch_range(http, f"{config.drive_api_base}/drive/v3/files/{file_id}?alt=media", start, end)
+
+
+def fetch_range(http, url, start, end):
+    """
+    Downloads a byte range of a media URL, such as the URI of a files().get_media() request.
+
+    Parameters:
+        http: Authorized HTTP client.
+        url (str): Media URL.
+        start (int): Offset of the first byte.
+        end (int): Offset of the last byte, inclusive.
+
+    Returns:
+        bytes: Content of the requested range.
+    """
+    resp, content = http.request(url, 'GET', headers={'Range': f'bytes={start}-{end}'})
+    check_response(resp, content, expected=(200, 206))
+    if resp.status == 200:
+        # The server ignored the Range header and sent the whole file
+        content = content[start:end + 1]
+    return content
+
+
+def download_thumbnail(http, thumbnail_link, size):
+    """
+    Downloads Drive's thumbnail rendition of a file at a given size.
+
+    Parameters:
+        http: Authorized HTTP client.
+        thumbnail_link (str): The file's 'thumbnailLink' field.
+        size (int): Length of the longest side of the thumbnail in pixels.
+
+    Returns:
+        bytes: Encoded thumbnail image.
+    """
+    # Thumbnail links end in a size parameter such as '=s220', which can be changed freely
+    url = re.sub(r'=s\d+$', '', thumbnail_link) + f'=s{size}'
+    resp, content = http.request(url, 'GET')
+    check_response(resp, content)
+    return content
+
+
+def start_upload_session(http, metadata, total_size, mime_type):
+    """
+    Starts a resumable upload session.
+
+    Parameters:
+        http: Authorized HTTP client.
+        metadata (dict): File metadata, such as 'name' and 'parents'.
+        total_size (int): Size of the file in bytes.
+        mime_type (str): MIME type of the file.
+
+    Returns:
+        str: Session URI the file content is uploaded to.
+    """
+    url = f"{config.drive_api_base}/upload/drive/v3/files?uploadType=resumable&fields=id"
+    headers = {
+        'Content-Type': 'application/json; charset=UTF-8',
+        'X-Upload-Content-Type': mime_type,
+        'X-Upload-Content-Length': str(total_size),
+    }
+    resp, content = http.request(url, 'POST', body=json.dumps(metadata), headers=headers)
+    check_response(resp, content)
+    return resp['location']
+
+
+def parse_upload_response(resp, content):
+    """
+    Interprets the response to a chunk upload or status query.
+
+    Returns:
+        tuple: (next_offset, file) where file is the created file resource once the
+        upload is complete and None while it is still in progress.
+    """
+    if resp.status == 308:
+        # 'Range: bytes=0-N' lists the bytes the server has committed so far
+        committed = resp.get('range')
+        next_offset = int(committed.rsplit('-', 1)[1]) + 1 if committed else 0
+        return next_offset, None
+    check_response(resp, content)
+    return None, json.loads(content)
+
+
+def upload_chunk(http, session_uri, data, start, total_size):
+    """
+    Uploads one chunk of a resumable upload session.
+
+    Parameters:
+        http: Authorized HTTP client.
+        session_uri (str): Session URI returned by start_upload_session().
+        data (bytes): Chunk content.
+        start (int): Offset of the first byte of the chunk.
+        total_size (int): Size of the whole file in bytes.
+
+    Returns:
+        tuple: (next_offset, file) as returned by parse_upload_response().
+    """
+    if data:
+        content_range = f'bytes {start}-{start + len(data) - 1}/{total_size}'
+    else:
+        content_range = f'bytes */{total_size}'
+    headers = {'Content-Length': str(len(data)), 'Content-Range': content_range}
+    resp, content = http.request(session_uri, 'PUT', body=data, headers=headers)
+    return parse_upload_response(resp, content)
+
+
+def query_upload_session(http, session_uri, total_size):
+    """
+    Asks the server how many bytes of a resumable upload session it has committed.
+
+    Parameters:
+        http: Authorized HTTP client.
+        session_uri (str): Session URI returned by start_upload_session().
+        total_size (int): Size of the whole file in bytes.
+
+    Returns:
+        tuple: (next_offset, file) as returned by parse_upload_response().
+    """
+    headers = {'Content-Length': '0', 'Content-Range': f'bytes */{total_size}'}
+    resp, content = http.request(session_uri, 'PUT', body=b'', headers=headers)
+    return parse_upload_response(resp, content)
+
+
+def stream_file(creds, item, metadata, chunk_size=None, ring_buffers=None, session_store=None, upload_creds=None):
+    """
+    Pipes a Google Drive file straight into a resumable upload without staging it on disk.
+
+    A reader thread fetches the source with Range requests into a fixed ring of chunk
+    buffers while the calling thread uploads them, so peak memory is bounded by
+    (ring_buffers + 2) * chunk_size regardless of the file size.
+
+    Parameters:
+        creds (Credentials): Credentials used to read the source file.
+        item (dict): Source file resource with 'id', 'name', 'mimeType' and 'size' fields.
+        metadata (dict): Metadata of the uploaded file, such as 'name' and 'parents'.
+        chunk_size (int or None): Chunk size in bytes, defaults to config.stream_chunk_size.
+        ring_buffers (int or None): Number of chunk buffers, defaults to config.stream_ring_buffers.
+        session_store (UploadSessionStore or None): When given, the upload session is saved after
+            every chunk, and a saved session is resumed by reading the source from the committed offset.
+        upload_creds (Credentials or None): Credentials used to upload the file, defaults to creds.
+
+    Returns:
+        str: ID of the uploaded file.
+    """
+    chunk_size = align_chunk_size(chunk_size or config.stream_chunk_size)
+    ring = queue.Queue(maxsize=ring_buffers or config.stream_ring_buffers)
+    stop = threading.Event()
+    total_size = int(item.get('size', 0))
+
+    http = authorized_http(upload_creds or creds)
+    limiter = get_rate_limiter()
+    key = session_store.stream_key(item, metadata['parents'][0]) if session_store else None
+    session = session_store.get(key) if session_store else None
+    offset = 0
+    uploaded = None
+    if session:
+        try:
+            offset, uploaded = limiter.call(query_upload_session, http, session['uri'], total_size)
+            session_uri = session['uri']
+            print(Fore.CYAN + f"⏩ Resuming stream of '{item['name']}' from byte {offset}...")
+        except DriveHttpError as e:
+            if e.status not in (404, 410):
+                raise
+            # The saved session has expired, start a new one from byte 0
+            session = None
+    if not session:
+        session_uri = limiter.call(start_upload_session, http, metadata, total_size, item['mimeType'])
+    if uploaded is not None:
+        session_store.remove(key)
+        return uploaded.get('id')
+    start_offset = offset
+
+    def reader():
+        # The reader owns its own client, HTTP connections are not thread-safe, and its
+        # calls go through the shared limiter of the credentials it reads with
+        http = authorized_http(creds)
+        read_limiter = get_rate_limiter()
+        offset = start_offset
+        try:
+            while offset < total_size and not stop.is_set():
+                end = min(offset + chunk_size, total_size) - 1
+                ring.put((offset, read_limiter.call(download_range, http, item['id'], offset, end)))
+                offset = end + 1
+        except Exception as e:
+            ring.put((offset, e))
+
+    chunk_failed = False
+
+    def send_chunk(data, start):
+        nonlocal chunk_failed
+        if chunk_failed:
+            # The failed attempt may have committed part of the chunk, so ask before resending
+            next_offset, uploaded = query_upload_session(http, session_uri, total_size)
+            if uploaded is not None or next_offset >= start + len(data):
+                return next_offset, uploaded
+            data, start = data[next_offset - start:], next_offset
+        chunk_failed = True
+        result = upload_chunk(http, session_uri, data, start, total_size)
+        chunk_failed = False
+        return result
+
+    reader_thread = threading.Thread(target=reader, name=f"stream-{item['id']}", daemon=True)
+    reader_thread.start()
+    milestones = ProgressMilestones()
+    try:
+        while uploaded is None:
+            if offset >= total_size:
+                # Nothing left to send, only finalize (empty files)
+                _, uploaded = limiter.call(upload_chunk, http, session_uri, b'', offset, total_size)
+                continue
+            start, data = ring.get()
+            if isinstance(data, Exception):
+                raise data
+            # Resend the tail of the chunk until the server has committed all of it
+            while data:
+                next_offset, uploaded = limiter.call(send_chunk, data, start)
+                if uploaded is not None:
+                    break
+                data = data[next_offset - start:]
+                start = next_offset
+            offset = start + len(data) if uploaded is None else total_size
+            if session_store and uploaded is None:
+                session_store.save(key, session_uri, offset)
+            percent = milestones.crossed(offset / max(total_size, 1)) if uploaded is None else None
+            if percent:
+                print(Fore.MAGENTA + f"🔄 Streaming '{item['name']}': {percent}%")
+        if session_store:
+            session_store.remove(key)
+        return uploaded.get('id')
+    finally:
+        stop.set()
+        # Unblock the reader if it is waiting for a free buffer
+        while reader_thread.is_alive():
+            try:
+                ring.get_nowait()
+            except queue.Empty:
+                reader_thread.join(timeout=0.1)
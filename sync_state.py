@@ -0,0 +1,142 @@
+# sync_state.py
+
+import json
+import time
+import sqlite3
+import threading
+import config
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Shared store, see get_sync_state()
+_state = None
+_state_lock = threading.Lock()
+
+
+class SyncStateStore:
+    """
+    SQLite database recording which source files have already been transferred, so
+    later runs only process new or changed files.
+
+    A file counts as synced while its md5Checksum matches the value recorded when it was
+    last transferred, so renaming, starring or sharing a file does not transfer it again.
+    Files without a checksum fall back to their modifiedTime.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    source_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    md5_checksum TEXT,
+                    modified_time TEXT,
+                    size INTEGER,
+                    destinations TEXT,
+                    target_ids TEXT,
+                    updated_at REAL
+                )
+                """
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def is_synced(self, item):
+        """
+        Checks whether a source file was already transferred and has not changed since.
+
+        Parameters:
+            item (dict): Source file resource with 'id', 'md5Checksum' and 'modifiedTime' fields.
+
+        Returns:
+            bool: True if the file can be skipped.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT md5_checksum, modified_time FROM files WHERE source_id = ?", (item['id'],)
+            ).fetchone()
+        if row is None:
+            return False
+        if row[0] and item.get('md5Checksum'):
+            return row[0] == item['md5Checksum']
+        return row[1] == item.get('modifiedTime')
+
+    def record(self, item, destinations, target_ids):
+        """
+        Records a completed transfer of a source file.
+
+        Parameters:
+            item (dict): Source file resource.
+            destinations (list): Subfolder names the file was routed to.
+            target_ids (dict): Mapping of subfolder names to the IDs of the files created there.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    item['id'],
+                    item['name'],
+                    item.get('md5Checksum'),
+                    item.get('modifiedTime'),
+                    int(item.get('size', 0)),
+                    json.dumps(destinations),
+                    json.dumps(target_ids),
+                    time.time(),
+                ),
+            )
+
+    def get(self, source_id):
+        """
+        Returns the recorded transfer of a source file.
+
+        Parameters:
+            source_id (str): ID of the source Google Drive file.
+
+        Returns:
+            dict or None: Recorded 'destinations' and 'target_ids', or None if never transferred.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT destinations, target_ids FROM files WHERE source_id = ?", (source_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'destinations': json.loads(row[0]), 'target_ids': json.loads(row[1])}
+
+    def get_value(self, key):
+        """
+        Returns a value saved with set_value(), or None if it was never set.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_value(self, key, value):
+        """
+        Saves a named value, such as the Changes API page token of the watch mode.
+        """
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+
+def get_sync_state():
+    """
+    Returns the sync state store shared by all threads, or None when incremental sync
+    is disabled in config.
+
+    Returns:
+        SyncStateStore or None: Store backed by config.sync_state_path.
+    """
+    global _state
+    if not config.incremental_sync:
+        return None
+    with _state_lock:
+        if _state is None:
+            _state = SyncStateStore(config.sync_state_path)
+            print(Fore.GREEN + f"✔ Loaded sync state from '{config.sync_state_path}'.\n")
+        return _state
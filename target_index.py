@@ -0,0 +1,139 @@
+# target_index.py
+
+import threading
+import config
+from rate_limiter import execute
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Shared index, see get_target_index()
+_index = None
+_index_lock = threading.Lock()
+
+
+class TargetIndex:
+    """
+    In-memory index of the content already in the target subfolders, mapping
+    (md5Checksum, size) to the ID of the file holding it in each subfolder.
+
+    Shortcuts count as a placement of the file they point to, and a file with several
+    parents counts in each of them. The names placed in each subfolder are kept too, so a
+    duplicate is never linked next to a file of the same name.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.names = set()
+        self.subfolder_ids = {}
+        self.lock = threading.Lock()
+
+    def load(self, service, subfolder_ids):
+        """
+        Lists all target subfolders in bulk and indexes their files.
+
+        Parameters:
+            service: Authorized Google Drive service instance.
+            subfolder_ids (dict): Mapping of subfolder names to their IDs, as returned by create_subfolders().
+        """
+        self.subfolder_ids = dict(subfolder_ids)
+        folder_names = {folder_id: name for name, folder_id in subfolder_ids.items()}
+        parents = ' or '.join(f"'{folder_id}' in parents" for folder_id in folder_names)
+        files = []
+        page_token = None
+        while True:
+            results = execute(service.files().list(
+                q=f"({parents}) and trashed = false",
+                fields="nextPageToken, files(id, name, md5Checksum, size, parents, shortcutDetails(targetId))",
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        keys = {f['id']: (f['md5Checksum'], int(f.get('size', 0))) for f in files if f.get('md5Checksum')}
+        for f in files:
+            # Shortcuts carry no checksum of their own
+            key = keys.get(f.get('shortcutDetails', {}).get('targetId', f['id']))
+            if key is None:
+                continue
+            placements = {folder_names[parent]: f['id'] for parent in f.get('parents', []) if parent in folder_names}
+            self.add(key, placements, f['name'])
+        print(Fore.GREEN + f"✔ Indexed {len(self.entries)} distinct files already in the target subfolders.\n")
+
+    def find(self, key):
+        """
+        Looks up content in the index.
+
+        Parameters:
+            key (tuple): (md5Checksum, size) of the content.
+
+        Returns:
+            dict or None: Mapping of subfolder names to the IDs of the files holding the
+            content, or None if the target does not have it yet.
+        """
+        with self.lock:
+            placements = self.entries.get(key)
+            return dict(placements) if placements else None
+
+    def has_name(self, key, file_name):
+        """
+        Checks whether the content is already placed in any subfolder under the given name.
+        """
+        with self.lock:
+            return any((key, subfolder_type, file_name) in self.names for subfolder_type in self.entries.get(key, {}))
+
+    def add(self, key, placements, file_name):
+        """
+        Records content placed in target subfolders, keeping the first file of each subfolder.
+
+        Parameters:
+            key (tuple): (md5Checksum, size) of the content.
+            placements (dict): Mapping of subfolder names to file IDs, None for failed placements.
+            file_name (str): Name of the placed files.
+        """
+        with self.lock:
+            entry = self.entries.setdefault(key, {})
+            for subfolder_type, file_id in placements.items():
+                if file_id:
+                    entry.setdefault(subfolder_type, file_id)
+                    self.names.add((key, subfolder_type, file_name))
+
+
+def load_target_index(service, subfolder_ids):
+    """
+    Builds the shared index from the target subfolders on first use, when
+    config.target_dedup is set.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        subfolder_ids (dict): Mapping of subfolder names to their IDs.
+    """
+    global _index
+    if not config.target_dedup:
+        return
+    with _index_lock:
+        if _index is not None:
+            return
+        index = TargetIndex()
+        try:
+            index.load(service, subfolder_ids)
+        except Exception as e:
+            # Deduplication only saves transfers, the run can go on without it
+            print(Fore.YELLOW + f"⚠ Could not index the target subfolders, duplicates will be transferred again: {e}\n")
+            return
+        _index = index
+
+
+def get_target_index():
+    """
+    Returns the index of the target subfolders, or None when deduplication is disabled
+    or the index has not been loaded yet, see load_target_index().
+
+    Returns:
+        TargetIndex or None: Shared index.
+    """
+    return _index
@@ -0,0 +1,134 @@
+# conftest.py
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from google.oauth2.credentials import Credentials
+
+# The modules of the tool live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import drive_auth
+import rate_limiter
+import upload_sessions
+import sync_state
+import face_cache
+import staging
+import target_index
+import credential_pool
+import process_content
+import async_drive
+from fake_drive_server import FOLDER_MIME_TYPE, FakeDrive, start_fake_drive
+
+
+def stored_files(drive, target_folder_id):
+    """
+    Returns the files below the target folder as a mapping of subfolder names to
+    sorted (name, bytes) pairs, shortcuts with None as their bytes.
+    """
+    subfolders = {f['id']: f['name'] for f in drive.files.values()
+                  if f['mimeType'] == FOLDER_MIME_TYPE and target_folder_id in f['parents']}
+    stored = {}
+    for f in list(drive.files.values()):
+        for parent in f['parents']:
+            if parent in subfolders:
+                data = None if 'shortcutDetails' in f else bytes(f['data'])
+                stored.setdefault(subfolders[parent], []).append((f['name'], data))
+    return {name: sorted(files, key=lambda entry: (entry[0], entry[1] is None)) for name, files in stored.items()}
+
+
+@pytest.fixture(autouse=True)
+def local_paths(tmp_path, monkeypatch):
+    """
+    Points every file the tool writes at the temporary directory of the test.
+    """
+    monkeypatch.setattr(config, 'download_path', str(tmp_path / 'downloaded_files'))
+    monkeypatch.setattr(config, 'large_files_path', str(tmp_path / 'large_files'))
+    monkeypatch.setattr(config, 'upload_sessions_path', str(tmp_path / 'upload_sessions.json'))
+    monkeypatch.setattr(config, 'sync_state_path', str(tmp_path / 'sync_state.db'))
+    monkeypatch.setattr(config, 'face_cache_path', str(tmp_path / 'face_cache.db'))
+    return tmp_path
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """
+    Starts every test without the shared stores, caches and clients of earlier tests.
+    """
+    monkeypatch.setattr(drive_auth, '_worker_local', threading.local())
+    monkeypatch.setattr(rate_limiter, '_limiter', None)
+    monkeypatch.setattr(upload_sessions, '_store', None)
+    monkeypatch.setattr(sync_state, '_state', None)
+    monkeypatch.setattr(face_cache, '_cache', None)
+    monkeypatch.setattr(staging, '_areas', {})
+    monkeypatch.setattr(target_index, '_index', None)
+    monkeypatch.setattr(credential_pool, '_pool', None)
+
+
+@pytest.fixture
+def fake_drive(monkeypatch):
+    """
+    Serves a fake Drive for the test and points config.drive_api_base at it.
+
+    Yields:
+        FakeDrive: The fake Drive.
+    """
+    drive = FakeDrive(seed=1)
+    server, base_url = start_fake_drive(drive)
+    monkeypatch.setattr(config, 'drive_api_base', base_url)
+    yield drive
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def creds():
+    return Credentials(token='fake')
+
+
+@pytest.fixture
+def service(fake_drive, creds):
+    from drive_auth import build_service
+    return build_service(creds)
+
+
+@pytest.fixture
+def source(fake_drive):
+    return fake_drive.add_folder('source')
+
+
+@pytest.fixture
+def target(fake_drive):
+    return fake_drive.add_folder('target')
+
+
+@pytest.fixture
+def run_main(fake_drive, creds, source, target, monkeypatch):
+    """
+    Runs the tool against the fake Drive, without OAuth and without face detection.
+
+    Returns:
+        callable: Runs process_content.main() in a transfer mode and returns the files of
+        the target, see stored_files().
+    """
+    monkeypatch.setattr(config, 'source_folder_id', source)
+    monkeypatch.setattr(config, 'target_folder_id', target)
+    monkeypatch.setattr(config, 'download_workers', 2)
+    monkeypatch.setattr(config, 'upload_workers', 2)
+    monkeypatch.setattr(config, 'face_cache_enabled', False)
+    monkeypatch.setattr(process_content, 'load_credentials', lambda creds_file: creds)
+    # Face detection runs in threads and finds no faces
+    monkeypatch.setattr(process_content, 'group_photo_compactabilty_check', lambda *args, **kwargs: False)
+    for module in (process_content, async_drive):
+        monkeypatch.setattr(module, 'create_face_pool', lambda max_workers=None, **kwargs: ThreadPoolExecutor(2))
+        monkeypatch.setattr(module, 'count_faces_in_worker', lambda image_path: 0)
+
+    def run(mode):
+        monkeypatch.setattr(config, 'transfer_mode', mode)
+        process_content.main()
+        return stored_files(fake_drive, target)
+
+    return run
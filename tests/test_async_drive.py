@@ -0,0 +1,155 @@
+# test_async_drive.py
+
+import asyncio
+import json
+import time
+import aiohttp
+import pytest
+from google.oauth2.credentials import Credentials
+import config
+import credential_pool
+from async_drive import AsyncDriveClient, AsyncRateLimiter
+from credential_pool import CredentialPool, Identity
+
+MB = 1024 * 1024
+
+
+def run_client(creds, test, max_in_flight=4):
+    """
+    Runs a coroutine function with an AsyncDriveClient against the fake Drive.
+    """
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            limiter = AsyncRateLimiter(100, 10, max_in_flight)
+            await test(AsyncDriveClient(creds, session, limiter), limiter)
+
+    asyncio.run(run())
+
+
+def throttle_once(drive, path, retry_after):
+    """
+    Answers the first request to a path with a 429 and a Retry-After header.
+
+    Returns:
+        list: Times at which requests to the path arrived.
+    """
+    handle = drive.handle
+    arrivals = []
+
+    def throttled(method, url, headers, body, base_url):
+        if url.startswith(path):
+            arrivals.append(time.monotonic())
+            if len(arrivals) == 1:
+                body = json.dumps({'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                                             'errors': [{'reason': 'userRateLimitExceeded'}]}}).encode()
+                return 429, {'Content-Type': 'application/json', 'Retry-After': str(retry_after)}, body
+        return handle(method, url, headers, body, base_url)
+
+    drive.handle = throttled
+    return arrivals
+
+
+def test_retry_after_pauses_and_lowers_the_limit(fake_drive, creds, source):
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'one')
+    arrivals = throttle_once(fake_drive, '/drive/v3/files?', 0.5)
+
+    async def test(client, limiter):
+        files = await client.list_folder(source)
+        assert [f['name'] for f in files] == ['IMG_0001.jpg']
+        assert limiter.limit == 2
+        assert limiter.paused_until >= arrivals[0] + 0.5
+        assert limiter.in_flight == 0
+
+    run_client(creds, test)
+    assert len(arrivals) == 2
+    assert arrivals[1] - arrivals[0] >= 0.5
+
+
+def test_retry_after_pauses_other_requests(fake_drive, creds, source):
+    arrivals = throttle_once(fake_drive, '/drive/v3/files?', 0.5)
+
+    async def test(client, limiter):
+        await client.list_folder(source)
+        # The pause applies to every request of the limiter, not only the throttled one
+        start = time.monotonic()
+        limiter.paused_until = start + 0.5
+        await client.list_folder(source)
+        assert time.monotonic() - start >= 0.5
+
+    run_client(creds, test)
+
+
+def test_cancelled_chunk_frees_its_slot(fake_drive, creds, source, target, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'async_multipart_threshold', 0)
+    monkeypatch.setattr(config, 'adaptive_chunk_size', False)
+    monkeypatch.setattr(config, 'resumable_chunk_size', 256 * 1024)
+    # Every chunk takes a while, so the upload can be cancelled mid-chunk
+    fake_drive.bandwidth = MB
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'v' * 2 * MB)
+
+    async def test(client, limiter):
+        upload = asyncio.create_task(client.upload(str(path), {'name': 'clip.mp4', 'parents': [target]}, 'video/mp4'))
+        while not fake_drive.sessions:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight == 1
+        upload.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await upload
+        assert limiter.in_flight == 0
+        # With a single slot, a leaked one would block this request for good
+        fake_drive.bandwidth = None
+        assert await asyncio.wait_for(client.list_folder(source), 5) == []
+
+    run_client(creds, test, max_in_flight=1)
+    assert not [f for f in fake_drive.files.values() if f['name'] == 'clip.mp4']
+
+
+def test_cancelled_wait_for_pause_frees_its_slot(fake_drive, creds, source):
+    async def test(client, limiter):
+        limiter.paused_until = time.monotonic() + 60
+        request = asyncio.create_task(client.list_folder(source))
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight == 1
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        assert limiter.in_flight == 0
+
+    run_client(creds, test, max_in_flight=1)
+
+
+def test_uploads_use_the_client_of_the_assigned_identity(fake_drive, creds, source, run_main, monkeypatch):
+    main = Identity('token.json', creds)
+    second = Identity('second.json', Credentials(token='second'))
+    pool = CredentialPool([main, second])
+    monkeypatch.setattr(credential_pool, '_pool', pool)
+    pick = pool.pick
+    picked = []
+
+    def record_pick(num_bytes):
+        identity = pick(num_bytes)
+        picked.append(identity.name)
+        return identity
+
+    monkeypatch.setattr(pool, 'pick', record_pick)
+    handle = fake_drive.handle
+    uploads = []
+
+    def record(method, url, headers, body, base_url):
+        if url.startswith('/upload/'):
+            uploads.append(headers.get('Authorization'))
+        return handle(method, url, headers, body, base_url)
+
+    fake_drive.handle = record
+    for i in range(6):
+        fake_drive.add_file(f'clip{i}.mp4', 'video/mp4', source, b'v' * 1000 * (i + 1))
+
+    stored = run_main('async')
+    assert len(stored['videos']) == 6
+    # Each file went out with the token of the identity the pool picked for it
+    assert picked.count('token.json') == uploads.count('Bearer fake') > 0
+    assert picked.count('second.json') == uploads.count('Bearer second') > 0
+    # Every identity got its own async limiter, so the pool sees its throttling
+    assert main.limiters[-1] is not second.limiters[-1]
@@ -0,0 +1,91 @@
+# test_chunk_sizer.py
+
+from types import SimpleNamespace
+import pytest
+import config
+import chunk_sizer
+from chunk_sizer import CHUNK_ALIGNMENT, AdaptiveChunkSizer, ProgressMilestones, align_up, chunk_ceiling
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces the clock of the sizer, so each chunk takes as long as the test says.
+    """
+    now = SimpleNamespace(value=0.0)
+    monkeypatch.setattr(chunk_sizer, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+@pytest.fixture(autouse=True)
+def sizing(monkeypatch):
+    monkeypatch.setattr(config, 'adaptive_chunk_size', True)
+    monkeypatch.setattr(config, 'min_chunk_size', 1 * MB)
+    monkeypatch.setattr(config, 'max_chunk_size', 256 * MB)
+    monkeypatch.setattr(config, 'chunk_memory_budget', 1024 * MB)
+    monkeypatch.setattr(config, 'chunk_target_seconds', 2)
+    monkeypatch.setattr(config, 'download_workers', 8)
+    monkeypatch.setattr(config, 'upload_workers', 4)
+
+
+def transfer(sizer, clock, seconds):
+    """
+    Sends one chunk of the current size, taking the given time.
+    """
+    size = sizer.chunk_size
+    sizer.start()
+    clock.value += seconds
+    return sizer.record(size)
+
+
+def test_align_up():
+    assert align_up(0) == CHUNK_ALIGNMENT
+    assert align_up(1) == CHUNK_ALIGNMENT
+    assert align_up(CHUNK_ALIGNMENT) == CHUNK_ALIGNMENT
+    assert align_up(CHUNK_ALIGNMENT + 1) == 2 * CHUNK_ALIGNMENT
+
+
+def test_chunk_ceiling_splits_memory_budget():
+    assert chunk_ceiling() == 1024 * MB // 12 - (1024 * MB // 12) % CHUNK_ALIGNMENT
+    assert chunk_ceiling(2) == 256 * MB
+    assert chunk_ceiling(100000) == CHUNK_ALIGNMENT
+
+
+def test_starts_with_min_chunk_or_whole_file():
+    assert AdaptiveChunkSizer(100 * MB).chunk_size == 1 * MB
+    assert AdaptiveChunkSizer(300 * 1024).chunk_size == 2 * CHUNK_ALIGNMENT
+
+
+def test_fast_link_grows_at_most_doubling(clock):
+    sizer = AdaptiveChunkSizer(10 * 1024 * MB, workers=2)
+    sizes = [transfer(sizer, clock, 0.01) for _ in range(10)]
+    assert sizes[:4] == [2 * MB, 4 * MB, 8 * MB, 16 * MB]
+    assert sizes[-1] == 256 * MB
+
+
+def test_slow_link_shrinks_to_target_seconds(clock):
+    sizer = AdaptiveChunkSizer(10 * 1024 * MB, workers=2)
+    for _ in range(6):
+        transfer(sizer, clock, 0.01)
+    # At 600 KB/s the smoothed throughput settles at about one chunk per two seconds
+    for _ in range(20):
+        size = sizer.chunk_size
+        sizer.start()
+        clock.value += size / (600 * 1024)
+        sizer.record(size)
+    assert sizer.chunk_size == align_up(2 * 600 * 1024)
+
+
+def test_fixed_chunk_size_when_disabled(clock, monkeypatch):
+    monkeypatch.setattr(config, 'adaptive_chunk_size', False)
+    monkeypatch.setattr(config, 'resumable_chunk_size', 32 * MB)
+    sizer = AdaptiveChunkSizer(1024 * MB)
+    assert sizer.chunk_size == 32 * MB
+    assert transfer(sizer, clock, 0.01) == 32 * MB
+
+
+def test_progress_milestones():
+    milestones = ProgressMilestones(25)
+    assert [milestones.crossed(f) for f in (0.1, 0.3, 0.4, 0.99, 1.0)] == [None, 25, None, 75, 100]
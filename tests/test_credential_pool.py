@@ -0,0 +1,119 @@
+# test_credential_pool.py
+
+import time
+import pytest
+from google.oauth2.credentials import Credentials
+import config
+import credential_pool
+from credential_pool import CredentialPool, Identity, assign_identity, assigned_identity_name, record_upload
+from rate_limiter import get_rate_limiter
+
+GB = 1024 ** 3
+
+
+@pytest.fixture(autouse=True)
+def pool_settings(monkeypatch):
+    monkeypatch.setattr(config, 'daily_upload_limit', 10 * GB)
+    monkeypatch.setattr(config, 'credential_throttle_cooldown', 60)
+    monkeypatch.setattr(config, 'incremental_sync', False)
+
+
+def make_pool(*names):
+    return CredentialPool([Identity(name, Credentials(token=f"token-{name}")) for name in names])
+
+
+def test_pick_balances_assigned_bytes():
+    pool = make_pool('a', 'b')
+    picked = [pool.pick(size).name for size in (5 * GB, 1 * GB, 1 * GB, 1 * GB)]
+    assert picked == ['a', 'b', 'b', 'b']
+    a, b = pool.identities
+    assert (a.assigned_bytes, b.assigned_bytes) == (5 * GB, 3 * GB)
+    assert (a.pending_bytes, b.pending_bytes) == (5 * GB, 3 * GB)
+
+
+def test_pick_avoids_throttled_identity():
+    pool = make_pool('a', 'b')
+    pool.identities[0].limiter.decreased_at = time.monotonic()
+    assert [pool.pick(GB).name for _ in range(3)] == ['b', 'b', 'b']
+    # With every identity throttled, the load is balanced again
+    pool.identities[1].limiter.decreased_at = time.monotonic()
+    assert pool.pick(GB).name == 'a'
+
+
+def test_pick_skips_identities_over_the_daily_limit():
+    pool = make_pool('a', 'b')
+    pool.roll_day()
+    pool.identities[0].uploaded_today = 9 * GB
+    assert pool.pick(2 * GB).name == 'b'
+    assert pool.identities[0].exhausted
+    # Pending bytes count against the limit too
+    assert pool.pick(8 * GB).name == 'b'
+    assert pool.pick(GB).name == 'a'
+    # Once every identity is full, files still go out
+    assert pool.pick(5 * GB).name in ('a', 'b')
+    assert pool.warned
+
+
+def test_release_counts_delivered_bytes():
+    pool = make_pool('a')
+    identity = pool.pick(4 * GB)
+    pool.release(identity, 4 * GB, 4 * GB)
+    assert (identity.pending_bytes, identity.assigned_bytes, identity.uploaded_today) == (0, 4 * GB, 4 * GB)
+
+    identity = pool.pick(2 * GB)
+    pool.release(identity, 2 * GB, 0)
+    assert (identity.pending_bytes, identity.assigned_bytes, identity.uploaded_today) == (0, 4 * GB, 4 * GB)
+
+
+def test_daily_usage_survives_runs_with_incremental_sync(monkeypatch):
+    monkeypatch.setattr(config, 'incremental_sync', True)
+    pool = make_pool('a')
+    identity = pool.pick(3 * GB)
+    pool.release(identity, 3 * GB, 3 * GB)
+
+    later = make_pool('a')
+    later.roll_day()
+    assert later.identities[0].uploaded_today == 3 * GB
+
+
+def test_new_day_starts_over():
+    pool = make_pool('a')
+    identity = pool.pick(10 * GB)
+    pool.release(identity, 10 * GB, 10 * GB)
+    assert identity.uploaded_today == 10 * GB
+    pool.day = '2000-01-01'
+    pool.roll_day()
+    assert identity.uploaded_today == 0
+
+
+def test_assign_identity_scopes_limiter_and_records_upload(monkeypatch):
+    pool = make_pool('a', 'b')
+    monkeypatch.setattr(credential_pool, '_pool', pool)
+    shared = get_rate_limiter()
+    with assign_identity(GB) as identity:
+        assert assigned_identity_name() == identity.name
+        assert get_rate_limiter() is identity.limiter
+        record_upload(GB)
+    assert get_rate_limiter() is shared
+    assert assigned_identity_name() is None
+    assert identity.uploaded_today == GB
+    assert identity.pending_bytes == 0
+
+
+def test_assign_identity_without_pool():
+    with assign_identity(GB) as identity:
+        assert identity is None
+        record_upload(GB)
+
+
+def test_run_spreads_uploads_across_identities(fake_drive, source, run_main, monkeypatch):
+    pool = make_pool('a', 'b')
+    monkeypatch.setattr(credential_pool, '_pool', pool)
+    expected = sorted((f"clip{i}.mp4", bytes([i]) * 100000) for i in range(6))
+    for name, data in expected:
+        fake_drive.add_file(name, 'video/mp4', source, data)
+
+    assert run_main('download') == {'videos': expected}
+    assert all(identity.uploaded_today > 0 for identity in pool.identities)
+    assert sum(identity.uploaded_today for identity in pool.identities) == 600000
+    assert all(identity.pending_bytes == 0 for identity in pool.identities)
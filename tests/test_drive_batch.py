@@ -0,0 +1,92 @@
+# test_drive_batch.py
+
+import json
+import pytest
+import config
+from drive_batch import FOLDER_MIME_TYPE, DriveBatch, find_or_create_folders
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(config, 'rate_limit_base_backoff', 0)
+
+
+def folders(drive, parent_id):
+    return sorted(f['name'] for f in drive.files.values() if f['mimeType'] == FOLDER_MIME_TYPE and parent_id in f['parents'])
+
+
+def test_find_or_create_folders(fake_drive, service):
+    target = fake_drive.add_folder('target')
+    videos = fake_drive.add_folder('videos', target)
+    folder_ids, created, errors = find_or_create_folders(service, target, ['images', 'videos', 'DSLR'])
+    assert folder_ids['videos'] == videos
+    assert created == {'images', 'DSLR'}
+    assert errors == []
+    assert folders(fake_drive, target) == ['DSLR', 'images', 'videos']
+
+    # A second run finds every folder
+    assert find_or_create_folders(service, target, ['images', 'videos', 'DSLR']) == (folder_ids, set(), [])
+
+
+def test_full_batches_are_sent_as_they_fill(fake_drive, service):
+    parent = fake_drive.add_folder('parent')
+    names = [fake_drive.files[fake_drive.add_file(f"file{i}", 'image/jpeg', parent)]['name'] for i in range(150)]
+    found = []
+    batch = DriveBatch(service)
+    for name in names:
+        batch.add(service.files().list(q=f"name = '{name}'", fields="files(id, name)"),
+                  lambda response: found.append(response['files'][0]['name']))
+    # The first 100 requests went out when the batch was full
+    assert len(found) == 100
+    assert len(batch.pending) == 50
+    batch.execute()
+    assert sorted(found) == sorted(names)
+
+
+def fail_first_attempts(drive, monkeypatch, status):
+    """
+    Makes the first attempt of every request inside a batch fail with the given status,
+    chosen per request by status(method, body).
+    """
+    handle = drive.handle
+    seen = set()
+
+    def flaky_handle(method, url, headers, body, base_url):
+        if '/batch/' not in url and (method, url, body) not in seen:
+            seen.add((method, url, body))
+            code = status(method, body)
+            if code:
+                return drive.json({'error': {'code': code, 'message': 'Injected',
+                                             'errors': [{'reason': 'userRateLimitExceeded'}] if code == 429 else []}}, code)
+        return handle(method, url, headers, body, base_url)
+
+    monkeypatch.setattr(drive, 'handle', flaky_handle)
+
+
+def test_failed_lookups_are_retried(fake_drive, service, monkeypatch):
+    parent = fake_drive.add_folder('parent')
+    fake_drive.add_folder('videos', parent)
+    fail_first_attempts(fake_drive, monkeypatch, lambda method, body: 503)
+    found = []
+    batch = DriveBatch(service)
+    for i in range(10):
+        batch.add(service.files().list(q=f"name = 'videos' and '{parent}' in parents", fields="files(id)", pageSize=i + 1),
+                  lambda response: found.append(response['files'][0]['id']))
+    assert batch.execute() == []
+    assert len(found) == 10
+
+
+def test_failed_creations_are_retried_only_when_throttled(fake_drive, service, monkeypatch):
+    parent = fake_drive.add_folder('parent')
+    # Even folders are throttled, odd ones hit a server error after which Drive may have created them
+    fail_first_attempts(fake_drive, monkeypatch, lambda method, body: 503 if int(json.loads(body)['name'][-1]) % 2 else 429)
+    batch = DriveBatch(service)
+    created = []
+    for i in range(10):
+        metadata = {'name': f"folder{i}", 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent]}
+        batch.add(service.files().create(body=metadata, fields='id'), lambda response: created.append(response['id']),
+                  label=f"folder{i}")
+    failed = batch.execute()
+    assert folders(fake_drive, parent) == [f"folder{i}" for i in (0, 2, 4, 6, 8)]
+    assert sorted(label for label, _ in failed) == [f"folder{i}" for i in (1, 3, 5, 7, 9)]
+    assert batch.errors == failed
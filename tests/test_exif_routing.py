@@ -0,0 +1,88 @@
+# test_exif_routing.py
+
+import io
+import pytest
+from PIL import Image
+import config
+from exif_routing import EXIF_TAG_IDS, parse_exif, read_exif_file, fetch_exif, is_dslr, exif_subfolder
+from stream_transfer import authorized_http
+
+
+def image_bytes(make=None, model=None, gps=False, image_format='JPEG'):
+    """
+    Encodes a small image with the given EXIF camera and an optional GPS position.
+    """
+    exif = Image.Exif()
+    if make:
+        exif[EXIF_TAG_IDS['Make']] = make
+    if model:
+        exif[EXIF_TAG_IDS['Model']] = model
+    if gps:
+        gps_ifd = exif.get_ifd(EXIF_TAG_IDS['GPSInfo'])
+        gps_ifd.update({1: 'N', 2: (52.0, 22.0, 0.0), 3: 'E', 4: (4.0, 53.0, 0.0)})
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48)).save(buffer, image_format, exif=exif)
+    return buffer.getvalue()
+
+
+def test_parse_exif_reads_camera_and_gps():
+    assert parse_exif(image_bytes('Canon', 'Canon EOS R5', gps=True)) == \
+        {'make': 'Canon', 'model': 'Canon EOS R5', 'gps': True}
+    assert parse_exif(image_bytes('Apple', 'iPhone 15')) == {'make': 'Apple', 'model': 'iPhone 15', 'gps': False}
+
+
+def test_parse_exif_reads_tiff_and_other_formats():
+    assert parse_exif(image_bytes('NIKON CORPORATION', 'NIKON D850', image_format='TIFF'))['make'] == 'NIKON CORPORATION'
+    assert parse_exif(image_bytes('Apple', 'iPhone 15', gps=True, image_format='PNG'))['gps']
+
+
+def test_parse_exif_without_exif_returns_none():
+    assert parse_exif(image_bytes()) is None
+    assert parse_exif(b'not an image') is None
+    assert parse_exif(b'') is None
+
+
+def test_parse_exif_from_header_only():
+    data = image_bytes('Canon', 'Canon EOS R5') + bytes(256 * 1024)
+    assert parse_exif(data[:4096])['model'] == 'Canon EOS R5'
+
+
+@pytest.mark.filterwarnings('ignore:Corrupt EXIF data')
+def test_parse_exif_truncated_segment_returns_none():
+    # The header ends in the middle of the EXIF segment
+    assert parse_exif(image_bytes('Canon', 'Canon EOS R5')[:40]) is None
+
+
+@pytest.mark.parametrize('make, model, expected', [
+    ('Canon', 'Canon EOS R5', True),
+    ('NIKON CORPORATION', 'NIKON Z 6', True),
+    ('SONY', 'ILCE-7M4', True),
+    ('Sony', 'XQ-DQ54', False),
+    ('Panasonic', 'DC-GH6', True),
+    ('Apple', 'iPhone 15', False),
+    ('', '', False),
+])
+def test_is_dslr(make, model, expected):
+    assert is_dslr(make, model) is expected
+
+
+def test_exif_subfolder():
+    assert exif_subfolder({'make': 'Canon', 'model': 'Canon EOS R5', 'gps': True}) == 'DSLR'
+    assert exif_subfolder({'make': 'Apple', 'model': 'iPhone 15', 'gps': True}) == 'geotaged'
+    assert exif_subfolder({'make': 'Apple', 'model': 'iPhone 15', 'gps': False}) == 'images'
+
+
+def test_read_exif_file(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(image_bytes('FUJIFILM', 'X-T5', gps=True))
+    assert read_exif_file(str(path)) == {'make': 'FUJIFILM', 'model': 'X-T5', 'gps': True}
+
+
+def test_fetch_exif_reads_the_header_in_one_request(fake_drive, creds, monkeypatch):
+    monkeypatch.setattr(config, 'exif_header_bytes', 4096)
+    data = image_bytes('Canon', 'Canon EOS R5') + bytes(256 * 1024)
+    file_id = fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', fake_drive.add_folder('source'), data)
+    http = authorized_http(creds)
+    assert fetch_exif(http, file_id, len(data))['make'] == 'Canon'
+    assert fake_drive.stats()['requests'] == 1
+    assert fetch_exif(http, file_id, 0) is None
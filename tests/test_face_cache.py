@@ -0,0 +1,53 @@
+# test_face_cache.py
+
+import hashlib
+import itertools
+from types import SimpleNamespace
+import pytest
+import face_cache
+from face_cache import FaceCountCache, file_md5
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # A clock that ticks on every call, so the order of use never depends on the timer resolution
+    ticks = itertools.count(1)
+    monkeypatch.setattr(face_cache, 'time', SimpleNamespace(time=lambda: next(ticks)))
+
+
+def test_counts_are_cached_per_settings(tmp_path):
+    cache = FaceCountCache(str(tmp_path / 'faces.db'), 100)
+    assert cache.get('hash', 'r2') is None
+    cache.put('hash', 'r2', 3)
+    assert cache.get('hash', 'r2') == 3
+    assert cache.get('hash', 'r4') is None
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path):
+    cache = FaceCountCache(str(tmp_path / 'faces.db'), 10)
+    for i in range(10):
+        cache.put(f"hash{i}", 'p', i)
+    # Using the oldest entry keeps it in the cache
+    assert cache.get('hash0', 'p') == 0
+
+    cache.put('hash10', 'p', 10)
+    (entries,) = cache.conn.execute("SELECT COUNT(*) FROM faces").fetchone()
+    assert entries == 9
+    assert cache.get('hash0', 'p') == 0
+    assert cache.get('hash10', 'p') == 10
+    assert cache.get('hash1', 'p') is None
+    assert cache.get('hash2', 'p') is None
+    assert cache.get('hash3', 'p') == 3
+
+
+def test_cache_survives_reopening(tmp_path):
+    path = str(tmp_path / 'faces.db')
+    FaceCountCache(path, 100).put('hash', 'p', 25)
+    assert FaceCountCache(path, 100).get('hash', 'p') == 25
+
+
+def test_file_md5_matches_content_hash(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    data = bytes(range(256)) * 5000
+    path.write_bytes(data)
+    assert file_md5(str(path)) == hashlib.md5(data).hexdigest()
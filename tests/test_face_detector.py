@@ -0,0 +1,76 @@
+# test_face_detector.py
+
+import cv2
+import numpy as np
+import pytest
+from face_detector import FaceDetector, configured_params_key, detector_params_key
+
+
+
+def test_opencv_has_haar_cascades():
+    # Builds without the objdetect module crash every classification worker, see requirements.txt
+    assert hasattr(cv2, 'CascadeClassifier')
+    assert hasattr(cv2, 'CASCADE_SCALE_IMAGE')
+
+
+class RecordingClassifier:
+    """
+    Stands in for the Haar cascade, recording the image and minimum face size of each call.
+    """
+
+    def __init__(self, path=None):
+        self.calls = []
+
+    def detectMultiScale(self, image, **kwargs):
+        self.calls.append((image.shape, kwargs['minSize']))
+        return [(0, 0, 10, 10)] * 3
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    monkeypatch.setattr(cv2, 'CascadeClassifier', RecordingClassifier)
+    return FaceDetector(reduction=2, min_size=40)
+
+
+def jpeg(width, height):
+    ok, buffer = cv2.imencode('.jpg', np.zeros((height, width, 3), np.uint8))
+    assert ok
+    return buffer.tobytes()
+
+
+def test_reduced_decode_scales_min_size(detector, tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(jpeg(1600, 1200))
+    assert detector.count_faces(str(path)) == 3
+    assert detector.classifier.calls == [((600, 800), (20, 20))]
+
+
+def test_thumbnail_scales_min_size_to_original(detector):
+    # A 160 pixel thumbnail of a 1600 pixel photo shows faces at a tenth of their size
+    assert detector.count_faces_in_bytes(jpeg(160, 120), reduction=1, original_size=1600) == 3
+    assert detector.classifier.calls == [((120, 160), (4, 4))]
+
+
+def test_bytes_without_original_size_use_decode_reduction(detector):
+    detector.count_faces_in_bytes(jpeg(160, 120))
+    assert detector.classifier.calls == [((60, 80), (20, 20))]
+
+
+def test_undecodable_image_has_no_count(detector, tmp_path):
+    assert detector.count_faces_in_bytes(b'not an image') is None
+    path = tmp_path / 'broken.jpg'
+    path.write_bytes(b'not an image')
+    assert detector.count_faces(str(path)) is None
+    assert detector.classifier.calls == []
+
+
+def test_invalid_reduction(monkeypatch):
+    monkeypatch.setattr(cv2, 'CascadeClassifier', RecordingClassifier)
+    with pytest.raises(ValueError):
+        FaceDetector(reduction=3)
+
+
+def test_params_key_changes_with_settings(detector):
+    assert detector.params_key() == detector_params_key('haarcascade_frontalface_default.xml', 2, 1.05, 8, 40)
+    assert detector.params_key() != FaceDetector(reduction=4, min_size=40).params_key()
+    assert configured_params_key().startswith('haarcascade_frontalface_default.xml|')
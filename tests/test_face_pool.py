@@ -0,0 +1,73 @@
+# test_face_pool.py
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import pytest
+import config
+import process_content
+import async_drive
+
+
+def count_faces_stub(image_path):
+    """
+    Stands in for count_faces_in_worker() in a real worker process. The image content
+    picks the outcome.
+    """
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    if data.startswith(b'slow'):
+        time.sleep(1)
+    if data.startswith(b'crash'):
+        os._exit(1)
+    if data.startswith(b'error'):
+        raise cv2.error("OpenCV(4.8.0) error: (-215:Assertion failed) !empty() in function 'detectMultiScale'")
+    return 30 if data.startswith(b'group') else 0
+
+
+@pytest.fixture
+def process_pool(run_main, monkeypatch):
+    """
+    Classifies images in a real process pool with the stub detector.
+
+    Returns:
+        callable: Runs process_content.main() in a transfer mode, see run_main.
+    """
+    monkeypatch.setattr(config, 'classification_workers', 2)
+    for module in (process_content, async_drive):
+        monkeypatch.setattr(module, 'create_face_pool', lambda max_workers=None, **kwargs: ProcessPoolExecutor(2))
+        monkeypatch.setattr(module, 'count_faces_in_worker', count_faces_stub)
+    return run_main
+
+
+def test_images_are_uploaded_in_completion_order(fake_drive, source, process_pool, monkeypatch):
+    uploaded = []
+    deliver_file = process_content.deliver_file
+
+    def deliver(file_name, *args, **kwargs):
+        uploaded.append(file_name)
+        return deliver_file(file_name, *args, **kwargs)
+
+    monkeypatch.setattr(process_content, 'deliver_file', deliver)
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'slow' * 100)
+    fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'group' * 100)
+
+    assert process_pool('download') == {
+        'images': [('IMG_0001.jpg', b'slow' * 100), ('IMG_0002.jpg', b'group' * 100)],
+        'GroupPhotos': [('IMG_0002.jpg', b'group' * 100)],
+    }
+    # The group photo finished classifying first and did not wait for the slow image
+    assert uploaded == ['IMG_0002.jpg', 'IMG_0001.jpg']
+
+
+@pytest.mark.parametrize('mode', ['download', 'pipeline', 'async'])
+@pytest.mark.parametrize('failure', [b'error', b'crash'])
+def test_failed_face_detection_keeps_the_file(fake_drive, source, process_pool, mode, failure):
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, failure * 100)
+    fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'plain' * 100)
+
+    # Without a face count the group photo check is skipped, but both files are uploaded
+    assert process_pool(mode) == {
+        'images': [('IMG_0001.jpg', failure * 100), ('IMG_0002.jpg', b'plain' * 100)],
+    }
@@ -0,0 +1,171 @@
+# test_lanes.py
+
+import threading
+import time
+import pytest
+import config
+from lanes import LaneScheduler, get_lane_scheduler
+
+
+def item(name, size):
+    return {'id': name, 'name': name, 'size': str(size)}
+
+
+def test_is_large_uses_size_threshold():
+    scheduler = LaneScheduler(100, 4, 2)
+    assert not scheduler.is_large(item('a', 100))
+    assert scheduler.is_large(item('b', 101))
+    assert not scheduler.is_large({'id': 'c', 'name': 'c'})
+
+
+def test_route_without_window_keeps_arrival_order():
+    scheduler = LaneScheduler(100, 4, 2)
+    items = [item('a', 50), item('big', 500), item('b', 10), item('c', 30)]
+    assert [(large, i['id']) for large, i in scheduler.route(items)] == \
+        [(False, 'a'), (True, 'big'), (False, 'b'), (False, 'c')]
+
+
+def test_route_sorts_small_files_within_windows():
+    scheduler = LaneScheduler(100, 4, 2, window=3)
+    items = [item('a', 50), item('b', 10), item('big', 500), item('c', 30), item('d', 5), item('e', 1)]
+    routed = [(large, i['id']) for large, i in scheduler.route(items)]
+    # Large files go out as soon as they are listed, small files once their window is full
+    assert routed == [(True, 'big'), (False, 'b'), (False, 'c'), (False, 'a'), (False, 'e'), (False, 'd')]
+
+
+def test_route_consumes_listing_lazily():
+    scheduler = LaneScheduler(100, 4, 2, window=2)
+    listed = []
+
+    def listing():
+        for i in range(10):
+            listed.append(i)
+            yield item(str(i), i)
+
+    routed = scheduler.route(listing())
+    next(routed)
+    assert listed == [0, 1]
+
+
+def test_run_processes_every_file_in_its_lane():
+    scheduler = LaneScheduler(100, 3, 1, window=4)
+    items = [item(f"small{i}", i) for i in range(20)] + [item(f"large{i}", 1000 + i) for i in range(3)]
+    lanes = {}
+    lock = threading.Lock()
+
+    def handler(entry):
+        with lock:
+            lanes[entry['id']] = threading.current_thread().name.split('_')[0]
+
+    scheduler.run(items, handler)
+    assert {name for name, lane in lanes.items() if lane == 'large'} == {'large0', 'large1', 'large2'}
+    assert len(lanes) == 23
+
+
+def test_run_raises_handler_errors():
+    scheduler = LaneScheduler(100, 2, 1)
+
+    def handler(entry):
+        raise RuntimeError(entry['id'])
+
+    with pytest.raises(RuntimeError):
+        scheduler.run([item('a', 1)], handler)
+
+
+def test_get_lane_scheduler_follows_config(monkeypatch):
+    monkeypatch.setattr(config, 'lane_scheduler', False)
+    assert get_lane_scheduler(100) is None
+    monkeypatch.setattr(config, 'lane_scheduler', True)
+    monkeypatch.setattr(config, 'download_workers', 6)
+    monkeypatch.setattr(config, 'large_lane_workers', 2)
+    monkeypatch.setattr(config, 'lane_sort_window', 50)
+    scheduler = get_lane_scheduler(100)
+    assert (scheduler.small_workers, scheduler.large_workers, scheduler.window) == (6, 2, 50)
+
+
+@pytest.mark.parametrize('mode', ['download', 'pipeline', 'copy', 'async'])
+def test_run_with_lanes(fake_drive, source, run_main, monkeypatch, mode):
+    monkeypatch.setattr(config, 'lane_scheduler', True)
+    monkeypatch.setattr(config, 'lane_sort_window', 4)
+    monkeypatch.setattr(config, 'size_threshold', 200000)
+    monkeypatch.setattr(config, 'stream_chunk_size', 256 * 1024)
+    expected = sorted((f"clip{i}.mp4", bytes([i]) * (1000 if i % 3 else 300000)) for i in range(9))
+    for name, data in expected:
+        fake_drive.add_file(name, 'video/mp4', source, data)
+
+    assert run_main(mode) == {'videos': expected}
+
+
+def test_place_and_flush_match_route():
+    scheduler = LaneScheduler(100, 4, 2, window=3)
+    items = [item('a', 50), item('b', 10), item('big', 500), item('c', 30), item('d', 5), item('e', 1)]
+    window = []
+    routed = [entry for i in items for entry in scheduler.place(i, window)] + scheduler.flush(window)
+    assert routed == list(scheduler.route(items))
+    assert window == []
+
+
+def record_uploads(drive, source):
+    """
+    Records when each file first appears outside the source folder.
+
+    Returns:
+        dict: Mapping of file names to the time they were stored.
+    """
+    handle = drive.handle
+    stored = {}
+
+    def record(method, url, headers, body, base_url):
+        response = handle(method, url, headers, body, base_url)
+        for f in list(drive.files.values()):
+            if source not in f['parents'] and f['name'] not in stored:
+                stored[f['name']] = time.monotonic()
+        return response
+
+    drive.handle = record
+    return stored
+
+
+# The 'download' mode uploads only after all downloads, so only the streaming modes are covered
+@pytest.mark.parametrize('mode', ['pipeline', 'async'])
+def test_small_files_finish_while_large_file_streams(fake_drive, source, run_main, monkeypatch, mode):
+    monkeypatch.setattr(config, 'lane_scheduler', True)
+    monkeypatch.setattr(config, 'size_threshold', 200000)
+    monkeypatch.setattr(config, 'stream_large_files', True)
+    monkeypatch.setattr(config, 'stream_chunk_size', 256 * 1024)
+    large_id = fake_drive.add_file('large.mp4', 'video/mp4', source, b'L' * 2 * 1024 * 1024)
+    small = [(f"clip{i}.mp4", bytes([i]) * 1000) for i in range(6)]
+    for name, data in small:
+        fake_drive.add_file(name, 'video/mp4', source, data)
+    stored = record_uploads(fake_drive, source)
+    handle = fake_drive.handle
+    chunks = []
+
+    def slow_large(method, url, headers, body, base_url):
+        # Every chunk of the large file takes a while to download
+        if large_id in url and 'alt=media' in url:
+            chunks.append(time.monotonic())
+            time.sleep(0.2)
+        return handle(method, url, headers, body, base_url)
+
+    fake_drive.handle = slow_large
+
+    result = run_main(mode)
+    assert result == {'videos': sorted(small + [('large.mp4', b'L' * 2 * 1024 * 1024)])}
+    small_done = max(stored[name] for name, _ in small)
+    # The small files were stored after the large stream started and before it was done
+    assert chunks[0] < small_done < stored['large.mp4']
+
+
+def test_async_listing_sorts_small_files_within_windows(fake_drive, source, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'lane_scheduler', True)
+    monkeypatch.setattr(config, 'lane_sort_window', 4)
+    monkeypatch.setattr(config, 'async_max_in_flight', 1)
+    sizes = [5000, 3000, 4000, 1000, 2000, 6000]
+    for i, size in enumerate(sizes):
+        fake_drive.add_file(f"clip{i}.mp4", 'video/mp4', source, b'v' * size)
+    stored = record_uploads(fake_drive, source)
+
+    run_main('async')
+    order = [name for name in sorted(stored, key=stored.get) if name.startswith('clip')]
+    assert order == ['clip3.mp4', 'clip1.mp4', 'clip2.mp4', 'clip0.mp4', 'clip4.mp4', 'clip5.mp4']
@@ -0,0 +1,97 @@
+# test_planner.py
+
+import pytest
+import config
+from planner import TransferPlan, build_plan, metadata_exif
+from process_content import SUBFOLDERS, route_file
+
+MB = 1024 * 1024
+
+
+def item(file_id, name, size, mime_type='image/jpeg', md5=None, **fields):
+    return dict({'id': file_id, 'name': name, 'mimeType': mime_type, 'size': str(size),
+                 'md5Checksum': md5 or f"md5-{file_id}"}, **fields)
+
+
+def face_counts(counts):
+    """
+    Stands in for process_content.cached_face_count() with known face counts by checksum.
+    """
+    return lambda content_hash: counts.get(content_hash)
+
+
+@pytest.fixture(autouse=True)
+def plan_settings(monkeypatch):
+    monkeypatch.setattr(config, 'transfer_mode', 'download')
+    monkeypatch.setattr(config, 'face_cache_enabled', True)
+    monkeypatch.setattr(config, 'group_photo_threshold_person_count', 20)
+    monkeypatch.setattr(config, 'extra_destination_policy', 'upload')
+    monkeypatch.setattr(config, 'target_dedup', False)
+    monkeypatch.setattr(config, 'exif_routing', False)
+
+
+def make_plan(items, counts=None):
+    plan = TransferPlan(100 * MB, SUBFOLDERS, route_file, face_counts(counts or {}))
+    for entry in items:
+        plan.add(entry)
+    return plan
+
+
+def test_required_bytes_counts_every_file():
+    plan = make_plan([item('a', 'IMG_1.jpg', 3 * MB), item('b', 'clip.mp4', 50 * MB, 'video/mp4'),
+                      item('c', 'notes.txt', MB, 'text/plain')])
+    assert [i['id'] for i in plan.items] == ['a', 'b']
+    assert plan.required_bytes == 53 * MB
+    assert plan.destinations['images'] == [1, 3 * MB]
+    assert plan.destinations['videos'] == [1, 50 * MB]
+    assert plan.unclassified == 1
+
+
+@pytest.mark.parametrize('policy, extra', [('upload', 4 * MB), ('copy', 4 * MB), ('shortcut', 0)])
+def test_required_bytes_follows_extra_destination_policy(monkeypatch, policy, extra):
+    monkeypatch.setattr(config, 'extra_destination_policy', policy)
+    plan = make_plan([item('a', 'DSC_1.jpg', 4 * MB), item('b', 'IMG_2.jpg', 2 * MB)], {'md5-a': 25, 'md5-b': 3})
+    assert plan.destinations['GroupPhotos'] == [1, extra]
+    assert plan.extra_placements == 1
+    assert plan.required_bytes == 6 * MB + extra
+    assert plan.unclassified == 0
+
+
+def test_required_bytes_with_target_dedup(monkeypatch):
+    items = [item('a', 'IMG_1.jpg', 4 * MB, md5='same'), item('b', 'IMG_1 (1).jpg', 4 * MB, md5='same'),
+             item('c', 'IMG_2.jpg', 2 * MB)]
+    assert make_plan(items).required_bytes == 10 * MB
+    monkeypatch.setattr(config, 'target_dedup', True)
+    plan = make_plan(items)
+    assert plan.duplicate_files == 1
+    assert plan.required_bytes == 6 * MB
+
+
+def test_large_files_skip_the_group_photo_check():
+    plan = make_plan([item('a', 'IMG_1.jpg', 200 * MB)])
+    assert plan.large_files == 1
+    assert plan.unclassified == 0
+
+
+def test_metadata_exif_routes_without_downloading(monkeypatch):
+    monkeypatch.setattr(config, 'exif_routing', True)
+    camera = item('a', 'IMG_1.jpg', MB, imageMediaMetadata={'cameraMake': 'Canon', 'cameraModel': 'Canon EOS R5'})
+    phone = item('b', 'IMG_2.jpg', MB, imageMediaMetadata={'cameraMake': 'Apple', 'location': {'latitude': 52.3}})
+    assert metadata_exif(camera) == {'make': 'Canon', 'model': 'Canon EOS R5', 'gps': False}
+    assert metadata_exif(item('c', 'IMG_3.jpg', MB)) is None
+    plan = make_plan([camera, phone])
+    assert plan.destinations['DSLR'][0] == 1
+    assert plan.destinations['geotaged'][0] == 1
+
+
+def test_build_plan_checks_target_quota(fake_drive, service):
+    fake_drive.quota_limit = 10 * MB
+    fake_drive.add_file('existing.bin', 'application/octet-stream', None, bytes(4 * MB))
+    items = [item('a', 'clip.mp4', 5 * MB, 'video/mp4')]
+    plan = build_plan(service, items, 100 * MB, SUBFOLDERS, route_file, face_counts({}))
+    assert plan.available_bytes == 6 * MB
+    assert plan.fits()
+
+    items.append(item('b', 'clip2.mp4', 2 * MB, 'video/mp4'))
+    plan = build_plan(service, items, 100 * MB, SUBFOLDERS, route_file, face_counts({}))
+    assert not plan.fits()
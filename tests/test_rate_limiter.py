@@ -0,0 +1,170 @@
+# test_rate_limiter.py
+
+from types import SimpleNamespace
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+import config
+import rate_limiter
+from rate_limiter import (DriveRateLimiter, TokenBucket, backoff_delay, execute, get_rate_limiter, is_retryable,
+                          is_throttled, retry_after_seconds, scoped_rate_limiter)
+
+
+def http_error(status, content=b'', retry_after=None):
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = retry_after
+    return HttpError(httplib2.Response(headers), content)
+
+
+class FlakyCall:
+    """
+    Drive call that fails with the given errors before it succeeds.
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'done'
+
+
+class FakeRequest:
+    def __init__(self, method, call):
+        self.method = method
+        self.execute = call
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(config, 'rate_limit_base_backoff', 0)
+    monkeypatch.setattr(config, 'rate_limit_decrease_interval', 2)
+
+
+@pytest.fixture
+def limiter():
+    return DriveRateLimiter(1000, 1000, 8, 3)
+
+
+def test_throttling_errors():
+    assert is_throttled(http_error(429))
+    assert is_throttled(http_error(403, b'{"reason": "userRateLimitExceeded"}'))
+    assert not is_throttled(http_error(403, b'{"reason": "insufficientFilePermissions"}'))
+    assert not is_throttled(http_error(503))
+    assert not is_throttled(ValueError())
+
+
+def test_retryable_errors():
+    assert is_retryable(http_error(503))
+    assert is_retryable(http_error(429))
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(http_error(404))
+    assert not is_retryable(ValueError())
+
+
+def test_non_idempotent_calls_retry_only_throttling():
+    assert is_retryable(http_error(429), idempotent=False)
+    assert not is_retryable(http_error(503), idempotent=False)
+    assert not is_retryable(ConnectionResetError(), idempotent=False)
+
+
+def test_backoff_is_jittered_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(config, 'rate_limit_base_backoff', 1)
+    monkeypatch.setattr(config, 'rate_limit_max_backoff', 8)
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt, http_error(503))[0] for attempt in range(5)] == [1, 2, 4, 8, 8]
+    assert backoff_delay(0, http_error(429, retry_after='5')) == (5.0, 5.0)
+    assert retry_after_seconds(http_error(429, retry_after='Wed, 21 Oct 2015 07:28:00 GMT')) is None
+
+
+def test_concurrency_grows_after_a_window_of_successes(limiter):
+    limiter.limit = 4
+    for _ in range(3):
+        limiter.observe(False)
+    assert limiter.limit == 4
+    limiter.observe(False)
+    assert limiter.limit == 5
+    for _ in range(100):
+        limiter.observe(False)
+    assert limiter.limit == limiter.max_concurrency
+
+
+def test_throttling_halves_concurrency_once_per_interval(limiter, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    limiter.observe(True)
+    limiter.observe(True)
+    assert limiter.limit == 4
+    now[0] += 2
+    limiter.observe(True)
+    assert limiter.limit == 2
+    now[0] += 2
+    limiter.observe(True)
+    now[0] += 2
+    limiter.observe(True)
+    assert limiter.limit == 1
+
+
+def test_call_retries_retryable_errors(limiter):
+    call = FlakyCall(http_error(503), ConnectionResetError())
+    assert limiter.call(call) == 'done'
+    assert call.calls == 3
+    assert limiter.in_flight == 0
+
+
+def test_call_gives_up_after_max_retries(limiter):
+    call = FlakyCall(*[http_error(500)] * 10)
+    with pytest.raises(HttpError):
+        limiter.call(call)
+    assert call.calls == limiter.max_retries + 1
+    assert limiter.in_flight == 0
+
+
+def test_call_does_not_retry_final_errors(limiter):
+    call = FlakyCall(http_error(404))
+    with pytest.raises(HttpError):
+        limiter.call(call)
+    assert call.calls == 1
+
+
+def test_non_idempotent_call_is_not_repeated_after_server_error(limiter):
+    call = FlakyCall(http_error(503))
+    with pytest.raises(HttpError):
+        limiter.call(call, idempotent=False)
+    assert call.calls == 1
+    call = FlakyCall(http_error(429))
+    assert limiter.call(call, idempotent=False) == 'done'
+
+
+def test_execute_treats_post_as_non_idempotent(limiter):
+    with scoped_rate_limiter(limiter):
+        with pytest.raises(HttpError):
+            execute(FakeRequest('POST', FlakyCall(http_error(503))))
+        assert execute(FakeRequest('GET', FlakyCall(http_error(503)))) == 'done'
+
+
+def test_scoped_rate_limiter_replaces_shared_limiter(limiter):
+    shared = get_rate_limiter()
+    with scoped_rate_limiter(limiter):
+        assert get_rate_limiter() is limiter
+    assert get_rate_limiter() is shared
+
+
+def test_token_bucket_limits_rate(monkeypatch):
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limiter, 'time', SimpleNamespace(monotonic=lambda: now[0], sleep=sleep))
+    bucket = TokenBucket(4, 2)
+    for _ in range(10):
+        bucket.acquire()
+    # The burst goes through at once, the other 8 requests at 4 per second
+    assert sum(slept) == 2.0
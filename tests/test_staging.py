@@ -0,0 +1,96 @@
+# test_staging.py
+
+import asyncio
+import threading
+import pytest
+import config
+from staging import StagingArea, get_staging_area
+
+
+def item(file_id, size, name='photo.jpg'):
+    return {'id': file_id, 'name': name, 'size': str(size)}
+
+
+def test_path_for_uses_file_id(tmp_path):
+    area = StagingArea(str(tmp_path), 0)
+    assert area.path_for(item('abc', 10, 'IMG_0001.JPG')) == str(tmp_path / 'abc.JPG')
+
+
+def test_reservations_stay_within_budget(tmp_path):
+    area = StagingArea(str(tmp_path), 100)
+    assert area.try_reserve(item('a', 60))
+    assert area.try_reserve(item('a', 60))
+    assert not area.try_reserve(item('b', 50))
+    assert area.try_reserve(item('c', 40))
+    assert area.used == 100
+    area.release(item('a', 60))
+    assert area.try_reserve(item('b', 50))
+    assert area.used == 90
+
+
+def test_file_larger_than_budget_is_admitted_alone(tmp_path):
+    area = StagingArea(str(tmp_path), 100)
+    assert area.try_reserve(item('huge', 500))
+    assert not area.try_reserve(item('small', 1))
+    area.release(item('huge', 500))
+    assert area.try_reserve(item('small', 1))
+
+
+def test_no_budget_admits_everything(tmp_path):
+    area = StagingArea(str(tmp_path), 0)
+    assert all(area.try_reserve(item(str(i), 10 ** 9)) for i in range(5))
+
+
+def test_evict_deletes_file_and_wakes_waiting_download(tmp_path):
+    area = StagingArea(str(tmp_path), 100)
+    first = item('a', 80)
+    area.reserve(first)
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(b'x' * 80)
+
+    reserved = threading.Event()
+    waiting = threading.Thread(target=lambda: (area.reserve(item('b', 80)), reserved.set()))
+    waiting.start()
+    assert not reserved.wait(0.2)
+    area.evict(first)
+    assert reserved.wait(5)
+    waiting.join()
+    assert not path.exists()
+    assert area.used == 80
+
+
+def test_reserve_async_waits_for_release(tmp_path):
+    area = StagingArea(str(tmp_path), 100)
+    area.reserve(item('a', 80))
+
+    async def run():
+        waiter = asyncio.ensure_future(area.reserve_async(item('b', 80)))
+        await asyncio.sleep(0.2)
+        assert not waiter.done()
+        area.release(item('a', 80))
+        await asyncio.wait_for(waiter, 5)
+
+    asyncio.run(run())
+    assert area.reserved == {'b': 80}
+
+
+def test_batches_fit_the_budget(tmp_path):
+    area = StagingArea(str(tmp_path), 100)
+    items = [item('a', 40), item('b', 50), item('big', 1000), item('c', 30), item('d', 90), item('e', 10)]
+    batches = [[i['id'] for i in batch] for batch in area.batches(items, size_threshold=500)]
+    # Files above the threshold are not staged, so they never start a batch
+    assert batches == [['a', 'b', 'big'], ['c'], ['d', 'e']]
+
+
+def test_batches_without_budget(tmp_path):
+    area = StagingArea(str(tmp_path), 0)
+    items = [item(str(i), 10 ** 9) for i in range(3)]
+    assert list(area.batches(items, size_threshold=10 ** 10)) == [items]
+
+
+def test_get_staging_area_is_shared_per_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'staging_disk_budget', 1234)
+    area = get_staging_area(str(tmp_path / 'a'))
+    assert area.budget == 1234
+    assert get_staging_area(str(tmp_path / 'a')) is area
+    assert get_staging_area(str(tmp_path / 'b')) is not area
@@ -0,0 +1,61 @@
+# test_sync_state.py
+
+import config
+import sync_state
+from sync_state import SyncStateStore
+
+ITEM = {'id': 'src1', 'name': 'photo.jpg', 'md5Checksum': 'abc', 'modifiedTime': '2024-05-01T10:00:00.000Z', 'size': '2048'}
+
+
+def test_recorded_file_is_synced(tmp_path):
+    store = SyncStateStore(str(tmp_path / 'state.db'))
+    assert not store.is_synced(ITEM)
+    store.record(ITEM, ['Photos'], {'Photos': 'tgt1'})
+    assert store.is_synced(ITEM)
+    assert store.get('src1') == {'destinations': ['Photos'], 'target_ids': {'Photos': 'tgt1'}}
+    assert store.get('unknown') is None
+
+
+def test_changed_file_is_not_synced(tmp_path):
+    store = SyncStateStore(str(tmp_path / 'state.db'))
+    store.record(ITEM, ['Photos'], {'Photos': 'tgt1'})
+    assert not store.is_synced(dict(ITEM, md5Checksum='def'))
+
+
+def test_metadata_change_keeps_file_synced(tmp_path):
+    store = SyncStateStore(str(tmp_path / 'state.db'))
+    store.record(ITEM, ['Photos'], {'Photos': 'tgt1'})
+    assert store.is_synced(dict(ITEM, name='renamed.jpg', modifiedTime='2024-05-02T10:00:00.000Z'))
+
+
+def test_file_without_checksum_uses_modified_time(tmp_path):
+    store = SyncStateStore(str(tmp_path / 'state.db'))
+    item = dict(ITEM, md5Checksum=None)
+    store.record(item, ['Photos'], {'Photos': 'tgt1'})
+    assert store.is_synced(item)
+    assert not store.is_synced(dict(item, modifiedTime='2024-05-02T10:00:00.000Z'))
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = SyncStateStore(path)
+    store.record(ITEM, ['Photos', 'Group Photos'], {'Photos': 'tgt1', 'Group Photos': 'tgt2'})
+    store.set_value('page_token', '42')
+    store.set_value('page_token', '43')
+    store.conn.close()
+
+    reopened = SyncStateStore(path)
+    assert reopened.is_synced(ITEM)
+    assert reopened.get('src1')['destinations'] == ['Photos', 'Group Photos']
+    assert reopened.get_value('page_token') == '43'
+    assert reopened.get_value('missing') is None
+
+
+def test_get_sync_state_follows_config(monkeypatch):
+    monkeypatch.setattr(sync_state, '_state', None)
+    monkeypatch.setattr(config, 'incremental_sync', False)
+    assert sync_state.get_sync_state() is None
+    monkeypatch.setattr(config, 'incremental_sync', True)
+    state = sync_state.get_sync_state()
+    assert state.path == config.sync_state_path
+    assert sync_state.get_sync_state() is state
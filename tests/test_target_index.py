@@ -0,0 +1,72 @@
+# test_target_index.py
+
+import hashlib
+import config
+import target_index
+from target_index import TargetIndex, get_target_index, load_target_index
+
+CLIP = b'clip bytes' * 1000
+KEY = (hashlib.md5(CLIP).hexdigest(), len(CLIP))
+
+
+def test_add_keeps_first_file_per_subfolder():
+    index = TargetIndex()
+    assert index.find(KEY) is None
+    index.add(KEY, {'videos': 'v1'}, 'clip.mp4')
+    index.add(KEY, {'videos': 'v2', 'images': None}, 'copy.mp4')
+    assert index.find(KEY) == {'videos': 'v1'}
+    assert index.has_name(KEY, 'clip.mp4')
+    assert index.has_name(KEY, 'copy.mp4')
+    assert not index.has_name(KEY, 'other.mp4')
+
+
+def test_load_indexes_files_shortcuts_and_parents(fake_drive, service):
+    target = fake_drive.add_folder('target')
+    videos = fake_drive.add_folder('videos', target)
+    images = fake_drive.add_folder('images', target)
+    elsewhere = fake_drive.add_folder('elsewhere')
+    clip_id = fake_drive.add_file('clip.mp4', 'video/mp4', elsewhere, CLIP)
+    fake_drive.files[clip_id]['parents'].append(videos)
+    shortcut_id = fake_drive.add_file('clip link.mp4', 'application/vnd.google-apps.shortcut', images)
+    fake_drive.files[shortcut_id]['shortcutDetails'] = {'targetId': clip_id}
+    fake_drive.add_file('other.mp4', 'video/mp4', elsewhere, b'other')
+
+    index = TargetIndex()
+    index.load(service, {'videos': videos, 'images': images})
+    assert index.find(KEY) == {'videos': clip_id, 'images': shortcut_id}
+    assert index.has_name(KEY, 'clip link.mp4')
+    assert len(index.entries) == 1
+
+
+def test_load_target_index_follows_config(fake_drive, service, monkeypatch):
+    videos = fake_drive.add_folder('videos')
+    monkeypatch.setattr(config, 'target_dedup', False)
+    load_target_index(service, {'videos': videos})
+    assert get_target_index() is None
+    monkeypatch.setattr(config, 'target_dedup', True)
+    load_target_index(service, {'videos': videos})
+    assert get_target_index() is target_index._index is not None
+
+
+def test_run_skips_content_already_in_target(fake_drive, source, target, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'target_dedup', True)
+    videos = fake_drive.add_folder('videos', target)
+    fake_drive.add_file('clip.mp4', 'video/mp4', videos, CLIP)
+    fake_drive.add_file('clip (copy).mp4', 'video/mp4', source, CLIP)
+    fake_drive.add_file('new.mp4', 'video/mp4', source, b'new bytes')
+    fake_drive.add_file('new (copy).mp4', 'video/mp4', source, b'new bytes')
+
+    stored = run_main('download')
+    # The repeated source file is transferred once, the content already in the target not at all
+    assert stored == {'videos': [('clip.mp4', CLIP), ('new.mp4', b'new bytes')]}
+
+
+def test_run_links_duplicates(fake_drive, source, target, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'target_dedup', True)
+    monkeypatch.setattr(config, 'dedup_policy', 'link')
+    videos = fake_drive.add_folder('videos', target)
+    fake_drive.add_file('clip.mp4', 'video/mp4', videos, CLIP)
+    fake_drive.add_file('clip (copy).mp4', 'video/mp4', source, CLIP)
+
+    stored = run_main('copy')
+    assert stored == {'videos': [('clip (copy).mp4', None), ('clip.mp4', CLIP)]}
@@ -0,0 +1,69 @@
+# test_thumbnail_classification.py
+
+from types import SimpleNamespace
+import pytest
+import config
+import process_content
+from process_content import classify_by_thumbnail
+
+ITEM = {'id': 'src1', 'name': 'IMG_0001.jpg', 'md5Checksum': 'abc', 'thumbnailLink': 'https://thumbnail/IMG_0001',
+        'imageMediaMetadata': {'width': 6000, 'height': 4000}}
+
+
+@pytest.fixture
+def thumbnails(creds, monkeypatch):
+    """
+    Serves a fixed thumbnail and counts the given number of faces in it.
+
+    Returns:
+        SimpleNamespace: 'faces' to set the face count, 'fetched' and 'counted' recording the calls.
+    """
+    state = SimpleNamespace(faces=0, fetched=[], counted=[])
+
+    def download_thumbnail(http, link, size):
+        state.fetched.append((link, size))
+        return b'thumbnail'
+
+    def count_faces_in_bytes(data, reduction=None, original_size=None):
+        state.counted.append((reduction, original_size))
+        return state.faces
+
+    monkeypatch.setattr(config, 'face_cache_enabled', True)
+    monkeypatch.setattr(config, 'thumbnail_size', 1600)
+    monkeypatch.setattr(config, 'thumbnail_uncertainty', 0.25)
+    monkeypatch.setattr(config, 'group_photo_threshold_person_count', 20)
+    monkeypatch.setattr(process_content, 'download_thumbnail', download_thumbnail)
+    monkeypatch.setattr(process_content, 'get_face_detector',
+                        lambda: SimpleNamespace(count_faces_in_bytes=count_faces_in_bytes))
+    state.classify = lambda item=ITEM: classify_by_thumbnail(creds, item)
+    return state
+
+
+def test_clear_counts_decide_from_thumbnail(thumbnails):
+    thumbnails.faces = 40
+    assert thumbnails.classify() is True
+    assert thumbnails.fetched == [('https://thumbnail/IMG_0001', 1600)]
+    # The minimum face size is scaled from the original's longest side
+    assert thumbnails.counted == [(1, 6000)]
+
+    thumbnails.faces = 2
+    assert thumbnails.classify(dict(ITEM, md5Checksum='def')) is False
+
+
+def test_counts_near_threshold_need_full_image(thumbnails):
+    thumbnails.faces = 18
+    assert thumbnails.classify() is None
+
+
+def test_thumbnail_counts_are_cached(thumbnails):
+    thumbnails.faces = 40
+    assert thumbnails.classify() is True
+    assert thumbnails.classify() is True
+    assert len(thumbnails.fetched) == 1
+
+
+def test_missing_thumbnail_needs_full_image(thumbnails):
+    item = dict(ITEM)
+    del item['thumbnailLink']
+    assert thumbnails.classify(item) is None
+    assert thumbnails.fetched == []
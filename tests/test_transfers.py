@@ -0,0 +1,169 @@
+# test_transfers.py
+
+import random
+import pytest
+import config
+import process_content
+import async_drive
+from stream_transfer import authorized_http, start_upload_session, upload_chunk, stream_file
+from upload_sessions import UploadSessionStore
+
+MB = 1024 * 1024
+
+
+def random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(config, 'adaptive_chunk_size', False)
+    monkeypatch.setattr(config, 'min_chunk_size', 256 * 1024)
+    monkeypatch.setattr(config, 'resumable_chunk_size', 512 * 1024)
+
+
+def test_download_file_resumes_part_file(fake_drive, service, source, tmp_path):
+    data = random_bytes(3 * MB)
+    file_id = fake_drive.add_file('clip.mp4', 'video/mp4', source, data)
+    path = str(tmp_path / 'clip.mp4')
+    with open(path + '.part', 'wb') as f:
+        f.write(data[:700000])
+
+    assert process_content.download_file(service, file_id, 'clip.mp4', path, file_size=len(data))
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert not (tmp_path / 'clip.mp4.part').exists()
+
+
+def test_download_file_restarts_changed_source(fake_drive, service, source, tmp_path):
+    data = random_bytes(MB)
+    file_id = fake_drive.add_file('clip.mp4', 'video/mp4', source, data)
+    path = str(tmp_path / 'clip.mp4')
+    # The partial file is longer than the source, which has changed since
+    with open(path + '.part', 'wb') as f:
+        f.write(random_bytes(2 * MB, seed=1))
+
+    assert process_content.download_file(service, file_id, 'clip.mp4', path, file_size=len(data))
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_download_file_of_empty_file(fake_drive, service, source, tmp_path):
+    file_id = fake_drive.add_file('empty.mp4', 'video/mp4', source, b'')
+    path = str(tmp_path / 'empty.mp4')
+    assert process_content.download_file(service, file_id, 'empty.mp4', path, file_size=0)
+    assert (tmp_path / 'empty.mp4').read_bytes() == b''
+
+
+@pytest.mark.parametrize('size', [0, 1000, 3 * MB + 12345])
+def test_stream_file_copies_bytes(fake_drive, creds, source, target, size):
+    data = random_bytes(size)
+    item = {'id': fake_drive.add_file('clip.mp4', 'video/mp4', source, data), 'name': 'clip.mp4',
+            'mimeType': 'video/mp4', 'size': str(size)}
+    file_id = stream_file(creds, item, {'name': 'clip.mp4', 'parents': [target]}, chunk_size=256 * 1024, ring_buffers=2)
+    assert fake_drive.files[file_id]['data'] == data
+    assert fake_drive.files[file_id]['parents'] == [target]
+
+
+def test_stream_file_resumes_saved_session(fake_drive, creds, source, target, tmp_path):
+    data = random_bytes(3 * MB)
+    item = {'id': fake_drive.add_file('clip.mp4', 'video/mp4', source, data), 'name': 'clip.mp4',
+            'mimeType': 'video/mp4', 'size': str(len(data)), 'md5Checksum': 'abc'}
+    metadata = {'name': 'clip.mp4', 'parents': [target]}
+    store = UploadSessionStore(str(tmp_path / 'sessions.json'))
+    http = authorized_http(creds)
+    uri = start_upload_session(http, metadata, len(data), 'video/mp4')
+    offset, _ = upload_chunk(http, uri, data[:MB], 0, len(data))
+    store.save(store.stream_key(item, target), uri, offset)
+
+    file_id = stream_file(creds, item, metadata, chunk_size=256 * 1024, session_store=store)
+    assert fake_drive.files[file_id]['data'] == data
+    # The saved session was finished instead of a new one being started
+    assert fake_drive.sessions == {}
+    assert store.sessions == {}
+
+
+def add_sources(drive, source):
+    """
+    Fills the source folder with photos, videos and an empty file.
+    """
+    sources = {
+        'DSC_0001.jpg': ('image/jpeg', random_bytes(20000, seed=1)),
+        'IMG_0002.jpg': ('image/jpeg', random_bytes(30000, seed=2)),
+        'clip.mp4': ('video/mp4', random_bytes(2 * MB, seed=3)),
+        'empty.mp4': ('video/mp4', b''),
+    }
+    for name, (mime_type, data) in sources.items():
+        drive.add_file(name, mime_type, source, data)
+    return {
+        'DSLR': [('DSC_0001.jpg', sources['DSC_0001.jpg'][1])],
+        'images': [('IMG_0002.jpg', sources['IMG_0002.jpg'][1])],
+        'videos': sorted([('clip.mp4', sources['clip.mp4'][1]), ('empty.mp4', b'')]),
+    }
+
+
+@pytest.mark.parametrize('mode', ['download', 'pipeline', 'copy', 'async'])
+def test_main_transfers_source_folder(fake_drive, source, run_main, mode):
+    expected = add_sources(fake_drive, source)
+    assert run_main(mode) == expected
+
+
+def test_main_streams_large_files(fake_drive, source, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'size_threshold', MB)
+    monkeypatch.setattr(config, 'stream_large_files', True)
+    monkeypatch.setattr(config, 'stream_chunk_size', 256 * 1024)
+    expected = add_sources(fake_drive, source)
+    assert run_main('download') == expected
+
+
+def test_main_skips_synced_files(fake_drive, source, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'incremental_sync', True)
+    expected = add_sources(fake_drive, source)
+    assert run_main('download') == expected
+    # Nothing changed in the source, so the second run stores nothing new
+    assert run_main('download') == expected
+
+
+def test_files_left_by_earlier_runs_are_not_uploaded(fake_drive, source, run_main, monkeypatch):
+    monkeypatch.setattr(config, 'incremental_sync', True)
+    monkeypatch.setattr(config, 'clean_up_downloaded_files_after_uploading', False)
+    expected = add_sources(fake_drive, source)
+    assert run_main('download') == expected
+
+    # The staged copies of the first run are named after their source IDs and stay on disk
+    data = random_bytes(10000, seed=4)
+    fake_drive.add_file('IMG_0003.jpg', 'image/jpeg', source, data)
+    expected['images'].append(('IMG_0003.jpg', data))
+    assert run_main('download') == expected
+
+
+@pytest.mark.parametrize('mode', ['download', 'copy', 'pipeline', 'async'])
+@pytest.mark.parametrize('policy, stored_copies, group_photo', [
+    ('upload', 2, ('IMG_0001.jpg', b'photo' * 1000)),
+    ('copy', 2, ('IMG_0001.jpg', b'photo' * 1000)),
+    ('shortcut', 1, ('IMG_0001.jpg', None)),
+])
+def test_group_photos_follow_extra_destination_policy(fake_drive, source, run_main, monkeypatch, mode, policy,
+                                                      stored_copies, group_photo):
+    monkeypatch.setattr(config, 'extra_destination_policy', policy)
+    # Every image is a group photo
+    monkeypatch.setattr(process_content, 'group_photo_compactabilty_check', lambda *args, **kwargs: True)
+    monkeypatch.setattr(process_content, 'count_faces_in_worker', lambda image_path: 25)
+    monkeypatch.setattr(async_drive, 'count_faces_in_worker', lambda image_path: 25)
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'photo' * 1000)
+
+    assert run_main(mode) == {'images': [('IMG_0001.jpg', b'photo' * 1000)], 'GroupPhotos': [group_photo]}
+    copies = [f for f in fake_drive.files.values() if f['name'] == 'IMG_0001.jpg' and 'shortcutDetails' not in f]
+    assert len(copies) == stored_copies + 1
+
+
+@pytest.mark.parametrize('recursive', [False, True])
+def test_nested_source_folders(fake_drive, source, run_main, monkeypatch, recursive):
+    monkeypatch.setattr(config, 'recursive_listing', recursive)
+    monkeypatch.setattr(config, 'listing_workers', 2)
+    fake_drive.add_file('top.mp4', 'video/mp4', source, b'top')
+    nested = fake_drive.add_folder('2024', fake_drive.add_folder('events', source))
+    fake_drive.add_file('nested.mp4', 'video/mp4', nested, b'nested')
+
+    expected = [('nested.mp4', b'nested'), ('top.mp4', b'top')] if recursive else [('top.mp4', b'top')]
+    assert run_main('download') == {'videos': expected}
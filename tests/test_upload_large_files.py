@@ -0,0 +1,23 @@
+# test_upload_large_files.py
+
+import config
+from upload_large_files import clean_up, upload_large_files
+
+
+def test_clean_up_keeps_partial_downloads(fake_drive, service, target, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'resumable_chunk_size', 256 * 1024)
+    large_files = tmp_path / 'large_files'
+    large_files.mkdir()
+    (large_files / 'clip.mp4').write_bytes(b'clip' * 100000)
+    (large_files / 'next.mp4.part').write_bytes(b'partial')
+
+    uploaded = upload_large_files(service, target, str(large_files))
+    assert uploaded == [str(large_files / 'clip.mp4')]
+    assert [f['data'] for f in fake_drive.files.values() if f['name'] == 'clip.mp4'] == [b'clip' * 100000]
+
+    clean_up(str(large_files), uploaded)
+    assert sorted(p.name for p in large_files.iterdir()) == ['next.mp4.part']
+
+    (large_files / 'next.mp4.part').unlink()
+    clean_up(str(large_files), [])
+    assert not large_files.exists()
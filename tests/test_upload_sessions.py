@@ -0,0 +1,113 @@
+# test_upload_sessions.py
+
+import random
+import pytest
+import config
+import upload_sessions
+from upload_sessions import UploadSessionStore, resumable_create
+from stream_transfer import authorized_http, start_upload_session, upload_chunk
+
+DATA = random.Random(5).randbytes(3 * 1024 * 1024)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(config, 'adaptive_chunk_size', False)
+    monkeypatch.setattr(config, 'min_chunk_size', 256 * 1024)
+    monkeypatch.setattr(config, 'resumable_chunk_size', 512 * 1024)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadSessionStore(str(tmp_path / 'sessions.json'))
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def test_store_persists_sessions(tmp_path):
+    path = str(tmp_path / 'sessions.json')
+    store = UploadSessionStore(path)
+    store.save('a', 'https://upload/a', 512)
+    store.save('b', 'https://upload/b', 0)
+    store.remove('b')
+
+    reloaded = UploadSessionStore(path)
+    assert reloaded.get('a')['uri'] == 'https://upload/a'
+    assert reloaded.get('a')['offset'] == 512
+    assert reloaded.get('b') is None
+
+
+def test_store_ignores_unreadable_file(tmp_path):
+    path = tmp_path / 'sessions.json'
+    path.write_text('{not json')
+    store = UploadSessionStore(str(path))
+    assert store.sessions == {}
+    store.save('a', 'https://upload/a', 0)
+    assert UploadSessionStore(str(path)).get('a') is not None
+
+
+def test_file_key_changes_with_the_file(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(b'1234')
+    key = UploadSessionStore.file_key(str(path), 'parent')
+    assert UploadSessionStore.file_key(str(path), 'other') != key
+    path.write_bytes(b'12345')
+    assert UploadSessionStore.file_key(str(path), 'parent') != key
+
+
+def test_resumable_create_uploads_file(fake_drive, service, store, local_file):
+    target = fake_drive.add_folder('target')
+    created = resumable_create(service, {'name': 'video.mp4', 'parents': [target]}, local_file, 'k', store)
+    assert fake_drive.files[created['id']]['data'] == DATA
+    assert fake_drive.files[created['id']]['parents'] == [target]
+    assert store.sessions == {}
+
+
+def test_resumable_create_resumes_saved_session(fake_drive, service, creds, store, local_file):
+    target = fake_drive.add_folder('target')
+    http = authorized_http(creds)
+    uri = start_upload_session(http, {'name': 'video.mp4', 'parents': [target]}, len(DATA), 'video/mp4')
+    offset, _ = upload_chunk(http, uri, DATA[:1024 * 1024], 0, len(DATA))
+    store.save('k', uri, offset)
+    fake_drive.reset_stats()
+
+    created = resumable_create(service, {'name': 'video.mp4', 'parents': [target]}, local_file, 'k', store)
+    assert fake_drive.files[created['id']]['data'] == DATA
+    # The saved session was finished instead of a new one being started
+    assert fake_drive.sessions == {}
+    assert store.sessions == {}
+
+
+def test_resumable_create_restarts_expired_session(fake_drive, service, store, local_file):
+    target = fake_drive.add_folder('target')
+    store.save('k', f"{config.drive_api_base}/upload/drive/v3/files?uploadType=resumable&upload_id=gone", 1024)
+    created = resumable_create(service, {'name': 'video.mp4', 'parents': [target]}, local_file, 'k', store)
+    assert fake_drive.files[created['id']]['data'] == DATA
+    assert store.sessions == {}
+
+
+def test_resumable_create_uploads_empty_file(fake_drive, service, store, tmp_path):
+    target = fake_drive.add_folder('target')
+    path = tmp_path / 'empty.jpg'
+    path.write_bytes(b'')
+    created = resumable_create(service, {'name': 'empty.jpg', 'parents': [target]}, str(path), 'k', store)
+    assert fake_drive.files[created['id']]['data'] == b''
+    assert store.sessions == {}
+
+
+def test_resumable_create_gives_up_on_stalled_upload(fake_drive, service, store, local_file, monkeypatch):
+    target = fake_drive.add_folder('target')
+    # The server accepts every chunk but never commits a byte
+    monkeypatch.setattr(fake_drive, 'upload_chunk', lambda upload_id, headers, body: (308, {}, b''))
+    with pytest.raises(IOError):
+        resumable_create(service, {'name': 'video.mp4', 'parents': [target]}, local_file, 'k', store)
+
+
+def test_get_session_store_uses_config_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(upload_sessions, '_store', None)
+    assert upload_sessions.get_session_store().path == config.upload_sessions_path
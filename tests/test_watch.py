@@ -0,0 +1,107 @@
+# test_watch.py
+
+import time
+import pytest
+import config
+import process_content
+
+
+@pytest.fixture
+def watch(run_main, monkeypatch):
+    """
+    Runs the watch mode with a script of steps, one per poll, and stops it with
+    Ctrl+C once the script is done.
+
+    Returns:
+        callable: Runs the watch mode and returns the files of the target.
+    """
+    monkeypatch.setattr(config, 'incremental_sync', True)
+    # The classifier is loaded up front, but the face detection is patched out
+    monkeypatch.setattr(process_content, 'get_face_detector', lambda: None)
+    # Odd interval, so the poll is told apart from other sleeps
+    monkeypatch.setattr(config, 'watch_poll_interval', 0.0123)
+    sleep = time.sleep
+
+    def run(*steps):
+        steps = list(steps)
+
+        def poll(seconds):
+            if seconds != config.watch_poll_interval:
+                return sleep(seconds)
+            if not steps:
+                raise KeyboardInterrupt
+            steps.pop(0)()
+
+        monkeypatch.setattr(time, 'sleep', poll)
+        return run_main('watch')
+
+    return run
+
+
+def failing_once(monkeypatch, name):
+    """
+    Makes the first download of a file fail.
+    """
+    download_file = process_content.download_file
+    failed = []
+
+    def download(service, file_id, file_name, *args, **kwargs):
+        if file_name == name and not failed:
+            failed.append(file_name)
+            return False
+        return download_file(service, file_id, file_name, *args, **kwargs)
+
+    monkeypatch.setattr(process_content, 'download_file', download)
+    return failed
+
+
+def test_watch_transfers_existing_and_new_files_once(fake_drive, source, watch):
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'one' * 100)
+
+    stored = watch(lambda: fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'two' * 100), lambda: None)
+    assert stored == {'images': [('IMG_0001.jpg', b'one' * 100), ('IMG_0002.jpg', b'two' * 100)]}
+
+
+def test_renamed_file_is_not_transferred_again(fake_drive, source, watch):
+    file_id = fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'one' * 100)
+
+    stored = watch(lambda: fake_drive.update_file(file_id, name='IMG_0001_renamed.jpg'))
+    assert stored == {'images': [('IMG_0001.jpg', b'one' * 100)]}
+
+
+def test_restarted_watch_continues_from_saved_token(fake_drive, source, watch):
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'one' * 100)
+    watch()
+    fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'two' * 100)
+
+    stored = watch()
+    assert stored == {'images': [('IMG_0001.jpg', b'one' * 100), ('IMG_0002.jpg', b'two' * 100)]}
+
+
+def test_failed_file_is_retried_on_next_poll(fake_drive, source, watch, monkeypatch):
+    failed = failing_once(monkeypatch, 'IMG_0002.jpg')
+
+    stored = watch(lambda: fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'two' * 100), lambda: None)
+    assert failed
+    assert stored == {'images': [('IMG_0002.jpg', b'two' * 100)]}
+
+
+def test_failed_file_is_retried_after_restart(fake_drive, source, watch, monkeypatch):
+    failed = failing_once(monkeypatch, 'IMG_0002.jpg')
+
+    # The first watch stops right after the failure, the page token has moved past the file
+    stored = watch(lambda: fake_drive.add_file('IMG_0002.jpg', 'image/jpeg', source, b'two' * 100))
+    assert failed
+    assert stored == {}
+
+    stored = watch()
+    assert stored == {'images': [('IMG_0002.jpg', b'two' * 100)]}
+
+
+def test_watch_requires_incremental_sync(fake_drive, source, watch, monkeypatch):
+    fake_drive.add_file('IMG_0001.jpg', 'image/jpeg', source, b'one' * 100)
+    monkeypatch.setattr(config, 'incremental_sync', False)
+
+    with pytest.raises(SystemExit):
+        watch()
+    assert not [f for f in fake_drive.files.values() if f['name'] == 'IMG_0001.jpg' and source not in f['parents']]
@@ -1,61 +1,24 @@
 # upload_large_files.py
 
 import os
-import io
-import shutil
 import sys
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 import config
+from drive_batch import find_or_create_folders
+from upload_sessions import UploadSessionStore, resumable_create
+from target_index import get_target_index, load_target_index
+from face_cache import file_md5
+from drive_auth import authenticate_drive, load_credentials
+from credential_pool import get_credential_pool, load_credential_pool, record_upload, upload_service
+from process_content import place_duplicate
 from colorama import init, Fore, Style
 
 # Initialize colorama
 init(autoreset=True)
 
-def authenticate_drive(creds_file):
-    """
-    Authenticates and returns the Google Drive service object.
-    
-    Parameters:
-        creds_file (str): Path to the credentials JSON file.
-        
-    Returns:
-        service: Authorized Google Drive service instance.
-    """
-    SCOPES = ['https://www.googleapis.com/auth/drive']
-    creds = None
-    try:
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-            print(Fore.GREEN + "✔ Loaded existing credentials from 'token.json'.")
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                print(Fore.GREEN + "🔄 Refreshed expired credentials.")
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(creds_file, SCOPES)
-                creds = flow.run_local_server(port=0)
-                print(Fore.GREEN + "✔ Authenticated new credentials.")
-            # Save the credentials for the next run
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-                print(Fore.GREEN + "💾 Saved new credentials to 'token.json'.")
-        service = build('drive', 'v3', credentials=creds)
-        print(Fore.GREEN + "✔ Google Drive service built successfully.\n")
-        return service
-    except FileNotFoundError:
-        print(Fore.RED + f"✖ Error: Credentials file '{creds_file}' not found.")
-        sys.exit(1)
-    except Exception as e:
-        print(Fore.RED + f"✖ An error occurred during authentication: {e}")
-        sys.exit(1)
-
 def create_subfolders(service, parent_folder_id, subfolder_names):
     """
     Creates subfolders inside the parent folder if they do not already exist.
+    All lookups and creations are sent as batch requests rather than one call per subfolder.
 
     Parameters:
         service: Authorized Google Drive service instance.
@@ -65,30 +28,19 @@ def create_subfolders(service, parent_folder_id, subfolder_names):
     Returns:
         dict: Mapping of subfolder names to their respective IDs.
     """
-    subfolder_ids = {}
+    subfolder_ids, created, errors = find_or_create_folders(service, parent_folder_id, subfolder_names)
     for name in subfolder_names:
-        # Check if subfolder already exists
-        query = f"mimeType = 'application/vnd.google-apps.folder' and name = '{name}' and '{parent_folder_id}' in parents and trashed = false"
-        try:
-            results = service.files().list(q=query, fields="files(id, name)").execute()
-            files = results.get('files', [])
-            if files:
-                subfolder_ids[name] = files[0]['id']
-                print(Fore.GREEN + f"✔ Subfolder '{name}' already exists with ID: {files[0]['id']}.")
-            else:
-                # Create the subfolder
-                file_metadata = {
-                    'name': name,
-                    'mimeType': 'application/vnd.google-apps.folder',
-                    'parents': [parent_folder_id]
-                }
-                folder = service.files().create(body=file_metadata, fields='id').execute()
-                subfolder_ids[name] = folder.get('id')
-                print(Fore.GREEN + f"✔ Created subfolder '{name}' with ID: {folder.get('id')}.")
-        except Exception as e:
-            print(Fore.RED + f"✖ Failed to create or find subfolder '{name}': {e}\n")
-            sys.exit(1)
+        if name not in subfolder_ids:
+            continue
+        if name in created:
+            print(Fore.GREEN + f"✔ Created subfolder '{name}' with ID: {subfolder_ids[name]}.")
+        else:
+            print(Fore.GREEN + f"✔ Subfolder '{name}' already exists with ID: {subfolder_ids[name]}.")
+    if errors:
+        print(Fore.RED + f"✖ Failed to create or find {len(errors)} subfolders.\n")
+        sys.exit(1)
     print()  # Add a newline for better readability
+    load_target_index(service, subfolder_ids)
     return subfolder_ids
 
 def upload_large_files(service, upload_folder_id, large_files_path):
@@ -100,7 +52,11 @@ def upload_large_files(service, upload_folder_id, large_files_path):
         service: Authorized Google Drive service instance.
         upload_folder_id (str): ID of the target Google Drive folder.
         large_files_path (str): Local path where large files are stored to be uploaded.
+
+    Returns:
+        list: Paths of the files that are now in the target, uploaded or placed as duplicates.
     """
+    done = []
     try:
         # Create subfolders 'images' and 'videos' inside the target folder
         subfolders = ['images', 'videos']
@@ -109,7 +65,7 @@ def upload_large_files(service, upload_folder_id, large_files_path):
         files = os.listdir(large_files_path)
         if not files:
             print(Fore.YELLOW + "⚠ No large files available to upload.\n")
-            return
+            return done
 
         print(Fore.CYAN + f"📤 Starting upload of {len(files)} large files to folder ID: {upload_folder_id}\n")
         for file_name in files:
@@ -132,16 +88,32 @@ def upload_large_files(service, upload_folder_id, large_files_path):
                 continue
 
             try:
+                # Hashing is much cheaper than uploading the same content again
+                index = get_target_index()
+                content_key = (file_md5(file_path), os.path.getsize(file_path)) if index is not None else None
+                placements = index.find(content_key) if content_key else None
+                if placements:
+                    place_duplicate(file_name, content_key, placements, subfolder_ids, service)
+                    done.append(file_path)
+                    continue
+
                 file_metadata = {
                     'name': file_name,
                     'parents': [target_subfolder_id]
                 }
-                media = MediaFileUpload(file_path, resumable=True)
                 print(Fore.BLUE + f"⏳ Uploading '{file_name}' to '{subfolder_type}' subfolder...")
-                file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
+                with upload_service(service, os.path.getsize(file_path)) as upload_svc:
+                    # The session key is built inside, sessions belong to the identity that started them
+                    key = UploadSessionStore.file_key(file_path, target_subfolder_id)
+                    file = resumable_create(upload_svc, file_metadata, file_path, key, mime_type=mime_type)
+                    record_upload(os.path.getsize(file_path))
                 print(Fore.GREEN + f"✔ Successfully uploaded '{file_name}' with File ID: {file.get('id')}.\n")
+                done.append(file_path)
+                if content_key:
+                    index.add(content_key, {subfolder_type: file.get('id')}, file_name)
             except Exception as e:
                 print(Fore.RED + f"✖ Failed to upload '{file_name}': {e}\n")
+        return done
     except Exception as e:
         print(Fore.RED + f"✖ An error occurred while uploading large files: {e}\n")
         sys.exit(1)
@@ -160,24 +132,36 @@ def get_mime_type(file_path):
     mime_type, _ = mimetypes.guess_type(file_path)
     return mime_type
 
-def clean_up(large_files_path):
+def clean_up(large_files_path, uploaded_paths):
     """
-    Deletes the local large_files directory and its contents.
+    Deletes the uploaded files from the local large_files directory, and the directory
+    itself once it is empty. Files that failed to upload and partial '.part' downloads
+    are kept, so the next run can retry or resume them.
 
     Parameters:
         large_files_path (str): Path to the local large_files directory.
+        uploaded_paths (list): Paths of the uploaded files, as returned by upload_large_files().
     """
     try:
-        if os.path.exists(large_files_path):
-            shutil.rmtree(large_files_path)
+        for path in uploaded_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        if not os.path.exists(large_files_path):
+            return
+        remaining = os.listdir(large_files_path)
+        if not remaining:
+            os.rmdir(large_files_path)
             print(Fore.GREEN + f"✔ Cleaned up the local directory '{large_files_path}'.\n")
+        else:
+            print(Fore.GREEN + f"✔ Removed {len(uploaded_paths)} uploaded files from '{large_files_path}', "
+                               f"keeping {len(remaining)} files that were not uploaded or are partial downloads.\n")
     except Exception as e:
         print(Fore.RED + f"✖ An error occurred during cleanup: {e}\n")
 
 def main():
     """
     Main function to upload large files from local large_files directory to Google Drive
-    and clean up the local directory after successful upload.
+    and clean up the uploaded files afterwards.
     """
     print(Fore.MAGENTA + "="*50)
     print(Fore.MAGENTA + "    Upload Large Files Process Started")
@@ -191,16 +175,22 @@ def main():
         print(Fore.BLUE + f"📁 Large files directory '{config.large_files_path}' found.\n")
 
     # Authenticate and build the Google Drive service
-    service = authenticate_drive(config.cred_file_path)
+    creds = load_credentials(config.cred_file_path)
+    service = authenticate_drive(config.cred_file_path, creds)
+    load_credential_pool(creds)
 
     # Upload the large files to target folder
     print(Fore.MAGENTA + "🔼 Initiating upload of large files...\n")
-    upload_large_files(service, config.target_folder_id, config.large_files_path)
+    uploaded_paths = upload_large_files(service, config.target_folder_id, config.large_files_path)
+
+    pool = get_credential_pool()
+    if pool is not None:
+        pool.report()
 
     # Conditionally clean up the large_files directory
     if config.clean_up_large_files_after_uploading:
         print(Fore.MAGENTA + "🧹 Cleaning up large files...\n")
-        clean_up(config.large_files_path)
+        clean_up(config.large_files_path, uploaded_paths)
     else:
         print(Fore.YELLOW + "⚠ Skipping cleanup of large files as per configuration.\n")
 
@@ -0,0 +1,203 @@
+# upload_sessions.py
+
+import os
+import json
+import time
+import threading
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload
+import config
+from chunk_sizer import CHUNK_ALIGNMENT, AdaptiveChunkSizer, ProgressMilestones
+from stream_transfer import DriveHttpError, query_upload_session
+from rate_limiter import execute, get_rate_limiter
+from credential_pool import assigned_identity_name
+from colorama import init, Fore, Style
+
+# Initialize colorama
+init(autoreset=True)
+
+# Chunk requests in a row that may leave the committed offset unchanged, see resumable_create()
+MAX_STALLED_CHUNKS = 5
+
+# Shared store, see get_session_store()
+_store = None
+_store_lock = threading.Lock()
+
+
+def identity_suffix():
+    """
+    Returns the key suffix of the identity the calling thread uploads with, see
+    credential_pool.py. A session belongs to the account that started it, so each
+    identity keeps its own sessions.
+    """
+    name = assigned_identity_name()
+    return f"|{name}" if name else ""
+
+
+class UploadSessionStore:
+    """
+    Persists resumable upload session URIs and their committed byte offsets in a local
+    JSON file, so an interrupted upload can continue after the process restarts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sessions = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.sessions = json.load(f)
+            except (OSError, ValueError) as e:
+                print(Fore.YELLOW + f"⚠ Ignoring unreadable upload session file '{path}': {e}\n")
+
+    @staticmethod
+    def file_key(file_path, parent_id):
+        """
+        Builds the key of a local file upload. The key changes when the file is modified,
+        so a stale session is never resumed with different bytes.
+        """
+        stat = os.stat(file_path)
+        return f"file|{os.path.abspath(file_path)}|{parent_id}|{stat.st_size}|{stat.st_mtime_ns}" + identity_suffix()
+
+    @staticmethod
+    def stream_key(item, parent_id):
+        """
+        Builds the key of a streamed upload from its source Drive file.
+        """
+        return f"stream|{item['id']}|{parent_id}|{item.get('size', 0)}|{item.get('md5Checksum', '')}" + identity_suffix()
+
+    def get(self, key):
+        with self.lock:
+            return self.sessions.get(key)
+
+    def save(self, key, uri, offset):
+        with self.lock:
+            self.sessions[key] = {'uri': uri, 'offset': offset, 'updated': time.time()}
+            self._flush()
+
+    def remove(self, key):
+        with self.lock:
+            if self.sessions.pop(key, None) is not None:
+                self._flush()
+
+    def _flush(self):
+        # Write to a temporary file first so a crash never leaves a truncated state file
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.sessions, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def get_session_store():
+    """
+    Returns the upload session store shared by all threads, loading it on first use.
+
+    Returns:
+        UploadSessionStore: Store backed by config.upload_sessions_path.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UploadSessionStore(config.upload_sessions_path)
+        return _store
+
+
+class AdaptiveMediaFileUpload(MediaFileUpload):
+    """
+    Resumable MediaFileUpload whose chunk size follows an AdaptiveChunkSizer. The API
+    client asks the media for its chunk size before sending every chunk.
+    """
+
+    def __init__(self, filename, sizer, mimetype=None):
+        super().__init__(filename, mimetype=mimetype, chunksize=CHUNK_ALIGNMENT, resumable=True)
+        self.sizer = sizer
+
+    def chunksize(self):
+        return self.sizer.chunk_size
+
+
+def resumable_create(service, file_metadata, file_path, key, store=None, mime_type=None):
+    """
+    Creates a file with a resumable upload, saving the session after every chunk and
+    continuing a session saved by an earlier run when one exists for the key. Chunks
+    are sized by an AdaptiveChunkSizer. Empty files, which have no chunks, are created
+    with a single request.
+
+    The upload fails once MAX_STALLED_CHUNKS chunk requests in a row have not moved the
+    committed offset forward, instead of sending the same chunk forever.
+
+    Parameters:
+        service: Authorized Google Drive service instance.
+        file_metadata (dict): Metadata of the new file, such as 'name' and 'parents'.
+        file_path (str): Local path of the file to upload.
+        key (str): Key identifying this upload in the session store.
+        store (UploadSessionStore or None): Session store, defaults to get_session_store().
+        mime_type (str or None): MIME type of the file, guessed from its name if None.
+
+    Returns:
+        dict: The created file resource.
+    """
+    store = store or get_session_store()
+    limiter = get_rate_limiter()
+    if os.path.getsize(file_path) == 0:
+        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=False)
+        return execute(service.files().create(body=file_metadata, media_body=media, fields='id'))
+
+    sizer = AdaptiveChunkSizer(os.path.getsize(file_path))
+    milestones = ProgressMilestones()
+    media = AdaptiveMediaFileUpload(file_path, sizer, mimetype=mime_type)
+    request = service.files().create(body=file_metadata, media_body=media, fields='id')
+    session = store.get(key)
+    if session:
+        print(Fore.CYAN + f"⏩ Resuming upload of '{file_metadata['name']}' from byte {session['offset']}...")
+        try:
+            offset, uploaded = limiter.call(query_upload_session, request.http, session['uri'], media.size())
+        except DriveHttpError as e:
+            if e.status not in (404, 410):
+                raise
+            # The saved session has expired, start a new one from byte 0
+            print(Fore.YELLOW + f"⚠ Upload session for '{file_metadata['name']}' expired, restarting upload.")
+            store.remove(key)
+            session = None
+        else:
+            if uploaded is not None:
+                # The last chunk of the earlier run went through after all
+                store.remove(key)
+                return uploaded
+            request.resumable_uri = session['uri']
+            request.resumable_progress = offset
+
+    response = None
+    stalled = 0
+    while response is None:
+        progress = request.resumable_progress
+        try:
+            sizer.start()
+            status, response = limiter.call(request.next_chunk)
+        except HttpError as e:
+            if session and e.resp.status in (404, 410):
+                # The saved session has expired, start a new one from byte 0
+                print(Fore.YELLOW + f"⚠ Upload session for '{file_metadata['name']}' expired, restarting upload.")
+                store.remove(key)
+                session = None
+                request = service.files().create(body=file_metadata, media_body=media, fields='id')
+                continue
+            raise
+        if response is None:
+            # After an error the client asks for the committed offset and sends a chunk in
+            # the same call, so the difference always counts the bytes that went through
+            advanced = request.resumable_progress - progress
+            if advanced <= 0:
+                stalled += 1
+                if stalled >= MAX_STALLED_CHUNKS:
+                    raise IOError(f"upload made no progress in {stalled} chunk requests in a row")
+                continue
+            stalled = 0
+            store.save(key, request.resumable_uri, request.resumable_progress)
+            sizer.record(advanced)
+            percent = milestones.crossed(status.progress()) if status else None
+            if percent:
+                print(Fore.BLUE + f"🔄 Uploading '{file_metadata['name']}': {percent}%")
+    store.remove(key)
+    return response